@@ -25,11 +25,15 @@ export default function EmotionTracker({
 	sampleIntervalMs = 2000,
 	showBadge = true,
 	featureFlag = true,
+	streamUrl = process.env.NEXT_PUBLIC_EMOTION_STREAM_URL,
 }: {
 	interviewId: string;
 	sampleIntervalMs?: number;
 	showBadge?: boolean;
 	featureFlag?: boolean;
+	// ws(s):// base URL of the emotion service; frames are streamed as binary
+	// JPEG over one WebSocket instead of one base64 HTTP request each
+	streamUrl?: string;
 }) {
 	const videoRef = useRef<HTMLVideoElement | null>(null);
 	const canvasRef = useRef<HTMLCanvasElement | null>(null);
@@ -42,6 +46,7 @@ export default function EmotionTracker({
 	const samplesRef = useRef<EmotionSample[]>([]);
 	const timerRef = useRef<NodeJS.Timeout | null>(null);
 	const streamRef = useRef<MediaStream | null>(null);
+	const socketRef = useRef<WebSocket | null>(null);
 
 	const storageKey = useMemo(() => `emotion-summary:${interviewId}`, [interviewId]);
 
@@ -202,6 +207,29 @@ export default function EmotionTracker({
 		};
 	}, [featureFlag, isTracking, startTracking, stopTracking, saveSummary]);
 
+	const recordSample = useCallback(
+		(data: any) => {
+			const dom = data?.dominant || data?.emotion || "";
+			const conf = Number(data?.confidence ?? 0);
+			const scores: EmotionScores = data?.scores || data?.emotions || {};
+			const clarity = typeof data?.clarity === "number" ? data.clarity : undefined;
+			setDominant(dom);
+			setConfidence(conf);
+			samplesRef.current.push({
+				timestamp: Date.now(),
+				dominant: dom,
+				confidence: conf,
+				scores,
+				clarity,
+			});
+			// Persist periodically
+			if (samplesRef.current.length % 3 === 0) {
+				saveSummary();
+			}
+		},
+		[saveSummary]
+	);
+
 	const captureAndAnalyze = useCallback(async () => {
 		if (!videoRef.current || !canvasRef.current) return;
 		const video = videoRef.current;
@@ -211,6 +239,22 @@ export default function EmotionTracker({
 		canvas.width = video.videoWidth || 320;
 		canvas.height = video.videoHeight || 240;
 		ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
+
+		const socket = socketRef.current;
+		if (socket && socket.readyState === WebSocket.OPEN) {
+			// Skip the tick while the previous frame is still being sent;
+			// the service itself drops frames it cannot analyze in time
+			if (socket.bufferedAmount > 0) return;
+			canvas.toBlob(
+				(blob) => {
+					if (blob && socket.readyState === WebSocket.OPEN) socket.send(blob);
+				},
+				"image/jpeg",
+				0.6
+			);
+			return;
+		}
+
 		const imageBase64 = canvas.toDataURL("image/jpeg", 0.6);
 		try {
 			const res = await fetch("/api/emotion/analyze", {
@@ -220,28 +264,42 @@ export default function EmotionTracker({
 			});
 			const json = await res.json();
 			if (!json?.success) return;
-			const data = json.data || {};
-			const dom = data?.dominant || data?.emotion || "";
-			const conf = Number(data?.confidence ?? 0);
-			const scores: EmotionScores = data?.scores || data?.emotions || {};
-			const clarity = typeof data?.clarity === "number" ? data.clarity : undefined;
-			setDominant(dom);
-			setConfidence(conf);
-			samplesRef.current.push({
-				timestamp: Date.now(),
-				dominant: dom,
-				confidence: conf,
-				scores,
-				clarity,
-			});
-			// Persist periodically
-			if (samplesRef.current.length % 3 === 0) {
-				saveSummary();
-			}
+			recordSample(json.data || {});
 		} catch {
 			// Silent failure: do not impact main app
 		}
-	}, [interviewId, saveSummary]);
+	}, [interviewId, recordSample]);
+
+	// Open one WebSocket per session while tracking, results are pushed back
+	useEffect(() => {
+		if (!streamUrl || !isTracking || !enabled) return;
+		let socket: WebSocket;
+		try {
+			socket = new WebSocket(
+				`${streamUrl.replace(/\/$/, "")}/stream/${encodeURIComponent(interviewId)}`
+			);
+		} catch (e) {
+			console.warn("Emotion stream unavailable, using HTTP:", e);
+			return;
+		}
+		socket.onmessage = (event) => {
+			try {
+				const message = JSON.parse(event.data);
+				if (message?.type === "result" && message.sample) {
+					recordSample(message.sample);
+				}
+			} catch {}
+		};
+		socket.onclose = () => {
+			// Frames fall back to the HTTP route
+			if (socketRef.current === socket) socketRef.current = null;
+		};
+		socketRef.current = socket;
+		return () => {
+			if (socketRef.current === socket) socketRef.current = null;
+			socket.close();
+		};
+	}, [streamUrl, isTracking, enabled, interviewId, recordSample]);
 
 	// Start/stop capture based on tracking state
 	useEffect(() => {
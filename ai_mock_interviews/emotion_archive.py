@@ -0,0 +1,421 @@
+"""
+Columnar archive of interview session histories
+All sessions share one float32 score matrix (one row per detection, columns
+in EMOTION_LABELS order) and one timestamp column, stored as .npy files next
+to the row offsets of every session and a JSON manifest. Opening an archive
+memory-maps the columns, so each session is a zero-copy slice and a cohort of
+thousands of interviews is re-scored without parsing JSON or re-running
+inference. Sessions come from the tracks of emotion_offline/emotion_video or
+from recognizers with a history buffer; live EmotionService sessions keep no
+history and are not archived
+
+Layout of an archive directory:
+    scores.npy      float32 (rows, 7) emotion percentages
+    timestamps.npy  float64 (rows,) seconds since each session started
+    offsets.npy     int64 (sessions + 1,) first row of every session
+    sessions.json   format version, labels, session ids and metadata
+
+Run with: python emotion_archive.py build results.jsonl -o archive
+          python emotion_archive.py summary archive --json cohort.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+from emotion_stats import (
+    CONFIDENCE_WEIGHTS,
+    EMOTION_LABELS,
+    score_emotions,
+    summarize_emotion_matrix,
+)
+
+
+ARCHIVE_VERSION = 1
+SCORES_FILE = 'scores.npy'
+TIMESTAMPS_FILE = 'timestamps.npy'
+OFFSETS_FILE = 'offsets.npy'
+MANIFEST_FILE = 'sessions.json'
+
+SCORES_DTYPE = np.dtype('<f4')
+TIMESTAMPS_DTYPE = np.dtype('<f8')
+
+
+def _write_npy(path, raw_path, dtype, shape):
+    """Write a .npy file from a raw little-endian data file without loading it"""
+    with open(path, 'wb') as f:
+        np.lib.format.write_array_header_1_0(f, {
+            'descr': np.lib.format.dtype_to_descr(dtype),
+            'fortran_order': False,
+            'shape': shape,
+        })
+        with open(raw_path, 'rb') as raw:
+            shutil.copyfileobj(raw, f, 1 << 20)
+    os.remove(raw_path)
+
+
+class SessionArchiveWriter:
+    """Appends sessions to a new archive, streaming rows to disk"""
+
+    def __init__(self, path, labels=EMOTION_LABELS):
+        """
+        Args:
+            path: Archive directory, created if needed; an archive already in
+                it is replaced on close
+            labels: Score column order
+        """
+        self.path = path
+        self.labels = list(labels)
+        os.makedirs(path, exist_ok=True)
+        # Rows go to raw files first, the .npy headers need the final shapes
+        self.scores_file = open(os.path.join(path, SCORES_FILE + '.part'), 'wb')
+        self.timestamps_file = open(os.path.join(path, TIMESTAMPS_FILE + '.part'), 'wb')
+        self.offsets = [0]
+        self.sessions = []
+        self.session_ids = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def add(self, session_id, probabilities, timestamps=None, metadata=None):
+        """
+        Append one session
+
+        Args:
+            session_id: Unique session id, e.g. the interview id or video path
+            probabilities: Array of shape (N, len(labels)) with emotion
+                percentages
+            timestamps: N timestamps in seconds (default: one per second)
+            metadata: JSON-serializable dictionary kept in the manifest
+        """
+        if session_id in self.session_ids:
+            raise ValueError(f"Duplicate session id: {session_id}")
+        probabilities = np.ascontiguousarray(probabilities, dtype=SCORES_DTYPE)
+        if probabilities.ndim != 2 or probabilities.shape[1] != len(self.labels):
+            raise ValueError(f"Expected scores of shape (N, {len(self.labels)}), "
+                             f"got {probabilities.shape}")
+        if timestamps is None:
+            timestamps = np.arange(len(probabilities))
+        timestamps = np.ascontiguousarray(timestamps, dtype=TIMESTAMPS_DTYPE)
+        if timestamps.shape != (len(probabilities),):
+            raise ValueError(f"Expected {len(probabilities)} timestamps, got {timestamps.shape}")
+
+        probabilities.tofile(self.scores_file)
+        timestamps.tofile(self.timestamps_file)
+        self.offsets.append(self.offsets[-1] + len(probabilities))
+        self.sessions.append({'id': session_id, 'metadata': metadata or {}})
+        self.session_ids.add(session_id)
+
+    def add_track(self, session_id, samples, metadata=None):
+        """
+        Append a session from analyzed samples, e.g. the 'track' of an
+        emotion_video or emotion_offline result row
+
+        Args:
+            session_id: Unique session id
+            samples: Sample dictionaries with 'scores' and optionally 't'
+            metadata: Dictionary kept in the manifest
+        """
+        scores = [[sample['scores'].get(name, 0.0) for name in self.labels] for sample in samples]
+        timestamps = [sample.get('t', i) for i, sample in enumerate(samples)]
+        self.add(session_id, np.array(scores, dtype=SCORES_DTYPE).reshape(-1, len(self.labels)),
+                 timestamps, metadata)
+
+    def add_recognizer(self, session_id, recognizer, metadata=None, partial=False):
+        """
+        Append the buffered history of an EmotionRecognition session (it
+        needs a history_size covering the session). Live EmotionService
+        sessions keep no history and cannot be archived; archive the tracks
+        of emotion_offline/emotion_video instead
+
+        Args:
+            session_id: Unique session id
+            recognizer: EmotionRecognition
+            metadata: Dictionary kept in the manifest
+            partial: Archive only the buffered tail of a longer session,
+                marked with 'truncated' in its metadata
+
+        Raises:
+            ValueError: If the session is longer than its buffer and partial
+                is False
+        """
+        probabilities, timestamps = recognizer.export_history(partial)
+        if len(probabilities) < recognizer.session_stats.count:
+            metadata = dict(metadata or {}, truncated=True)
+        self.add(session_id, probabilities, timestamps, metadata)
+
+    def close(self):
+        """Write the .npy headers, offsets and manifest"""
+        if self.scores_file is None:
+            return
+        self.scores_file.close()
+        self.timestamps_file.close()
+        self.scores_file = self.timestamps_file = None
+        rows = self.offsets[-1]
+        _write_npy(os.path.join(self.path, SCORES_FILE),
+                   os.path.join(self.path, SCORES_FILE + '.part'),
+                   SCORES_DTYPE, (rows, len(self.labels)))
+        _write_npy(os.path.join(self.path, TIMESTAMPS_FILE),
+                   os.path.join(self.path, TIMESTAMPS_FILE + '.part'),
+                   TIMESTAMPS_DTYPE, (rows,))
+        np.save(os.path.join(self.path, OFFSETS_FILE), np.array(self.offsets, dtype='<i8'))
+        with open(os.path.join(self.path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'version': ARCHIVE_VERSION, 'labels': self.labels,
+                       'sessions': self.sessions}, f)
+
+
+class SessionArchive:
+    """Read-only view of an archive written by SessionArchiveWriter"""
+
+    def __init__(self, path, mmap=True):
+        """
+        Args:
+            path: Archive directory
+            mmap: Memory-map the columns (default) instead of reading them
+        """
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != ARCHIVE_VERSION:
+            raise ValueError(f"Unsupported archive version: {manifest.get('version')}")
+        self.labels = manifest['labels']
+        self.session_ids = [session['id'] for session in manifest['sessions']]
+        self.metadata = [session['metadata'] for session in manifest['sessions']]
+        self.index = {session_id: i for i, session_id in enumerate(self.session_ids)}
+        mmap_mode = 'r' if mmap else None
+        self.scores = np.load(os.path.join(path, SCORES_FILE), mmap_mode=mmap_mode)
+        self.timestamps = np.load(os.path.join(path, TIMESTAMPS_FILE), mmap_mode=mmap_mode)
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE))
+        if len(self.offsets) != len(self.session_ids) + 1 or self.offsets[-1] != len(self.scores):
+            raise ValueError(f"Archive {path} is inconsistent")
+
+    def __len__(self):
+        return len(self.session_ids)
+
+    def __contains__(self, session_id):
+        return session_id in self.index
+
+    def __getitem__(self, key):
+        """
+        Args:
+            key: Session id or position
+
+        Returns:
+            Tuple of (scores, timestamps) views of the session, no copy
+        """
+        i = self.index[key] if isinstance(key, str) else key
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.scores[start:end], self.timestamps[start:end]
+
+    @property
+    def counts(self):
+        """Detections per session"""
+        return np.diff(self.offsets)
+
+    def summary(self, key, weights=CONFIDENCE_WEIGHTS):
+        """
+        Re-score one session
+
+        Args:
+            key: Session id or position
+            weights: Confidence weight per emotion
+
+        Returns:
+            Dictionary in the same shape as EmotionRecognition.get_session_summary
+            (without timeline segments)
+        """
+        return summarize_emotion_matrix(self[key][0], weights, self.labels)
+
+    def restore(self, key, **kwargs):
+        """
+        Rebuild a session as an EmotionRecognition, with its timeline
+
+        Args:
+            key: Session id or position
+            kwargs: EmotionRecognition arguments, e.g. confidence_weights
+
+        Returns:
+            EmotionRecognition holding the session
+        """
+        from emotion_recognition import EmotionRecognition
+
+        scores, timestamps = self[key]
+        kwargs.setdefault('history_size', len(scores))
+        recognizer = EmotionRecognition(**kwargs)
+        recognizer.import_history(scores, timestamps)
+        return recognizer
+
+    def rescore(self, weights=CONFIDENCE_WEIGHTS, chunk_rows=1 << 20):
+        """
+        Re-score every session in vectorized passes over the whole archive
+
+        Args:
+            weights: Confidence weight per emotion
+            chunk_rows: Rows scored per pass, bounds the float64 working memory
+
+        Returns:
+            Dictionary of per-session arrays: counts, averages (sessions x
+            labels), avgConfidence, avgClarity and dominantCounts (sessions x
+            labels); sessions without detections average 0
+        """
+        sessions, labels = len(self), len(self.labels)
+        counts = self.counts
+        sums = np.zeros((sessions, labels))
+        confidence_sums = np.zeros(sessions)
+        clarity_sums = np.zeros(sessions)
+        dominant_counts = np.zeros(sessions * labels, dtype=np.int64)
+        for start in range(0, len(self.scores), chunk_rows):
+            chunk = np.asarray(self.scores[start:start + chunk_rows], dtype=np.float64)
+            # Session of every row in the chunk
+            rows = np.searchsorted(self.offsets, np.arange(start, start + len(chunk)),
+                                   side='right') - 1
+            dominant, confidence, clarity = score_emotions(chunk, weights)
+            for column in range(labels):
+                sums[:, column] += np.bincount(rows, chunk[:, column], minlength=sessions)
+            confidence_sums += np.bincount(rows, confidence, minlength=sessions)
+            clarity_sums += np.bincount(rows, clarity, minlength=sessions)
+            dominant_counts += np.bincount(rows * labels + dominant, minlength=sessions * labels)
+
+        divisor = np.maximum(counts, 1)
+        return {
+            'counts': counts,
+            'averages': sums / divisor[:, None],
+            'avgConfidence': confidence_sums / divisor,
+            'avgClarity': clarity_sums / divisor,
+            'dominantCounts': dominant_counts.reshape(sessions, labels),
+        }
+
+    def cohort_summary(self, weights=CONFIDENCE_WEIGHTS):
+        """
+        Summarize the cohort, every session weighted equally
+
+        Args:
+            weights: Confidence weight per emotion
+
+        Returns:
+            Dictionary with session and detection counts, the mean of the
+            session averages, session confidence percentiles and how many
+            sessions each emotion dominated
+        """
+        scores = self.rescore(weights)
+        present = scores['counts'] > 0
+        if not present.any():
+            return {'sessions': len(self), 'detections': 0}
+        confidence = scores['avgConfidence'][present]
+        most_common = np.argmax(scores['dominantCounts'][present], axis=1)
+        dominated = np.bincount(most_common, minlength=len(self.labels))
+        return {
+            'sessions': len(self),
+            'detections': int(scores['counts'].sum()),
+            'averages': dict(zip(self.labels, scores['averages'][present].mean(axis=0).tolist())),
+            'avgConfidence': float(confidence.mean()),
+            'confidencePercentiles': {f"p{q}": float(np.percentile(confidence, q))
+                                      for q in (10, 50, 90)},
+            'avgClarity': float(scores['avgClarity'][present].mean()),
+            'dominantSessions': {self.labels[i]: int(count)
+                                 for i, count in enumerate(dominated) if count},
+        }
+
+
+def _result_tracks(results_path):
+    """
+    Yield (session_id, samples, metadata) for every video track in a results
+    file: emotion_offline JSONL rows, an emotion_video JSON result, or an
+    emotion_video JSONL track (one sample per line, archived as one session
+    named after the file)
+    """
+    with open(results_path, encoding='utf-8') as f:
+        if results_path.lower().endswith('.json'):
+            rows = [json.load(f)]
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        samples = []
+        for row in rows:
+            if 'type' not in row and 'scores' in row:
+                samples.append(row)
+            elif row.get('type') == 'video' and row.get('track'):
+                yield row['path'], row['track'], {'path': row['path'], 'fps': row.get('fps')}
+    if samples:
+        yield results_path, samples, {'path': results_path}
+
+
+def archive_results(results_path, archive_path):
+    """
+    Convert emotion_offline/emotion_video results to an archive, once: later
+    analyses load the archive instead of parsing the JSON again
+
+    Args:
+        results_path: emotion_offline JSONL results, or an emotion_video
+            result (.json) or track (.jsonl)
+        archive_path: Archive directory to write
+
+    Returns:
+        Number of sessions archived
+
+    Raises:
+        ValueError: If the file holds no video track; no archive is written
+    """
+    writer = None
+    try:
+        for session_id, samples, metadata in _result_tracks(results_path):
+            if writer is None:
+                writer = SessionArchiveWriter(archive_path)
+            writer.add_track(session_id, samples, metadata)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError(f"No video tracks in {results_path} (emotion_offline.py "
+                         f"writes them for videos unless run with --no-track)")
+    return len(writer)
+
+
+def main():
+    """Main function with CLI interface"""
+    parser = argparse.ArgumentParser(description="Columnar archive of emotion session histories")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="Archive the video tracks of a results file")
+    build.add_argument('results', help="emotion_offline JSONL, or emotion_video JSON result "
+                       "or JSONL track")
+    build.add_argument('--output', '-o', required=True, help="Archive directory")
+    summary = commands.add_parser('summary', help="Re-score an archive")
+    summary.add_argument('archive', help="Archive directory")
+    summary.add_argument('--sessions', action='store_true', help="Print every session")
+    summary.add_argument('--json', help="Write the cohort summary to this JSON file")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        try:
+            count = archive_results(args.results, args.output)
+        except ValueError as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Archived {count} sessions to {args.output}", file=sys.stderr)
+        return
+
+    archive = SessionArchive(args.archive)
+    cohort = archive.cohort_summary()
+    if args.sessions:
+        scores = archive.rescore()
+        for i, session_id in enumerate(archive.session_ids):
+            dominant = archive.labels[int(np.argmax(scores['dominantCounts'][i]))]
+            print(f"{session_id}: {scores['counts'][i]} detections, "
+                  f"confidence {scores['avgConfidence'][i]:.1f}%, mostly {dominant}")
+    print(json.dumps(cohort, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(cohort, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Micro-batching scheduler for emotion inference
+Collects frames from many callers over a short window and classifies them
+in one batched pass
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from emotion_recognition import EmotionRecognition
+
+
+class MicroBatchScheduler:
+    def __init__(self, recognizer=None, backend='opencv', max_batch_size=16, max_wait_ms=20,
+                 history_size=1024):
+        """
+        Args:
+            recognizer: EmotionRecognition used for inference
+            backend: Face detection backend
+            max_batch_size: Run a batch as soon as this many frames are waiting
+            max_wait_ms: Longest time the first frame of a batch waits for others
+            history_size: Number of recent batches/waits kept for percentiles
+        """
+        self.recognizer = recognizer or EmotionRecognition()
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = queue.Queue()
+        self.running = False
+        self.thread = None
+
+        # Metrics
+        self.lock = threading.Lock()
+        self.frames_processed = 0
+        self.batches_processed = 0
+        self.batch_sizes = np.zeros(history_size, dtype=np.int32)
+        self.queue_waits = np.zeros(history_size, dtype=np.float64)
+        self.batch_index = 0
+        self.wait_index = 0
+
+    def start(self):
+        """Start the batching thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="emotion-batcher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the batching thread after the current batch"""
+        if not self.running:
+            return
+        self.running = False
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        # Frames that never made it into a batch are cancelled
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].cancel()
+
+    def submit(self, frame, preferred_backend=None):
+        """
+        Queue a frame for the next batch
+
+        Args:
+            frame: Video frame as numpy array (BGR)
+            preferred_backend: Cascade backend tried first for this frame,
+                e.g. the last winner of its session
+
+        Returns:
+            concurrent.futures.Future resolving to the DeepFace-format result
+            (or None if no emotions could be detected); it raises the error
+            if the whole batch failed
+        """
+        if not self.running:
+            self.start()
+        future = Future()
+        self.queue.put((frame, future, time.perf_counter(), preferred_backend))
+        return future
+
+    def detect_emotions_from_frame(self, frame, timeout=None):
+        """
+        Blocking helper with the same result as
+        EmotionRecognition.detect_emotions_from_frame, served through a batch
+
+        Args:
+            frame: Video frame as numpy array (BGR)
+            timeout: Seconds to wait for the result
+
+        Returns:
+            DeepFace-format result or None
+        """
+        return self.submit(frame).result(timeout)
+
+    def _collect_batch(self):
+        """Block for the first frame, then gather more until the window closes"""
+        first = self.queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Stop requested, finish this batch first
+                self.running = False
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while self.running:
+            batch = self._collect_batch()
+            if batch is None:
+                break
+
+            started = time.perf_counter()
+            frames = [item[0] for item in batch]
+            try:
+                # Same cache and per-session cascade start as single frames
+                results = self.recognizer.detect_emotions_batch(
+                    frames, self.backend, [item[3] for item in batch])
+            except Exception as e:
+                print(f"Error in emotion batch of {len(batch)} frames: {str(e)}")
+                self.recognizer.metrics.increment('errors', self.backend, len(batch))
+                self.recognizer.last_error = str(e)
+                for item in batch:
+                    if item[1].set_running_or_notify_cancel():
+                        item[1].set_exception(e)
+            else:
+                for item, result in zip(batch, results):
+                    if item[1].set_running_or_notify_cancel():
+                        item[1].set_result(result)
+
+            self._record_batch(len(batch), [started - item[2] for item in batch])
+
+    def _record_batch(self, size, waits):
+        with self.lock:
+            self.frames_processed += size
+            self.batches_processed += 1
+            self.batch_sizes[self.batch_index % len(self.batch_sizes)] = size
+            self.batch_index += 1
+            for wait in waits:
+                self.queue_waits[self.wait_index % len(self.queue_waits)] = wait
+                self.wait_index += 1
+
+    def get_metrics(self):
+        """
+        Get batch size and queue wait statistics
+
+        Returns:
+            Dictionary with frame/batch counters, batch size and queue wait
+            (milliseconds) statistics over the recent history
+        """
+        with self.lock:
+            sizes = self.batch_sizes[:min(self.batch_index, len(self.batch_sizes))]
+            waits = self.queue_waits[:min(self.wait_index, len(self.queue_waits))] * 1000.0
+            metrics = {
+                'frames_processed': self.frames_processed,
+                'batches_processed': self.batches_processed,
+                'queue_depth': self.queue.qsize(),
+                'avg_batch_size': float(sizes.mean()) if len(sizes) else 0.0,
+                'max_batch_size': int(sizes.max()) if len(sizes) else 0,
+                'avg_queue_wait_ms': float(waits.mean()) if len(waits) else 0.0,
+                'p95_queue_wait_ms': float(np.percentile(waits, 95)) if len(waits) else 0.0
+            }
+        return metrics
@@ -0,0 +1,1662 @@
+"""
+Benchmarks for the emotion recognition pipeline
+Run with: python emotion_benchmark.py <benchmark> [options]
+Everything runs offline on synthetic frames unless --corpus points at a
+folder of face images; --json records the results for later --compare runs
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from emotion_batching import MicroBatchScheduler
+from emotion_faces import face_boxes, iou_matrix, primary_face
+from emotion_loadgen import add_load_arguments
+from emotion_offline import IMAGE_EXTENSIONS
+from emotion_preprocess import DetectionPreprocessor, working_shape
+from emotion_recognition import EMOTION_LABELS, EmotionRecognition, decode_image_bytes
+from emotion_stats import emotions_to_matrix, score_emotions, summarize_emotion_matrix
+
+
+def make_synthetic_frame(width=640, height=480, seed=0):
+    """
+    Build a deterministic BGR test frame with a rough face-like blob
+
+    Args:
+        width: Frame width in pixels
+        height: Frame height in pixels
+        seed: Random seed for the background noise
+
+    Returns:
+        BGR frame as numpy array
+    """
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+    center = (width // 2, height // 2)
+    axes = (width // 8, height // 5)
+    cv2.ellipse(frame, center, axes, 0, 0, 360, (150, 180, 220), -1)
+    eye_y = center[1] - axes[1] // 3
+    for eye_x in (center[0] - axes[0] // 2, center[0] + axes[0] // 2):
+        cv2.circle(frame, (eye_x, eye_y), max(axes[0] // 8, 2), (40, 40, 40), -1)
+    cv2.ellipse(frame, (center[0], center[1] + axes[1] // 2), (axes[0] // 2, axes[1] // 8),
+                0, 0, 180, (60, 60, 160), 3)
+    return frame
+
+
+def load_frame(image_path=None, width=640, height=480):
+    """
+    Load the benchmark frame from disk or fall back to a synthetic one
+
+    Args:
+        image_path: Optional path to an image file
+        width: Synthetic frame width
+        height: Synthetic frame height
+
+    Returns:
+        BGR frame as numpy array
+    """
+    if image_path:
+        frame = cv2.imread(image_path)
+        if frame is None:
+            raise FileNotFoundError(f"Could not read image: {image_path}")
+        return frame
+    return make_synthetic_frame(width, height)
+
+
+def load_corpus(corpus=None, count=16, width=640, height=480):
+    """
+    Load every image of a local corpus directory, or synthetic frames
+
+    Args:
+        corpus: Directory searched recursively for images
+        count: Number of synthetic frames when no corpus is given
+        width: Synthetic frame width
+        height: Synthetic frame height
+
+    Returns:
+        List of (name, BGR frame) tuples
+    """
+    if not corpus:
+        return [(f"synthetic-{i}", make_synthetic_frame(width, height, seed=i)) for i in range(count)]
+    frames = []
+    for root, _, names in os.walk(corpus):
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                path = os.path.join(root, name)
+                frame = cv2.imread(path)
+                if frame is not None:
+                    frames.append((path, frame))
+    if not frames:
+        raise FileNotFoundError(f"No readable images in {corpus}")
+    return frames
+
+
+def time_call(func, iterations, warmup=1):
+    """
+    Time repeated calls of func
+
+    Args:
+        func: Zero-argument callable to time
+        iterations: Number of timed calls
+        warmup: Number of untimed calls made first
+
+    Returns:
+        Dictionary with mean, p50, p95 and min latency in milliseconds
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples = np.array(samples)
+    return {
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'min_ms': float(samples.min()),
+        'iterations': iterations,
+    }
+
+
+def print_results(title, results):
+    """
+    Print a table of benchmark results
+
+    Args:
+        title: Table heading
+        results: Dictionary of case name -> timing dictionary
+    """
+    print("\n" + "=" * 70)
+    print(title)
+    print("-" * 70)
+    print(f"{'case':30s} {'mean':>9s} {'p50':>9s} {'p95':>9s} {'min':>9s}")
+    for name, stats in results.items():
+        print(f"{name:30s} {stats['mean_ms']:8.2f}ms {stats['p50_ms']:8.2f}ms "
+              f"{stats['p95_ms']:8.2f}ms {stats['min_ms']:8.2f}ms")
+    print("=" * 70)
+
+
+def bench_frame_path(args):
+    """
+    Compare the legacy temp-JPEG frame path with the in-memory path
+    """
+    frame = load_frame(args.image, args.width, args.height)
+    ok, encoded = cv2.imencode(".jpg", frame)
+    jpeg_bytes = encoded.tobytes()
+
+    def temp_file_io():
+        temp_path = "benchmark_temp_frame.jpg"
+        cv2.imwrite(temp_path, frame)
+        cv2.imread(temp_path)
+        os.remove(temp_path)
+
+    results = {
+        'io: temp jpeg round-trip': time_call(temp_file_io, args.iterations),
+        'io: zero-copy': time_call(lambda: frame, args.iterations),
+        'io: decode jpeg bytes': time_call(lambda: decode_image_bytes(jpeg_bytes), args.iterations),
+    }
+
+    if not args.io_only:
+        recognizer = EmotionRecognition()
+        results['full: temp jpeg (before)'] = time_call(
+            lambda: recognizer.detect_emotions_from_frame(frame, args.backend, zero_copy=False),
+            args.iterations)
+        results['full: zero-copy (after)'] = time_call(
+            lambda: recognizer.detect_emotions_from_frame(frame, args.backend),
+            args.iterations)
+        results['full: jpeg bytes in memory'] = time_call(
+            lambda: recognizer.detect_emotions_from_bytes(jpeg_bytes, args.backend),
+            args.iterations)
+
+    print_results(f"Per-frame latency ({frame.shape[1]}x{frame.shape[0]}, backend={args.backend})",
+                  results)
+    return results
+
+
+def bench_batching(args):
+    """
+    Compare frames/sec of the per-frame path with the micro-batching scheduler
+    fed by many concurrent callers
+    """
+    frames = [load_frame(args.image, args.width, args.height) if args.image
+              else make_synthetic_frame(args.width, args.height, seed=i)
+              for i in range(args.frames)]
+    recognizer = EmotionRecognition()
+    # Load the model once so neither path pays for it
+    recognizer.detect_emotions_from_frame(frames[0], args.backend)
+
+    start = time.perf_counter()
+    for frame in frames:
+        recognizer.detect_emotions_from_frame(frame, args.backend)
+    per_frame_elapsed = time.perf_counter() - start
+
+    scheduler = MicroBatchScheduler(recognizer, args.backend,
+                                    max_batch_size=args.batch_size,
+                                    max_wait_ms=args.window_ms)
+    scheduler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as callers:
+        list(callers.map(scheduler.detect_emotions_from_frame, frames))
+    batched_elapsed = time.perf_counter() - start
+    metrics = scheduler.get_metrics()
+    scheduler.stop()
+
+    results = {
+        'per_frame_fps': len(frames) / per_frame_elapsed,
+        'batched_fps': len(frames) / batched_elapsed,
+        'speedup': per_frame_elapsed / batched_elapsed,
+        'scheduler': metrics,
+    }
+    print("\n" + "=" * 70)
+    print(f"Throughput over {len(frames)} frames (backend={args.backend}, "
+          f"concurrency={args.concurrency}, window={args.window_ms}ms, max batch={args.batch_size})")
+    print("-" * 70)
+    print(f"Per-frame path: {results['per_frame_fps']:8.2f} frames/sec")
+    print(f"Micro-batched:  {results['batched_fps']:8.2f} frames/sec ({results['speedup']:.2f}x)")
+    print(f"Avg batch size: {metrics['avg_batch_size']:.2f} (max {metrics['max_batch_size']})")
+    print(f"Queue wait:     avg {metrics['avg_queue_wait_ms']:.2f}ms, "
+          f"p95 {metrics['p95_queue_wait_ms']:.2f}ms")
+    print("=" * 70)
+    return results
+
+
+# Runs in a fresh interpreter so import and model loading are really cold
+STARTUP_SCRIPT = """
+import json, sys, time
+import numpy as np
+start = time.perf_counter()
+from emotion_recognition import EmotionRecognition
+import_time = time.perf_counter() - start
+recognizer = EmotionRecognition()
+backends = sys.argv[1].split(',')
+warmup = sys.argv[2] == '1'
+report = recognizer.warm_up(backends) if warmup else None
+frame = np.zeros((480, 640, 3), dtype=np.uint8)
+step = time.perf_counter()
+recognizer.detect_emotions_from_frame(frame, backends[0])
+first_inference = time.perf_counter() - step
+step = time.perf_counter()
+recognizer.detect_emotions_from_frame(frame, backends[0])
+second_inference = time.perf_counter() - step
+print(json.dumps({'import_s': import_time, 'warmup': report,
+                  'first_inference_s': first_inference,
+                  'second_inference_s': second_inference,
+                  'total_s': time.perf_counter() - start}))
+"""
+
+
+def run_startup_process(backends, warmup):
+    """
+    Measure one cold process start
+
+    Args:
+        backends: List of detection backends
+        warmup: Whether to call warm_up before the first inference
+
+    Returns:
+        Dictionary with import, warm-up and first/second inference timings
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT, ",".join(backends), "1" if warmup else "0"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    ).stdout
+    # DeepFace may log to stdout, the JSON line comes last
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_startup(args):
+    """
+    Measure cold-start cost with and without an explicit warm-up
+    """
+    backends = args.backends.split(',')
+    cold = run_startup_process(backends, warmup=False)
+    warm = run_startup_process(backends, warmup=True)
+
+    print("\n" + "=" * 70)
+    print(f"Cold start (backends={','.join(backends)})")
+    print("-" * 70)
+    print(f"Module import:                 {cold['import_s']:8.2f}s")
+    print(f"First inference, no warm-up:   {cold['first_inference_s']:8.2f}s")
+    print(f"Second inference, no warm-up:  {cold['second_inference_s']:8.2f}s")
+    print("-" * 70)
+    report = warm['warmup']
+    print(f"Warm-up total:                 {report['total']:8.2f}s")
+    print(f"  emotion model:               {report['emotion_model']:8.2f}s")
+    for backend in backends:
+        if backend in report['errors']:
+            print(f"  {backend:28s} failed: {report['errors'][backend]}")
+            continue
+        print(f"  {backend + ' detector:':28s} {report['detectors'][backend]:8.2f}s")
+        print(f"  {backend + ' dummy inference:':28s} {report['inference'][backend]:8.2f}s")
+    print(f"First inference after warm-up: {warm['first_inference_s']:8.2f}s")
+    print("=" * 70)
+    return {'cold': cold, 'warm': warm}
+
+
+def make_emotion_samples(count, seed=0):
+    """
+    Build random DeepFace-style emotion dictionaries (float32 percentages)
+
+    Args:
+        count: Number of samples
+        seed: Random seed
+
+    Returns:
+        List of emotion dictionaries
+    """
+    rng = np.random.default_rng(seed)
+    probabilities = (rng.dirichlet(np.ones(len(EMOTION_LABELS)), size=count) * 100).astype(np.float32)
+    return [dict(zip(EMOTION_LABELS, row)) for row in probabilities]
+
+
+class ListSessionStats:
+    """Reference implementation of the original list-based session statistics"""
+
+    def __init__(self):
+        self.session_data = {name: [] for name in EMOTION_LABELS}
+        self.dominant_emotions = []
+        self.confidence_scores = []
+        self.detection_clarity = []
+
+    def record(self, emotions):
+        # Scored with the original scalar formulas, independent of record_emotions
+        dominant, confidence, clarity = score_emotions_scalar(emotions)
+        for name, value in emotions.items():
+            self.session_data[name].append(value)
+        self.dominant_emotions.append(dominant)
+        self.confidence_scores.append(confidence)
+        self.detection_clarity.append(clarity)
+
+    def summary(self):
+        averages = {name: (sum(values) / len(values) if values else 0.0)
+                    for name, values in self.session_data.items()}
+        return {
+            'averages': averages,
+            'dominantCounts': dict(Counter(self.dominant_emotions)),
+            'avgConfidence': sum(self.confidence_scores) / len(self.confidence_scores),
+            'avgClarity': sum(self.detection_clarity) / len(self.detection_clarity),
+            'mostCommon': Counter(self.dominant_emotions).most_common(1)[0],
+        }
+
+
+def bench_stats(args):
+    """
+    Check the streaming statistics against the original list-based ones and
+    compare their cost at several session lengths
+    """
+    results = {}
+    for count in args.samples:
+        samples = make_emotion_samples(count)
+        recognizer = EmotionRecognition()
+        reference = ListSessionStats()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        for emotions in samples:
+            recognizer.record_emotions({'emotion': emotions})
+        record_elapsed = time.perf_counter() - start
+        streaming_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        for emotions in samples:
+            reference.record(emotions)
+        list_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        # Parity: the streaming accumulator must reproduce the list-based results.
+        # The scores are float32 like DeepFace's, which the original formulas
+        # and sums keep, while the accumulator works in float64
+        expected = reference.summary()
+        actual = recognizer.get_session_summary()
+        for name in EMOTION_LABELS:
+            assert np.isclose(actual['averages'][name], expected['averages'][name], rtol=1e-5), name
+        assert np.isclose(actual['avgConfidence'], expected['avgConfidence'], rtol=1e-5)
+        assert np.isclose(actual['avgClarity'], expected['avgClarity'], rtol=1e-5)
+        assert actual['dominantCounts'] == expected['dominantCounts']
+        assert recognizer.session_stats.most_common_dominant() == expected['mostCommon']
+        assert actual['totalDetections'] == count
+
+        results[f"{count} samples: streaming summary"] = time_call(
+            recognizer.get_session_summary, args.iterations)
+        results[f"{count} samples: list summary"] = time_call(
+            reference.summary, args.iterations)
+        print(f"{count} samples: parity OK, record {record_elapsed / count * 1e6:.1f}us/sample, "
+              f"memory streaming {streaming_memory / 1024:.0f}KiB vs lists {list_memory / 1024:.0f}KiB")
+
+    print_results("Session statistics cost", results)
+    return results
+
+
+def score_emotions_scalar(emotions):
+    """Reference implementation of the original per-detection scalar scoring"""
+    dominant = max(emotions.items(), key=lambda x: x[1])[0]
+    weighted_sum = (
+        (emotions.get('neutral', 0) / 100.0 * 0.50) +
+        (emotions.get('happy', 0) / 100.0 * 0.60) +
+        (emotions.get('fear', 0) / 100.0 * -0.30) +
+        (emotions.get('sad', 0) / 100.0 * -0.20) +
+        (emotions.get('disgust', 0) / 100.0 * -0.15) +
+        (emotions.get('angry', 0) / 100.0 * -0.10) +
+        (emotions.get('surprise', 0) / 100.0 * -0.05)
+    )
+    confidence = max(min(weighted_sum * 100 + 50.0, 100.0), 45.0)
+    sorted_emotions = sorted(emotions.items(), key=lambda x: x[1], reverse=True)
+    clarity = sorted_emotions[0][1] - sorted_emotions[1][1]
+    return dominant, confidence, clarity
+
+
+def bench_scoring(args):
+    """
+    Check vectorized scoring against the scalar version and compare their cost
+    """
+    results = {}
+    for count in args.samples:
+        samples = make_emotion_samples(count)
+        matrix = emotions_to_matrix(samples)
+
+        dominant, confidence, clarity = score_emotions(matrix)
+        expected = [score_emotions_scalar(emotions) for emotions in samples]
+        assert [EMOTION_LABELS[i] for i in dominant] == [e[0] for e in expected]
+        assert np.allclose(confidence, [e[1] for e in expected])
+        assert np.allclose(clarity, [e[2] for e in expected], atol=1e-4)
+
+        results[f"{count} rows: scalar loop"] = time_call(
+            lambda: [score_emotions_scalar(emotions) for emotions in samples], args.iterations)
+        results[f"{count} rows: vectorized"] = time_call(
+            lambda: score_emotions(matrix), args.iterations)
+        print(f"{count} rows: parity OK")
+
+    print_results("Emotion scoring cost", results)
+    return results
+
+
+def bench_cascade(args):
+    """
+    Measure detection latency and face hit rate per backend over an image
+    corpus, then the same for the fastest-first backend cascade
+    """
+    frames = load_corpus(args.corpus, args.frames, args.width, args.height)
+    backends = args.backends.split(',') if args.backends != 'opencv' else EmotionRecognition().backends
+    recognizer = EmotionRecognition()
+    recognizer.cascade_backends = backends
+    results = {}
+
+    for backend in backends + ['cascade']:
+        latencies = []
+        hits = 0
+        winners = Counter()
+        error = None
+        recognizer.cascade_backend = None
+        for index, (_, frame) in enumerate(frames):
+            try:
+                if index == 0:
+                    # Untimed first call loads the detector
+                    if backend == 'cascade':
+                        recognizer._extract_faces_cascade(frame)
+                    else:
+                        recognizer._extract_faces(frame, backend)
+                start = time.perf_counter()
+                if backend == 'cascade':
+                    _, winner, found = recognizer._extract_faces_cascade(
+                        frame, preferred=recognizer.cascade_backend)
+                    if found:
+                        recognizer.cascade_backend = winner
+                        winners[winner] += 1
+                else:
+                    found = recognizer._face_found(recognizer._extract_faces(frame, backend), frame)
+                latencies.append((time.perf_counter() - start) * 1000.0)
+                hits += int(found)
+            except Exception as e:
+                error = str(e)
+                break
+
+        if error is not None:
+            results[backend] = {'error': error}
+            continue
+        latencies = np.array(latencies)
+        results[backend] = {
+            'mean_ms': float(latencies.mean()),
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95)),
+            'hit_rate': hits / len(frames),
+        }
+        if backend == 'cascade':
+            results[backend]['winners'] = dict(winners)
+
+    print("\n" + "=" * 70)
+    print(f"Face detection over {len(frames)} images "
+          f"({args.corpus or 'synthetic frames, use --corpus for real faces'})")
+    print("-" * 70)
+    print(f"{'backend':14s} {'mean':>9s} {'p50':>9s} {'p95':>9s} {'hit rate':>9s}")
+    for backend, stats in results.items():
+        if 'error' in stats:
+            print(f"{backend:14s} unavailable: {stats['error'][:50]}")
+            continue
+        print(f"{backend:14s} {stats['mean_ms']:8.2f}ms {stats['p50_ms']:8.2f}ms "
+              f"{stats['p95_ms']:8.2f}ms {stats['hit_rate'] * 100:8.1f}%")
+    if 'winners' in results.get('cascade', {}):
+        print(f"Cascade winners: {results['cascade']['winners']}")
+    print("=" * 70)
+    return results
+
+
+# Runs in a fresh interpreter so each engine's load time and memory are its own
+ENGINE_SCRIPT = """
+import json, sys, time
+import numpy as np
+from emotion_engines import create_engine
+
+def rss_mib():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+options = json.loads(sys.argv[2])
+batch_sizes = [int(size) for size in sys.argv[3].split(',')]
+iterations = int(sys.argv[4])
+baseline = rss_mib()
+start = time.perf_counter()
+engine = create_engine(sys.argv[1], **options)
+engine.load()
+load_time = time.perf_counter() - start
+faces = list(np.random.RandomState(0).randint(0, 255, (max(batch_sizes), 120, 100, 3), np.uint8))
+throughput = {}
+for size in batch_sizes:
+    engine.predict(faces[:size])
+    start = time.perf_counter()
+    for _ in range(iterations):
+        engine.predict(faces[:size])
+    throughput[size] = size * iterations / (time.perf_counter() - start)
+print(json.dumps({'load_s': load_time, 'rss_mib': rss_mib(), 'model_rss_mib': rss_mib() - baseline,
+                  'faces_per_s': throughput}))
+"""
+
+
+def run_engine_process(engine, options, batch_sizes, iterations):
+    """
+    Measure one engine in a fresh process
+
+    Args:
+        engine: Engine name ('deepface' or 'onnx')
+        options: Engine constructor arguments
+        batch_sizes: Batch sizes to measure throughput at
+        iterations: Timed predict calls per batch size
+
+    Returns:
+        Dictionary with load time, resident memory and faces/sec per batch size
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", ENGINE_SCRIPT, engine, json.dumps(options),
+         ",".join(str(size) for size in batch_sizes), str(iterations)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_engines(args):
+    """
+    Check the ONNX engine against the DeepFace engine, then compare load
+    time, memory and throughput of each engine in its own process
+    """
+    from emotion_engines import create_engine
+
+    rng = np.random.RandomState(0)
+    faces = [rng.randint(0, 255, (rng.randint(60, 200), rng.randint(60, 200), 3), np.uint8)
+             for _ in range(args.frames)]
+    reference = create_engine('deepface').predict(faces)
+
+    # Parity: fp32 ONNX must reproduce the Keras model, int8 is reported
+    fp32 = create_engine('onnx').predict(faces)
+    fp32_diff = float(np.abs(fp32 - reference).max())
+    assert fp32_diff < 1e-4, f"ONNX fp32 differs from DeepFace by {fp32_diff}"
+    int8 = create_engine('onnx', quantize=True).predict(faces)
+    int8_diff = float(np.abs(int8 - reference).max())
+    int8_agreement = float((int8.argmax(axis=1) == reference.argmax(axis=1)).mean())
+    print(f"{len(faces)} faces: fp32 parity OK (max diff {fp32_diff:.2e}), "
+          f"int8 max diff {int8_diff:.2e}, dominant agreement {int8_agreement * 100:.1f}%")
+
+    batch_sizes = [1, args.batch_size]
+    threads = {'intra_op_threads': args.engine_threads}
+    variants = {
+        'deepface': ('deepface', {}),
+        'onnx fp32': ('onnx', threads),
+        'onnx int8': ('onnx', dict(threads, quantize=True)),
+    }
+    results = {'parity': {'fp32_max_diff': fp32_diff, 'int8_max_diff': int8_diff,
+                          'int8_dominant_agreement': int8_agreement}}
+    for name, (engine, options) in variants.items():
+        results[name] = run_engine_process(engine, options, batch_sizes, args.iterations)
+
+    print("\n" + "=" * 70)
+    print(f"Emotion engines (threads={args.engine_threads or 'default'})")
+    print("-" * 70)
+    print(f"{'engine':12s} {'load':>8s} {'RSS':>9s} {'model':>9s} "
+          + " ".join(f"{f'batch {size}':>12s}" for size in batch_sizes))
+    for name in variants:
+        stats = results[name]
+        print(f"{name:12s} {stats['load_s']:7.2f}s {stats['rss_mib']:6.0f}MiB "
+              f"{stats['model_rss_mib']:6.0f}MiB "
+              + " ".join(f"{stats['faces_per_s'][str(size)]:8.0f}/s   " for size in batch_sizes))
+    print("=" * 70)
+    return results
+
+
+def simulate_faces(people, frames, seed=0, dropout=0.1):
+    """
+    Simulate detector output for people drifting around a 1280x720 frame
+
+    Args:
+        people: Number of faces
+        frames: Number of analyzed frames
+        seed: Random seed
+        dropout: Chance that the detector misses a face in a frame
+
+    Returns:
+        List of (result list, person index per face) per frame
+    """
+    rng = np.random.RandomState(seed)
+    # People sit side by side, like a panel
+    positions = np.column_stack([np.linspace(100, 1100, people), np.full(people, 300.0)])
+    sizes = rng.uniform(80, 160, people)
+    sequence = []
+    for _ in range(frames):
+        positions += rng.normal(0, 4, positions.shape)
+        faces, owners = [], []
+        for person in rng.permutation(people):
+            if rng.rand() < dropout:
+                continue
+            x, y = positions[person]
+            size = sizes[person] * rng.uniform(0.95, 1.05)
+            emotions = dict(zip(EMOTION_LABELS, rng.dirichlet(np.ones(7)) * 100.0))
+            faces.append({'emotion': emotions,
+                          'dominant_emotion': max(emotions, key=emotions.get),
+                          'region': {'x': int(x), 'y': int(y), 'w': int(size), 'h': int(size)},
+                          'face_confidence': 0.9})
+            owners.append(int(person))
+        sequence.append((faces, owners))
+    return sequence
+
+
+def bench_multiface(args):
+    """
+    Compare one batched classification pass over all faces of a frame with
+    one pass per face, and check that track ids stay stable per person
+    """
+    recognizer = EmotionRecognition()
+    rng = np.random.RandomState(0)
+    results = {}
+    for count in (1, 2, 4, 8):
+        crops = [rng.randint(0, 255, (rng.randint(80, 200), rng.randint(80, 200), 3), np.uint8)
+                 for _ in range(count)]
+        batched = recognizer.classify_faces(crops)
+        single = np.concatenate([recognizer.classify_faces([crop]) for crop in crops])
+        # Parity: batching must not change any face's scores
+        assert np.allclose(batched, single, atol=1e-3), f"{count} faces: batched scores differ"
+        results[f"{count} faces: batched"] = time_call(
+            lambda: recognizer.classify_faces(crops), args.iterations)
+        results[f"{count} faces: per face"] = time_call(
+            lambda: [recognizer.classify_faces([crop]) for crop in crops], args.iterations)
+    print("Batched classification parity OK")
+
+    people = 6
+    sequence = simulate_faces(people, args.frames * 10)
+    tracker = EmotionRecognition()
+    ids_per_person = [set() for _ in range(people)]
+    start = time.perf_counter()
+    for faces, owners in sequence:
+        tracker.record_emotions(faces, (720, 1280, 3))
+        for face, person in zip(faces, owners):
+            ids_per_person[person].add(face['track_id'])
+    per_frame_us = (time.perf_counter() - start) / len(sequence) * 1e6
+    # Each person keeps one id, and no id is shared between people
+    assert all(len(ids) == 1 for ids in ids_per_person), ids_per_person
+    assert len(set().union(*ids_per_person)) == people
+    summaries = tracker.get_face_summaries()
+    assert sum(summary['totalDetections'] for summary in summaries.values()) == \
+        sum(len(faces) for faces, _ in sequence)
+    print(f"{people} people over {len(sequence)} frames: track ids stable, "
+          f"record {per_frame_us:.0f}us/frame, primary track #{tracker.faces.primary_id}")
+
+    print_results("Multi-face classification", results)
+    return results
+
+
+def make_emotion_stream(count, rate=2.0, episode_every=300.0, episode_length=30.0, seed=0):
+    """
+    Simulate an interview: neutral and happy close enough that the raw
+    dominant emotion flickers, with fear episodes injected at known times
+
+    Args:
+        count: Number of samples
+        rate: Samples per second
+        episode_every: Seconds between the starts of fear episodes
+        episode_length: Seconds each fear episode lasts
+
+    Returns:
+        (list of (timestamp, emotion dictionary), list of (start, end) episodes)
+    """
+    rng = np.random.RandomState(seed)
+    base = np.array([5.0, 2.0, 8.0, 32.0, 10.0, 8.0, 35.0])
+    episode_profile = np.array([3.0, 1.0, 60.0, 5.0, 6.0, 5.0, 20.0])
+    episodes = []
+    start = episode_every / 2
+    while start + episode_length < count / rate:
+        episodes.append((start, start + episode_length))
+        start += episode_every
+    stream = []
+    for i in range(count):
+        timestamp = i / rate
+        in_episode = any(a <= timestamp < b for a, b in episodes)
+        target = episode_profile if in_episode else base
+        values = np.clip(target + rng.normal(0, 6, 7), 0, None)
+        values = values / values.sum() * 100.0
+        stream.append((timestamp, dict(zip(EMOTION_LABELS, values.tolist()))))
+    return stream, episodes
+
+
+def bench_timeline(args):
+    """
+    Check that the smoothed timeline finds injected episodes and measure its
+    per-sample cost and how much smaller segments are than raw samples
+    """
+    from emotion_timeline import EmotionTimeline, format_segment
+
+    results = {}
+    for count in args.samples:
+        stream, episodes = make_emotion_stream(count)
+        timeline = EmotionTimeline()
+        start = time.perf_counter()
+        for timestamp, emotions in stream:
+            timeline.add(emotions, timestamp)
+        per_sample_us = (time.perf_counter() - start) / count * 1e6
+        timeline.finish()
+        segments = timeline.get_segments()
+
+        # Every injected fear episode shows up once, within the EMA lag
+        fear = [segment for segment in segments
+                if segment['type'] == 'elevated' and segment['emotion'] == 'fear']
+        assert len(fear) == len(episodes), f"{len(fear)} fear segments for {len(episodes)} episodes"
+        for segment, (episode_start, episode_end) in zip(fear, episodes):
+            assert episode_start <= segment['start'] <= episode_start + 6, segment
+            assert episode_end <= segment['end'] <= episode_end + 6, segment
+
+        raw_dominant = [max(emotions, key=emotions.get) for _, emotions in stream]
+        raw_switches = sum(a != b for a, b in zip(raw_dominant, raw_dominant[1:]))
+        stable_switches = sum(segment['type'] == 'dominant' for segment in segments) - 1
+        raw_bytes = len(json.dumps([{'t': t, 'scores': e} for t, e in stream]))
+        segment_bytes = len(json.dumps(segments))
+        results[count] = {
+            'per_sample_us': per_sample_us,
+            'raw_switches': raw_switches,
+            'stable_switches': stable_switches,
+            'raw_bytes': raw_bytes,
+            'segment_bytes': segment_bytes,
+            'segments': len(segments),
+        }
+        print(f"{count} samples: {len(episodes)} fear episodes found, "
+              f"e.g. \"{format_segment(fear[0])}\"" if fear else f"{count} samples")
+
+    print("\n" + "=" * 70)
+    print("Emotion timeline")
+    print("-" * 70)
+    print(f"{'samples':>8s} {'us/sample':>10s} {'dominant switches':>20s} "
+          f"{'raw':>10s} {'segments':>14s}")
+    for count, stats in results.items():
+        print(f"{count:8d} {stats['per_sample_us']:10.2f} "
+              f"{stats['raw_switches']:9d} -> {stats['stable_switches']:<7d} "
+              f"{stats['raw_bytes'] / 1024:8.0f}KiB {stats['segment_bytes'] / 1024:6.1f}KiB "
+              f"({stats['segments']})")
+    print("=" * 70)
+    return results
+
+
+def make_synthetic_video(path, seconds=60.0, fps=30.0, width=640, height=480):
+    """
+    Write a deterministic test video: the synthetic face drifting over a
+    static noisy background
+
+    Args:
+        path: Output .mp4 file
+        seconds: Video length
+        fps: Frame rate
+        width: Frame width
+        height: Frame height
+
+    Returns:
+        path
+    """
+    base = make_synthetic_frame(width, height)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError("OpenCV cannot write mp4v video here")
+    for i in range(int(seconds * fps)):
+        shift = int(20 * np.sin(i / fps))
+        writer.write(np.roll(base, shift, axis=1))
+    writer.release()
+    return path
+
+
+def analyze_video_sequential(path, recognizer, backend, sample_fps):
+    """Reference: the original single-threaded decode-and-analyze loop"""
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(int(round(fps / sample_fps)), 1)
+    session = EmotionRecognition()
+    track = []
+    frame_index = 0
+    while True:
+        if frame_index % step != 0:
+            if not cap.grab():
+                break
+            frame_index += 1
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        result = recognizer.detect_emotions_from_frame(frame, backend)
+        sample = session.record_emotions(result, frame.shape, frame_index / fps)
+        if sample is not None:
+            sample['t'] = frame_index / fps
+            track.append(sample)
+        frame_index += 1
+    cap.release()
+    return track, frame_index / fps
+
+
+def bench_video(args):
+    """
+    Compare decode strategies for sampled video frames, then the original
+    sequential video loop with the pipelined reader + inference pool
+    """
+    import tempfile
+
+    from emotion_video import VideoFrameReader, analyze_video_file
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.video or make_synthetic_video(
+            os.path.join(directory, 'benchmark.mp4'), args.video_seconds, 30.0,
+            args.width, args.height)
+        results = {}
+
+        decoders = {
+            'decode every frame': {'sample_fps': 1000.0, 'seek_threshold': 0},
+            'grab skipped frames': {'sample_fps': args.sample_fps, 'seek_threshold': 0},
+            'seek over gaps': {'sample_fps': args.sample_fps, 'seek_threshold': None},
+        }
+        sampled = {}
+        for name, options in decoders.items():
+            reader = VideoFrameReader(path, max_queue=64, **options)
+            start = time.perf_counter()
+            reader.start()
+            indices = []
+            while True:
+                item = reader.get()
+                if item is None:
+                    break
+                indices.append(item[0])
+            elapsed = time.perf_counter() - start
+            sampled[name] = indices
+            results[name] = {
+                'frames_decoded': reader.frames_decoded,
+                'seeks': reader.seeks,
+                'elapsed_s': elapsed,
+                'speed': reader.frames_read / reader.fps / elapsed,
+            }
+        # Seeking must deliver exactly the frames grabbing delivers
+        assert sampled['seek over gaps'] == sampled['grab skipped frames'], "seek drifted"
+
+        if not args.io_only:
+            recognizer = EmotionRecognition()
+            recognizer.warm_up([args.backend])
+            start = time.perf_counter()
+            reference, video_seconds = analyze_video_sequential(path, recognizer, args.backend,
+                                                                args.sample_fps)
+            elapsed = time.perf_counter() - start
+            results['sequential (before)'] = {'elapsed_s': elapsed,
+                                              'speed': video_seconds / elapsed}
+            for workers in sorted({1, 2, args.video_workers}):
+                row = analyze_video_file(path, recognizer, args.backend, args.sample_fps, workers)
+                track = row['track']
+                # Parity: same samples in the same order as the sequential loop
+                assert [s['t'] for s in track] == [s['t'] for s in reference]
+                assert [s['dominant'] for s in track] == [s['dominant'] for s in reference]
+                # Concurrent inference rounds differently, within 0.05 points
+                for a, b in zip(track, reference):
+                    assert np.allclose(list(a['scores'].values()), list(b['scores'].values()),
+                                       atol=0.05)
+                results[f"pipelined, {workers} workers"] = {
+                    'elapsed_s': row['elapsedSeconds'], 'speed': row['speed']}
+            print(f"{len(reference)} samples: pipelined tracks match the sequential loop")
+
+    print("\n" + "=" * 70)
+    print(f"Video analysis at {args.sample_fps} samples/s "
+          f"({args.video or f'synthetic {args.video_seconds:.0f}s 30fps video'})")
+    print("-" * 70)
+    print(f"{'case':30s} {'elapsed':>9s} {'x real time':>12s}")
+    for name, stats in results.items():
+        print(f"{name:30s} {stats['elapsed_s']:8.2f}s {stats['speed']:11.1f}x")
+    print("=" * 70)
+    return results
+
+
+# Modules the statistics and scoring path must not import
+HEAVY_MODULES = ('cv2', 'deepface', 'tensorflow', 'keras', 'onnxruntime')
+
+# Imports a module and exercises the statistics API in a fresh interpreter
+IMPORT_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+module = __import__(sys.argv[1])
+import_time = time.perf_counter() - start
+if hasattr(module, 'EmotionRecognition'):
+    recognizer = module.EmotionRecognition()
+    recognizer.record_emotions({'emotion': {'angry': 2.0, 'disgust': 1.0, 'fear': 3.0, 'happy': 80.0,
+                                            'sad': 4.0, 'surprise': 5.0, 'neutral': 5.0}})
+    recognizer.get_average_emotions()
+    recognizer.get_confidence_rating(recognizer.get_average_confidence())
+    recognizer.get_session_summary()
+heavy = sorted(name for name in json.loads(sys.argv[2]) if name in sys.modules)
+print(json.dumps({'import_s': import_time, 'total_s': time.perf_counter() - start,
+                  'max_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+                  'heavy_modules': heavy}))
+"""
+
+
+def parse_importtime(stderr, exclude=(), top=10):
+    """
+    Parse `python -X importtime` output
+
+    Args:
+        stderr: Interpreter stderr with 'import time:' lines
+        exclude: Top-level packages to leave out (e.g. the profiled module)
+        top: Number of slowest packages to return
+
+    Returns:
+        List of (top-level package, cumulative seconds), slowest first
+    """
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        if package in exclude:
+            continue
+        # A package's outermost import line has the largest cumulative time
+        packages[package] = max(packages.get(package, 0.0), int(cumulative) / 1e6)
+    return sorted(packages.items(), key=lambda x: x[1], reverse=True)[:top]
+
+
+def make_archive_sessions(sessions, samples, seed=0):
+    """
+    Simulate stored interviews of varying length
+
+    Returns:
+        List of (session id, float64 score matrix, timestamps); one sample
+        every two seconds like EmotionTracker.tsx
+    """
+    rng = np.random.default_rng(seed)
+    result = []
+    for i in range(sessions):
+        count = int(samples * rng.uniform(0.5, 1.5))
+        probabilities = rng.dirichlet(np.full(len(EMOTION_LABELS), 0.8), count) * 100.0
+        result.append((f"interview-{i}", probabilities, np.arange(count) * 2.0))
+    return result
+
+
+def bench_archive(args):
+    """
+    Compare reloading stored sessions from JSONL results with the columnar
+    archive, for cohort re-scoring
+    """
+    import tempfile
+
+    from emotion_archive import SessionArchive, SessionArchiveWriter, archive_results
+
+    sessions = make_archive_sessions(args.archive_sessions, args.archive_samples)
+    rows = sum(len(probabilities) for _, probabilities, _ in sessions)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        results_path = os.path.join(directory, 'results.jsonl')
+        archive_path = os.path.join(directory, 'archive')
+        with open(results_path, 'w', encoding='utf-8') as f:
+            for session_id, probabilities, timestamps in sessions:
+                dominant, confidence, clarity = score_emotions(probabilities)
+                track = [{'dominant': EMOTION_LABELS[index], 'confidence': score,
+                          'scores': dict(zip(EMOTION_LABELS, row)), 'clarity': gap, 't': t}
+                         for row, t, index, score, gap in zip(
+                             probabilities.tolist(), timestamps.tolist(), dominant.tolist(),
+                             confidence.tolist(), clarity.tolist())]
+                f.write(json.dumps({'type': 'video', 'path': session_id, 'fps': 30.0,
+                                    'track': track}) + "\n")
+
+        start = time.perf_counter()
+        archive_results(results_path, archive_path)
+        convert_s = time.perf_counter() - start
+
+        def load_jsonl():
+            matrices = []
+            with open(results_path, encoding='utf-8') as f:
+                for line in f:
+                    row = json.loads(line)
+                    matrices.append(emotions_to_matrix(sample['scores'] for sample in row['track']))
+            return matrices
+
+        def rescore_jsonl():
+            return [summarize_emotion_matrix(matrix) for matrix in load_jsonl()]
+
+        results['JSONL: load'] = time_call(load_jsonl, args.iterations // 10 or 1, warmup=0)
+        results['JSONL: load + re-score'] = time_call(rescore_jsonl, args.iterations // 10 or 1,
+                                                      warmup=0)
+        results['archive: open (mmap)'] = time_call(lambda: SessionArchive(archive_path),
+                                                    args.iterations)
+        results['archive: open + re-score'] = time_call(
+            lambda: SessionArchive(archive_path).rescore(), args.iterations // 10 or 1)
+        archive = SessionArchive(archive_path)
+        results['archive: per-session summary'] = time_call(
+            lambda: [archive.summary(i) for i in range(len(archive))], args.iterations // 10 or 1)
+
+        # Parity: the archive holds the JSONL scores and re-scores like
+        # summarize_emotion_matrix does per session
+        matrices = load_jsonl()
+        scores = archive.rescore()
+        assert archive.session_ids == [session_id for session_id, _, _ in sessions]
+        for i, matrix in enumerate(matrices):
+            view, timestamps = archive[i]
+            assert np.allclose(view, matrix, atol=1e-4), f"session {i}: stored scores differ"
+            assert np.array_equal(timestamps, sessions[i][2]), f"session {i}: timestamps differ"
+            expected = archive.summary(i)
+            assert np.allclose(scores['averages'][i], list(expected['averages'].values()))
+            assert np.isclose(scores['avgConfidence'][i], expected['avgConfidence'])
+            assert np.isclose(scores['avgClarity'][i], expected['avgClarity'])
+            counts = {EMOTION_LABELS[j]: int(count)
+                      for j, count in enumerate(scores['dominantCounts'][i]) if count}
+            assert counts == expected['dominantCounts'], f"session {i}: dominant counts differ"
+            from_json = summarize_emotion_matrix(matrix)
+            assert abs(from_json['avgConfidence'] - expected['avgConfidence']) < 1e-3
+        print(f"Archive parity OK ({len(archive)} sessions)")
+
+        # Round trip: a recorded session exported and restored keeps its summary
+        _, probabilities, timestamps = sessions[0]
+        recognizer = EmotionRecognition(history_size=len(probabilities))
+        recognizer.import_history(probabilities, timestamps)
+        round_trip = os.path.join(directory, 'round-trip')
+        with SessionArchiveWriter(round_trip) as writer:
+            writer.add_recognizer('session', recognizer)
+        original = recognizer.get_session_summary()
+        restored = SessionArchive(round_trip).restore('session').get_session_summary()
+        assert restored['totalDetections'] == original['totalDetections']
+        assert restored['dominantCounts'] == original['dominantCounts']
+        assert abs(restored['avgConfidence'] - original['avgConfidence']) < 1e-3
+        assert [s['emotion'] for s in restored['segments']] == \
+            [s['emotion'] for s in original['segments']]
+        print("Recognizer export/restore round trip OK")
+
+        jsonl_bytes = os.path.getsize(results_path)
+        archive_bytes = sum(os.path.getsize(os.path.join(archive_path, name))
+                            for name in os.listdir(archive_path))
+
+    print_results(f"Session history reload, {len(sessions)} sessions, {rows} detections", results)
+    print(f"JSONL {jsonl_bytes / 2 ** 20:.1f}MiB, archive {archive_bytes / 2 ** 20:.1f}MiB "
+          f"({archive_bytes / rows:.0f}B per detection), one-time conversion {convert_s:.1f}s")
+    results['sizes'] = {'rows': rows, 'jsonl_bytes': jsonl_bytes,
+                        'archive_bytes': archive_bytes, 'convert_s': convert_s}
+    return results
+
+
+def bench_imports(args):
+    """
+    Guard the lightweight startup path: the statistics and scoring code must
+    import and run without OpenCV, DeepFace, TensorFlow or ONNX Runtime
+    """
+    modules = args.modules.split(',')
+    results = {}
+    for module in modules:
+        samples = []
+        for _ in range(args.repeats):
+            output = subprocess.run(
+                [sys.executable, "-c", IMPORT_SCRIPT, module, json.dumps(HEAVY_MODULES)],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True, text=True, check=True
+            ).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+        profile = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stderr
+        results[module] = {
+            'import_s': float(np.median([sample['import_s'] for sample in samples])),
+            'max_rss_mib': float(np.median([sample['max_rss_mib'] for sample in samples])),
+            'heavy_modules': samples[-1]['heavy_modules'],
+            'slowest': parse_importtime(profile, exclude=(module, 'site', 'encodings'), top=5),
+        }
+
+    print("\n" + "=" * 70)
+    print(f"Cold import + statistics API (median of {args.repeats} runs)")
+    print("-" * 70)
+    print(f"{'module':24s} {'import':>9s} {'max RSS':>9s}  heavy modules loaded")
+    for module, stats in results.items():
+        print(f"{module:24s} {stats['import_s'] * 1000:7.0f}ms {stats['max_rss_mib']:6.0f}MiB  "
+              f"{', '.join(stats['heavy_modules']) or '-'}")
+        print("    slowest: " + ", ".join(f"{name} {seconds * 1000:.0f}ms"
+                                       for name, seconds in stats['slowest']))
+    print("=" * 70)
+
+    for module in ('emotion_stats', 'emotion_recognition'):
+        if module in results:
+            # Guard: importing these must not pull in an inference dependency
+            assert not results[module]['heavy_modules'], \
+                f"{module} imported {results[module]['heavy_modules']}"
+            assert results[module]['import_s'] < args.max_import_s, \
+                f"{module} took {results[module]['import_s']:.2f}s to import"
+    return results
+
+
+def bench_latency(args):
+    """
+    Measure single-frame latency of the full pipeline (detection and emotion
+    classification) per detection backend over the corpus, with the detect
+    and classify stages broken out
+    """
+    frames = load_corpus(args.corpus, args.frames, args.width, args.height)
+    backends = args.backends.split(',')
+    results = {}
+    for backend in backends:
+        recognizer = EmotionRecognition()
+        # Untimed first call loads the detector and the emotion model
+        if recognizer.detect_emotions_from_frame(frames[0][1], backend) is None \
+                and recognizer.last_error:
+            results[backend] = {'error': recognizer.last_error}
+            continue
+        recognizer.metrics.reset()
+        latencies = []
+        for _ in range(max(args.iterations // len(frames), 1)):
+            for _, frame in frames:
+                start = time.perf_counter()
+                recognizer.detect_emotions_from_frame(frame, backend)
+                latencies.append((time.perf_counter() - start) * 1000.0)
+        latencies = np.array(latencies)
+        snapshot = recognizer.metrics.snapshot()
+        misses = snapshot['counters'].get('no_face', {}).get(backend, 0)
+        results[backend] = {
+            'mean_ms': float(latencies.mean()),
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95)),
+            'min_ms': float(latencies.min()),
+            'iterations': len(latencies),
+            'detect_mean_ms': snapshot['stages']['detect'][backend]['mean_ms'],
+            'classify_mean_ms': snapshot['stages']['classify'][backend]['mean_ms'],
+            'hit_rate': 1.0 - misses / len(latencies),
+        }
+
+    print("\n" + "=" * 70)
+    print(f"Single-frame latency over {len(frames)} images "
+          f"({args.corpus or 'synthetic frames, use --corpus for real faces'})")
+    print("-" * 70)
+    print(f"{'backend':14s} {'mean':>9s} {'p50':>9s} {'p95':>9s} {'detect':>9s} {'classify':>9s} "
+          f"{'faces':>7s}")
+    for backend, stats in results.items():
+        if 'error' in stats:
+            print(f"{backend:14s} unavailable: {stats['error'][:50]}")
+            continue
+        print(f"{backend:14s} {stats['mean_ms']:8.2f}ms {stats['p50_ms']:8.2f}ms "
+              f"{stats['p95_ms']:8.2f}ms {stats['detect_mean_ms']:8.2f}ms "
+              f"{stats['classify_mean_ms']:8.2f}ms {stats['hit_rate'] * 100:6.1f}%")
+    print("=" * 70)
+    return results
+
+
+def compare_to_reference(reference, result, frame_shape):
+    """
+    Accuracy of one frame's result against the full-resolution reference
+
+    Returns:
+        (reference found a face, result found a face, box IoU, dominant
+        emotion agrees, mean absolute score difference); the last three are
+        None unless both found a face
+    """
+    def found(faces):
+        # DeepFace's whole-frame fallback box is one pixel short of the frame
+        return bool(faces) and not (
+            len(faces) == 1 and faces[0]['face_confidence'] == 0
+            and faces[0]['region']['w'] >= frame_shape[1] - 1
+            and faces[0]['region']['h'] >= frame_shape[0] - 1)
+
+    ref_found, found_face = found(reference), found(result)
+    if not (ref_found and found_face):
+        return ref_found, found_face, None, None, None
+    ref_face = primary_face(reference, frame_shape)
+    face = primary_face(result, frame_shape)
+    iou = float(iou_matrix(face_boxes([ref_face]), face_boxes([face]))[0, 0])
+    mae = float(np.mean([abs(ref_face['emotion'][label] - face['emotion'][label])
+                         for label in EMOTION_LABELS]))
+    return ref_found, found_face, iou, ref_face['dominant_emotion'] == face['dominant_emotion'], mae
+
+
+def bench_preprocess(args):
+    """
+    Detect faces at several working resolutions (crops still come from the
+    full frame) and report latency and accuracy against full-resolution
+    detection; use --width/--height for HD frames or --corpus for real faces
+    """
+    # Full-resolution detection takes seconds per HD frame on a small CPU
+    frames = load_corpus(args.corpus, min(args.frames, 8), args.width, args.height)
+    frame = frames[0][1]
+    results = {}
+
+    preprocessor = DetectionPreprocessor(min(args.working_sizes))
+    height, width, _ = working_shape(frame.shape, preprocessor.working_size)
+    # Parity: the reused buffer holds the same pixels as a fresh resize
+    fresh = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    assert np.array_equal(preprocessor.downscale(frame)[0], fresh), "buffered resize differs"
+    results['resize: new array'] = time_call(
+        lambda: cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA), args.iterations)
+    results['resize: reused buffer'] = time_call(lambda: preprocessor.downscale(frame),
+                                                 args.iterations)
+    print_results(f"Downscale {frame.shape[1]}x{frame.shape[0]} -> {width}x{height}", results)
+
+    def run(recognizer):
+        recognizer.detect_emotions_from_frame(frame, args.backend)
+        latencies, outputs = [], []
+        for _, image in frames:
+            start = time.perf_counter()
+            outputs.append(recognizer.detect_emotions_from_frame(image, args.backend))
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        return np.array(latencies), outputs
+
+    reference_latencies, reference = run(EmotionRecognition())
+    largest = max(frame.shape[:2])
+    # Parity: a working size at least the frame size changes nothing
+    unchanged = EmotionRecognition(working_size=largest)
+    for (_, image), expected in zip(frames[:2], reference[:2]):
+        output = unchanged.detect_emotions_from_frame(image, args.backend)
+        assert (output is None) == (expected is None), "working size >= frame changed results"
+        if output is not None:
+            assert [face['region'] for face in output] == [face['region'] for face in expected]
+            assert np.allclose(emotions_to_matrix([face['emotion'] for face in output]),
+                               emotions_to_matrix([face['emotion'] for face in expected]),
+                               atol=1e-3), "working size >= frame changed scores"
+    print("Full-resolution parity OK")
+
+    rows = {'full': (reference_latencies, reference)}
+    for size in sorted(args.working_sizes, reverse=True):
+        if size < largest:
+            rows[str(size)] = run(EmotionRecognition(working_size=size))
+
+    accuracy = {}
+    for name, (latencies, outputs) in rows.items():
+        compared = [compare_to_reference(ref or [], out or [], image.shape)
+                    for ref, out, (_, image) in zip(reference, outputs, frames)]
+        both = [row for row in compared if row[2] is not None]
+        accuracy[name] = {
+            'mean_ms': float(latencies.mean()),
+            'p95_ms': float(np.percentile(latencies, 95)),
+            'speedup': float(reference_latencies.mean() / latencies.mean()),
+            'hit_rate': sum(row[1] for row in compared) / len(compared),
+            'found_agreement': sum(row[0] == row[1] for row in compared) / len(compared),
+            'box_iou': float(np.mean([row[2] for row in both])) if both else None,
+            'dominant_agreement': (sum(row[3] for row in both) / len(both)) if both else None,
+            'score_mae': float(np.mean([row[4] for row in both])) if both else None,
+        }
+
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else f"{'-':>{spec.split('.')[0]}}"
+
+    print("\n" + "=" * 70)
+    print(f"Working resolution, {len(frames)} {frame.shape[1]}x{frame.shape[0]} frames "
+          f"({args.corpus or 'synthetic frames, use --corpus for real faces'}), "
+          f"accuracy vs full resolution")
+    print("-" * 70)
+    print(f"{'size':8s} {'mean':>9s} {'p95':>9s} {'speedup':>8s} {'faces':>6s} {'agree':>6s} "
+          f"{'IoU':>5s} {'dom':>5s} {'MAE':>6s}")
+    for name, stats in accuracy.items():
+        print(f"{name:8s} {stats['mean_ms']:8.1f}ms {stats['p95_ms']:8.1f}ms "
+              f"{stats['speedup']:7.2f}x {stats['hit_rate'] * 100:5.0f}% "
+              f"{stats['found_agreement'] * 100:5.0f}% {fmt(stats['box_iou'], '5.2f')} "
+              f"{fmt(stats['dominant_agreement'], '5.2f')} {fmt(stats['score_mae'], '6.2f')}")
+    print("=" * 70)
+    results.update(accuracy)
+    return results
+
+
+def rss_mib():
+    """Resident memory of this process in MiB (0 where /proc is unavailable)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return 0.0
+
+
+def measure_growth(record, count, checkpoints=10):
+    """
+    Call record(i) count times and sample traced Python memory along the way
+
+    Args:
+        record: Callable taking the sample index
+        count: Number of calls
+        checkpoints: Number of memory samples
+
+    Returns:
+        Dictionary with traced bytes at every checkpoint, the growth over the
+        second half of the run per call and the peak
+    """
+    step = max(count // checkpoints, 1)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    curve = []
+    for i in range(count):
+        record(i)
+        if (i + 1) % step == 0:
+            curve.append(tracemalloc.get_traced_memory()[0] - baseline)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    half = len(curve) // 2
+    # Growth after warm-up: a bounded structure stays flat in the second half
+    growth = (curve[-1] - curve[half - 1]) / (step * (len(curve) - half)) if half else 0.0
+    return {'curve_bytes': curve, 'final_bytes': curve[-1] if curve else 0,
+            'peak_bytes': peak, 'growth_bytes_per_call': growth}
+
+
+# Traced memory one long session may hold: accumulators, a 1000-entry history
+# and the timeline's 1000 capped segments
+SESSION_MEMORY_BUDGET_BYTES = 1024 * 1024
+
+
+def bench_memory(args):
+    """
+    Check that memory stays bounded over long sessions: one recognizer
+    recording many samples (with and without a history buffer), a session
+    store holding many sessions, and the full pipeline over repeated frames
+    """
+    from emotion_sessions import SessionStore
+
+    count = max(args.samples)
+    samples = make_emotion_samples(min(count, 10000))
+    results = {}
+
+    for history_size in (0, 1000):
+        recognizer = EmotionRecognition(history_size=history_size)
+
+        def record(i):
+            recognizer.record_emotions({'emotion': samples[i % len(samples)]}, timestamp=i * 0.5)
+
+        results[f"session, history {history_size}"] = measure_growth(record, count)
+
+    store = SessionStore(max_sessions=args.sessions * 2, snapshot_path=None)
+
+    def open_session(i):
+        recognizer = store.get_or_create(f"session-{i}")
+        for j in range(10):
+            recognizer.record_emotions({'emotion': samples[(i + j) % len(samples)]})
+
+    growth = measure_growth(open_session, args.sessions)
+    for i in range(args.sessions):
+        # Re-estimate with the samples recorded after each session was opened
+        store.get_or_create(f"session-{i}")
+    growth['estimated_bytes_per_session'] = store.memory_bytes / max(len(store), 1)
+    results[f"store, {args.sessions} sessions"] = growth
+
+    if not args.io_only:
+        recognizer = EmotionRecognition()
+        frames = load_corpus(args.corpus, 8, args.width, args.height)
+        recognizer.detect_emotions_from_frame(frames[0][1], args.backend)
+        before = rss_mib()
+        for i in range(args.frames):
+            recognizer.detect_emotions_from_frame(frames[i % len(frames)][1], args.backend)
+        results[f"pipeline, {args.frames} frames"] = {
+            'rss_before_mib': before, 'rss_after_mib': rss_mib(),
+            'rss_growth_mib': rss_mib() - before,
+        }
+
+    print("\n" + "=" * 70)
+    print(f"Memory over long sessions ({count} samples per session)")
+    print("-" * 70)
+    print(f"{'case':30s} {'final':>10s} {'peak':>10s} {'growth/call':>13s}")
+    for name, stats in results.items():
+        if 'rss_growth_mib' in stats:
+            print(f"{name:30s} RSS {stats['rss_before_mib']:.0f} -> {stats['rss_after_mib']:.0f}MiB")
+            continue
+        print(f"{name:30s} {stats['final_bytes'] / 1024:7.0f}KiB {stats['peak_bytes'] / 1024:7.0f}KiB "
+              f"{stats['growth_bytes_per_call']:11.1f}B")
+    store_stats = results[f"store, {args.sessions} sessions"]
+    print(f"Session store: {store_stats['final_bytes'] / args.sessions / 1024:.1f}KiB measured vs "
+          f"{store_stats['estimated_bytes_per_session'] / 1024:.1f}KiB estimated per session")
+    print("=" * 70)
+
+    # Guard: a session stays within budget however long it runs; only the
+    # timeline's capped segment list may still grow
+    for history_size in (0, 1000):
+        final = results[f"session, history {history_size}"]['final_bytes']
+        assert final < SESSION_MEMORY_BUDGET_BYTES, \
+            f"Session with history {history_size} holds {final / 1024:.0f}KiB after {count} samples"
+    return results
+
+
+def bench_load(args):
+    """
+    Replay many concurrent sessions against the HTTP service (a local one is
+    started unless --url is given)
+    """
+    from emotion_loadgen import encode_frames, print_load_results, run_load_from_args
+
+    frames = encode_frames([frame for _, frame in
+                            load_corpus(args.corpus, 8, args.width, args.height)])
+    results = run_load_from_args(args, frames)
+    print_load_results(results)
+    return results
+
+
+# Reproducible set run by the suite benchmark, cheapest first
+SUITE = ('imports', 'scoring', 'stats', 'timeline', 'multiface', 'memory', 'frame-path',
+         'latency', 'batching')
+
+
+def bench_suite(args):
+    """
+    Run the standard benchmark set offline, recording failures instead of
+    stopping at the first one
+    """
+    results = {}
+    for name in SUITE:
+        try:
+            results[name] = BENCHMARKS[name](args)
+        except Exception as e:
+            print(f"{name} failed: {e}")
+            results[name] = {'error': f"{type(e).__name__}: {e}"}
+    return results
+
+
+def to_json_ready(value):
+    """Convert numpy values and non-string keys so json.dump accepts results"""
+    if isinstance(value, dict):
+        return {str(key): to_json_ready(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_ready(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def environment_info():
+    """Machine, interpreter and library versions recorded with every report"""
+    import platform
+    from importlib import metadata
+
+    # OpenCV ships under several distribution names, ask the module
+    versions = {'opencv': cv2.__version__}
+    for package in ('numpy', 'deepface', 'tensorflow', 'onnxruntime'):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'packages': versions,
+        'commit': commit,
+    }
+
+
+def flatten_numbers(value, prefix=''):
+    """
+    Flatten nested results to {'a/b/c': number}
+
+    Returns:
+        Dictionary of slash-joined key path -> int or float
+    """
+    flat = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flat.update(flatten_numbers(item, f"{prefix}/{key}" if prefix else str(key)))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        flat[prefix] = value
+    return flat
+
+
+# Metrics where a larger value is an improvement; everything else (latency,
+# memory, sizes) is better smaller
+HIGHER_IS_BETTER = ('fps', 'per_s', 'rps', 'speedup', 'hit_rate', 'agreement')
+# Run parameters and counts, not measurements
+NOT_COMPARED = ('iterations', 'count', 'sessions', 'requests', 'interval_ms', 'segments',
+                'raw_switches', 'raw_bytes', 'statuses', 'health', 'parity')
+
+
+def compare_results(baseline, current, tolerance=0.1):
+    """
+    Compare two result trees metric by metric
+
+    Args:
+        baseline: Results of the reference run
+        current: Results of this run
+        tolerance: Relative change counted as a regression or improvement
+
+    Returns:
+        List of (key, baseline, current, relative change, verdict) with
+        verdict 'regression', 'improvement' or 'same'
+    """
+    old = flatten_numbers(baseline)
+    new = flatten_numbers(current)
+    rows = []
+    for key in sorted(old.keys() & new.keys()):
+        parts = key.split('/')
+        if any(part.split(' ')[0] in NOT_COMPARED for part in parts):
+            continue
+        if old[key] == 0:
+            continue
+        change = (new[key] - old[key]) / abs(old[key])
+        higher_better = any(marker in parts[-1] for marker in HIGHER_IS_BETTER)
+        worse = -change if higher_better else change
+        verdict = 'same'
+        if worse > tolerance:
+            verdict = 'regression'
+        elif worse < -tolerance:
+            verdict = 'improvement'
+        rows.append((key, old[key], new[key], change, verdict))
+    return rows
+
+
+def print_comparison(rows, baseline_path):
+    print("\n" + "=" * 70)
+    print(f"Compared with {baseline_path}")
+    print("-" * 70)
+    for key, old, new, change, verdict in rows:
+        if verdict != 'same':
+            print(f"{verdict:12s} {key[:40]:40s} {old:10.4g} -> {new:10.4g} ({change * 100:+.1f}%)")
+    regressions = sum(row[4] == 'regression' for row in rows)
+    print(f"{len(rows)} metrics, {regressions} regressions, "
+          f"{sum(row[4] == 'improvement' for row in rows)} improvements")
+    print("=" * 70)
+    return regressions
+
+
+BENCHMARKS = {
+    'frame-path': bench_frame_path,
+    'batching': bench_batching,
+    'startup': bench_startup,
+    'stats': bench_stats,
+    'scoring': bench_scoring,
+    'cascade': bench_cascade,
+    'engines': bench_engines,
+    'imports': bench_imports,
+    'multiface': bench_multiface,
+    'timeline': bench_timeline,
+    'latency': bench_latency,
+    'memory': bench_memory,
+    'load': bench_load,
+    'suite': bench_suite,
+    'video': bench_video,
+    'preprocess': bench_preprocess,
+    'archive': bench_archive,
+}
+
+
+def main():
+    """Main function with CLI interface"""
+    parser = argparse.ArgumentParser(description="Emotion recognition benchmarks")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS.keys()))
+    parser.add_argument('--image', help="Image to benchmark with (default: synthetic frame)")
+    parser.add_argument('--backend', default='opencv', help="Face detection backend")
+    parser.add_argument('--backends', default='opencv',
+                        help="Comma-separated backends to preload (startup) or compare "
+                             "(cascade, default: all)")
+    parser.add_argument('--corpus', help="Directory of face images (default: synthetic frames)")
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--io-only', action='store_true',
+                        help="Only time the encode/decode overhead, skip DeepFace")
+    parser.add_argument('--frames', type=int, default=64, help="Frames per throughput run")
+    parser.add_argument('--concurrency', type=int, default=16, help="Concurrent callers")
+    parser.add_argument('--window-ms', type=float, default=20, help="Batching window")
+    parser.add_argument('--batch-size', type=int, default=16, help="Maximum batch size")
+    parser.add_argument('--engine-threads', type=int, default=0,
+                        help="ONNX Runtime intra-op threads (engines benchmark, 0: default)")
+    parser.add_argument('--modules', default='emotion_stats,emotion_recognition,emotion_service',
+                        help="Comma-separated modules for the imports benchmark")
+    parser.add_argument('--repeats', type=int, default=3, help="Cold imports per module")
+    parser.add_argument('--max-import-s', type=float, default=1.0,
+                        help="Import time budget of the statistics path (imports benchmark)")
+    parser.add_argument('--samples', type=int, nargs='+', default=[10000, 100000],
+                        help="Session lengths for the stats, timeline and memory benchmarks")
+    parser.add_argument('--video', help="Video file for the video benchmark (default: synthetic)")
+    parser.add_argument('--video-seconds', type=float, default=60.0,
+                        help="Length of the synthetic benchmark video")
+    parser.add_argument('--sample-fps', type=float, default=1.0,
+                        help="Video frames analyzed per second (video benchmark)")
+    parser.add_argument('--video-workers', type=int, default=4,
+                        help="Largest inference pool of the video benchmark")
+    parser.add_argument('--working-sizes', type=int, nargs='+', default=[960, 640, 480, 320],
+                        help="Detection resolutions (longest side) of the preprocess benchmark")
+    parser.add_argument('--archive-sessions', type=int, default=500,
+                        help="Stored sessions of the archive benchmark")
+    parser.add_argument('--archive-samples', type=int, default=900,
+                        help="Average detections per stored session (archive benchmark)")
+    add_load_arguments(parser)
+    parser.add_argument('--json', help="Write the results with run metadata to this JSON file")
+    parser.add_argument('--compare', help="JSON file of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="Relative change reported as a regression (--compare)")
+    args = parser.parse_args()
+
+    started = time.time()
+    results = to_json_ready(BENCHMARKS[args.benchmark](args))
+    report = {
+        'benchmark': args.benchmark,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started)),
+        'duration_s': time.time() - started,
+        'args': vars(args),
+        'environment': environment_info(),
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('benchmark') != args.benchmark:
+            print(f"Warning: baseline is a '{baseline.get('benchmark')}' run")
+        differing = sorted(key for key, value in baseline.get('args', {}).items()
+                           if key not in ('json', 'compare', 'tolerance')
+                           and report['args'].get(key) != value)
+        if differing:
+            print(f"Warning: baseline ran with different options: {', '.join(differing)}")
+        rows = compare_results(baseline['results'], results, args.tolerance)
+        if print_comparison(rows, args.compare):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Result cache for emotion analysis
+Keys results by a hash of the image content, or by a perceptual hash so
+near-duplicate frames hit too, with LRU size/TTL eviction and JSON persistence
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from emotion_lazy import LazyModule
+
+# OpenCV is only needed for perceptual keys
+cv2 = LazyModule('cv2')
+
+
+def content_hash(data):
+    """
+    Hash encoded image bytes or a decoded frame
+
+    Args:
+        data: bytes/str of an encoded image, or a numpy frame
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(data, np.ndarray):
+        # Shape and dtype are part of the content of a decoded frame
+        digest.update(f"{data.shape}{data.dtype}".encode())
+        digest.update(np.ascontiguousarray(data).data)
+    elif isinstance(data, str):
+        digest.update(data.encode())
+    else:
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def perceptual_hash(frame):
+    """
+    64-bit difference hash (dHash): compares neighbouring pixels of a 9x8
+    grayscale thumbnail, so small changes in noise, compression or
+    brightness keep the hash (nearly) the same
+
+    Args:
+        frame: BGR or grayscale numpy frame
+
+    Returns:
+        Hash as a Python int
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    thumbnail = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def _to_builtin(value):
+    """Convert numpy scalars inside a result to plain Python values"""
+    if isinstance(value, dict):
+        return {key: _to_builtin(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class ResultCache:
+    def __init__(self, max_entries=1024, ttl=None, perceptual=False, max_distance=4, path=None):
+        """
+        Args:
+            max_entries: Entries kept before the least recently used is evicted
+            ttl: Seconds an entry stays valid (None: forever)
+            perceptual: Key frames by perceptual hash, so near-duplicates hit
+            max_distance: Largest Hamming distance between perceptual hashes
+                that still counts as the same image
+            path: JSON file the cache is loaded from and saved to
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+        self.path = path
+        self.lock = threading.Lock()
+        # key -> (stored_at, result), least recently used first
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key_for_bytes(self, data, namespace):
+        """
+        Exact key for encoded image data; None in perceptual mode, where the
+        image has to be decoded and keyed with key_for_frame
+
+        Args:
+            data: Encoded image bytes or base64 string
+            namespace: Analysis variant, e.g. the detector backend
+
+        Returns:
+            Key, or None if the data cannot be cached this way
+        """
+        if self.perceptual:
+            return None
+        return f"{namespace}:b:{content_hash(data)}"
+
+    def key_for_frame(self, frame, namespace):
+        """
+        Key for a decoded frame
+
+        Args:
+            frame: BGR numpy frame, or None if the image could not be decoded
+            namespace: Analysis variant, e.g. the detector backend
+
+        Returns:
+            Key, or None for a missing frame
+        """
+        if frame is None:
+            return None
+        if self.perceptual:
+            return f"{namespace}:p:{perceptual_hash(frame):016x}"
+        return f"{namespace}:f:{content_hash(frame)}"
+
+    def _find_similar(self, key):
+        """Closest perceptual key within max_distance, or None"""
+        namespace, _, value = key.rpartition(':')
+        prefix = namespace + ':'
+        candidates = [k for k in self.entries if k.startswith(prefix)]
+        if not candidates:
+            return None
+        hashes = np.array([int(k.rpartition(':')[2], 16) for k in candidates], dtype=np.uint64)
+        distances = np.unpackbits((hashes ^ np.uint64(int(value, 16))).view(np.uint8)
+                                  ).reshape(len(candidates), 64).sum(axis=1)
+        best = int(np.argmin(distances))
+        return candidates[best] if distances[best] <= self.max_distance else None
+
+    def get(self, key):
+        """
+        Look up a result
+
+        Args:
+            key: Key from key_for_bytes or key_for_frame
+
+        Returns:
+            Copy of the cached result, or None on a miss or a None key
+        """
+        if key is None:
+            return None
+        with self.lock:
+            entry_key = key if key in self.entries else None
+            if entry_key is None and self.perceptual and ':p:' in key:
+                entry_key = self._find_similar(key)
+            if entry_key is None:
+                self.misses += 1
+                return None
+
+            stored_at, result = self.entries[entry_key]
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self.entries[entry_key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(entry_key)
+            self.hits += 1
+        return copy.deepcopy(result)
+
+    def put(self, key, result):
+        """
+        Store a result, evicting the least recently used entries over max_entries
+
+        Args:
+            key: Key from key_for_bytes or key_for_frame; nothing is stored
+                for None
+            result: DeepFace-format result
+        """
+        if key is None:
+            return
+        with self.lock:
+            self.entries[key] = (time.time(), _to_builtin(result))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """
+        Returns:
+            Dictionary with entries, hits, misses, hit rate and evictions
+        """
+        total = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': self.hits / total if total else 0.0,
+            'evictions': self.evictions
+        }
+
+    def save(self, path=None):
+        """
+        Write the cache to a JSON file (atomically)
+
+        Args:
+            path: Target file (default: the path given at construction)
+        """
+        path = path or self.path
+        with self.lock:
+            data = {'perceptual': self.perceptual,
+                    'entries': [[key, stored_at, result]
+                                for key, (stored_at, result) in self.entries.items()]}
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+
+    def load(self, path=None):
+        """
+        Merge entries from a JSON file written by save
+
+        Args:
+            path: Source file (default: the path given at construction)
+        """
+        path = path or self.path
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with self.lock:
+            for key, stored_at, result in data.get('entries', []):
+                self.entries[key] = (stored_at, result)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
@@ -0,0 +1,230 @@
+"""
+Pluggable inference engines for the emotion classifier
+The DeepFace engine runs the Keras model through TensorFlow; the ONNX engine
+runs the same network with ONNX Runtime on CPU, optionally int8-quantized,
+without loading TensorFlow at inference time
+"""
+
+import os
+import time
+
+import numpy as np
+
+from emotion_lazy import LazyModule
+
+
+cv2 = LazyModule('cv2')
+
+
+# The emotion network takes 48x48 grayscale faces in [0, 1], channels last
+EMOTION_INPUT_SIZE = 48
+# DeepFace letterboxes faces to this size before the emotion model shrinks them
+DEEPFACE_FACE_SIZE = 224
+ONNX_MODEL_NAME = 'facial_expression_model_weights.onnx'
+
+
+def default_weights_dir():
+    """DeepFace's weights folder, honouring DEEPFACE_HOME like DeepFace does"""
+    home = os.environ.get('DEEPFACE_HOME', os.path.expanduser('~'))
+    return os.path.join(home, '.deepface', 'weights')
+
+
+def letterbox(face, size=DEEPFACE_FACE_SIZE):
+    """
+    Resize a face into a size x size square padded with black, the same way
+    DeepFace's preprocessing.resize_image does
+
+    Args:
+        face: Face crop as numpy array (BGR), uint8 or float in [0, 1]
+        size: Output side length
+
+    Returns:
+        float32 array of shape (size, size, 3) in [0, 1]
+    """
+    factor = min(size / face.shape[0], size / face.shape[1])
+    face = cv2.resize(face, (int(face.shape[1] * factor), int(face.shape[0] * factor)))
+    pad_y = size - face.shape[0]
+    pad_x = size - face.shape[1]
+    face = np.pad(face, ((pad_y // 2, pad_y - pad_y // 2), (pad_x // 2, pad_x - pad_x // 2), (0, 0)),
+                  'constant')
+    if face.shape[:2] != (size, size):
+        face = cv2.resize(face, (size, size))
+    face = np.asarray(face, dtype=np.float32)
+    if face.max() > 1:
+        face = face / 255.0
+    return face
+
+
+def preprocess_faces(faces):
+    """
+    Turn face crops into the emotion network's input batch, matching the
+    preprocessing DeepFace.analyze applies
+
+    Args:
+        faces: List of face crops as BGR numpy arrays, uint8 or float in [0, 1]
+
+    Returns:
+        float32 array of shape (n, 48, 48, 1)
+    """
+    batch = np.empty((len(faces), EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE, 1), dtype=np.float32)
+    for i, face in enumerate(faces):
+        gray = cv2.cvtColor(letterbox(face), cv2.COLOR_BGR2GRAY)
+        batch[i, :, :, 0] = cv2.resize(gray, (EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE))
+    return batch
+
+
+class DeepFaceEmotionEngine:
+    """Runs the emotion model through DeepFace (TensorFlow/Keras)"""
+
+    name = 'deepface'
+
+    def __init__(self):
+        self.model = None
+
+    def load(self):
+        """Build the model, DeepFace caches it per process"""
+        if self.model is None:
+            from deepface import DeepFace
+            self.model = DeepFace.build_model(model_name='Emotion', task='facial_attribute')
+        return self.model
+
+    def predict(self, faces):
+        """
+        Args:
+            faces: List of face crops as BGR numpy arrays
+
+        Returns:
+            Softmax probabilities of shape (n, 7) in EMOTION_LABELS order
+        """
+        batch = np.stack([letterbox(face) for face in faces])
+        return np.atleast_2d(self.load().predict(batch))
+
+
+class OnnxEmotionEngine:
+    """Runs the emotion model with ONNX Runtime on CPU"""
+
+    name = 'onnx'
+
+    def __init__(self, model_path=None, quantize=False, intra_op_threads=0, inter_op_threads=0):
+        """
+        Args:
+            model_path: ONNX graph of the emotion model (default: DeepFace's
+                weights folder, exported from the Keras model if missing)
+            quantize: Run an int8 dynamically quantized copy of the graph
+            intra_op_threads: Threads used inside an operator (0: ONNX Runtime default)
+            inter_op_threads: Threads used across operators (0: ONNX Runtime default)
+        """
+        self.model_path = model_path or os.path.join(default_weights_dir(), ONNX_MODEL_NAME)
+        self.quantize = quantize
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.session = None
+        self.input_name = None
+
+    def load(self):
+        """Create the inference session, exporting/quantizing the graph on first use"""
+        if self.session is not None:
+            return self.session
+
+        import onnxruntime as ort
+
+        if not os.path.exists(self.model_path):
+            export_onnx_model(self.model_path)
+        path = self.model_path
+        if self.quantize:
+            path = os.path.splitext(self.model_path)[0] + '_int8.onnx'
+            if not os.path.exists(path):
+                quantize_onnx_model(self.model_path, path)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.log_severity_level = 3
+        self.session = ort.InferenceSession(path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        return self.session
+
+    def predict(self, faces):
+        """
+        Args:
+            faces: List of face crops as BGR numpy arrays
+
+        Returns:
+            Softmax probabilities of shape (n, 7) in EMOTION_LABELS order
+        """
+        session = self.load()
+        return session.run(None, {self.input_name: preprocess_faces(faces)})[0]
+
+
+ENGINES = {
+    'deepface': DeepFaceEmotionEngine,
+    'onnx': OnnxEmotionEngine,
+}
+
+
+def create_engine(name='deepface', **options):
+    """
+    Build an emotion engine by name
+
+    Args:
+        name: 'deepface' or 'onnx'
+        **options: Engine constructor arguments (e.g. quantize, intra_op_threads)
+
+    Returns:
+        Engine instance
+    """
+    if name not in ENGINES:
+        raise ValueError(f"Unknown emotion engine '{name}', choose from {sorted(ENGINES)}")
+    return ENGINES[name](**options)
+
+
+def export_onnx_model(path):
+    """
+    Export DeepFace's Keras emotion model to an ONNX graph
+    Needs tensorflow and tf2onnx (pip install tf2onnx) once; afterwards the
+    ONNX engine runs without them
+
+    Args:
+        path: Output .onnx file
+
+    Returns:
+        path
+    """
+    import tensorflow as tf
+    import tf2onnx
+
+    model = DeepFaceEmotionEngine().load().model
+    spec = (tf.TensorSpec((None, EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE, 1), tf.float32,
+                          name='input'),)
+    # from_function also works for Keras 3 models, which from_keras rejects
+    function = tf.function(lambda x: model(x, training=False))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Write then rename, so concurrent workers never load a half-written graph
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    tf2onnx.convert.from_function(function, input_signature=spec, opset=13, output_path=temp_path)
+    os.replace(temp_path, path)
+    print(f"Exported emotion model to {path}")
+    return path
+
+
+def quantize_onnx_model(source_path, target_path):
+    """
+    Write an int8 dynamically quantized copy of an ONNX graph
+
+    Args:
+        source_path: float32 .onnx file
+        target_path: Output .onnx file
+
+    Returns:
+        target_path
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    start = time.perf_counter()
+    temp_path = f"{target_path}.{os.getpid()}.tmp"
+    quantize_dynamic(source_path, temp_path, weight_type=QuantType.QInt8)
+    os.replace(temp_path, target_path)
+    print(f"Quantized emotion model to {target_path} in {time.perf_counter() - start:.1f}s")
+    return target_path
@@ -0,0 +1,310 @@
+"""
+Multi-face bookkeeping for group and panel recordings
+Gives every detected face a stable track id across analyzed frames (greedy
+IoU matching), keeps running emotion aggregates per face and picks the
+primary candidate by face size and closeness to the frame centre
+"""
+
+import numpy as np
+
+from emotion_stats import (
+    CONFIDENCE_WEIGHTS,
+    EMOTION_LABELS,
+    EmotionAccumulator,
+    emotions_to_matrix,
+    score_emotions,
+)
+
+
+def face_boxes(faces):
+    """
+    Args:
+        faces: DeepFace-format face dictionaries with a 'region'
+
+    Returns:
+        float64 array of shape (N, 4) with x, y, w, h per face
+    """
+    boxes = [[face['region'][k] for k in ('x', 'y', 'w', 'h')] for face in faces]
+    return np.array(boxes, dtype=np.float64).reshape(len(boxes), 4)
+
+
+def face_boxes_of(tracks):
+    """Boxes of FaceTracks as an array of shape (N, 4)"""
+    return np.array([track.box for track in tracks], dtype=np.float64).reshape(len(tracks), 4)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    Intersection over union of every box pair
+
+    Args:
+        boxes_a: Array of shape (N, 4) with x, y, w, h
+        boxes_b: Array of shape (M, 4) with x, y, w, h
+
+    Returns:
+        Array of shape (N, M)
+    """
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    overlap_w = (np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2])
+                 - np.maximum(a[..., 0], b[..., 0]))
+    overlap_h = (np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3])
+                 - np.maximum(a[..., 1], b[..., 1]))
+    intersection = np.clip(overlap_w, 0, None) * np.clip(overlap_h, 0, None)
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def primary_scores(boxes, frame_shape=None, centrality_weight=0.5):
+    """
+    Score faces as the primary candidate: relative size, discounted by the
+    distance from the frame centre when the frame size is known
+
+    Args:
+        boxes: Array of shape (N, 4) with x, y, w, h
+        frame_shape: Frame shape (height, width, ...) or None
+        centrality_weight: Share of the score lost by a face at the frame corner
+
+    Returns:
+        Array of N scores, higher is more likely the primary face
+    """
+    if len(boxes) == 0:
+        return np.zeros(0)
+    areas = boxes[:, 2] * boxes[:, 3]
+    scores = areas / max(areas.max(), 1e-9)
+    if frame_shape is not None:
+        height, width = frame_shape[:2]
+        centres = boxes[:, :2] + boxes[:, 2:] / 2.0
+        offsets = (centres - (width / 2.0, height / 2.0)) / (width / 2.0, height / 2.0)
+        # 0 at the centre, 1 at a corner
+        distance = np.clip(np.hypot(offsets[:, 0], offsets[:, 1]) / np.sqrt(2.0), 0.0, 1.0)
+        scores = scores * (1.0 - centrality_weight * distance)
+    return scores
+
+
+def primary_face(faces, frame_shape=None):
+    """
+    Pick the primary face of a result list: the one a MultiFaceTracker
+    marked, else the best by size and centrality
+
+    Args:
+        faces: DeepFace-format result list
+        frame_shape: Frame shape or None
+
+    Returns:
+        One face dictionary, or None for an empty list
+    """
+    if not faces:
+        return None
+    for face in faces:
+        if face.get('is_primary'):
+            return face
+    if len(faces) == 1 or not all('region' in face for face in faces):
+        return faces[0]
+    return faces[int(np.argmax(primary_scores(face_boxes(faces), frame_shape)))]
+
+
+class FaceTrack:
+    __slots__ = ('track_id', 'box', 'stats', 'hits', 'missed', 'first_seen', 'last_seen')
+
+    def __init__(self, track_id, box, frame_index, history_size=0):
+        self.track_id = track_id
+        self.box = box
+        self.stats = EmotionAccumulator(EMOTION_LABELS, history_size)
+        self.hits = 0
+        self.missed = 0
+        self.first_seen = frame_index
+        self.last_seen = frame_index
+
+    def summary(self):
+        """Per-face aggregates in the same shape as a session summary"""
+        stats = self.stats
+        return {
+            'averages': stats.average_emotions(),
+            'dominantCounts': dict(stats.dominant_counts),
+            'avgConfidence': stats.average_confidence(),
+            'avgClarity': stats.average_clarity(),
+            'totalDetections': stats.count,
+            'firstSeen': self.first_seen,
+            'lastSeen': self.last_seen,
+            'region': dict(zip(('x', 'y', 'w', 'h'), (int(v) for v in self.box)))
+        }
+
+
+class MultiFaceTracker:
+    def __init__(self, iou_threshold=0.3, max_missed=10, max_tracks=64, centrality_weight=0.5,
+                 switch_margin=0.2, history_size=0, confidence_weights=CONFIDENCE_WEIGHTS):
+        """
+        Args:
+            iou_threshold: Smallest box overlap that continues a track
+            max_missed: Analyzed frames a track may go unmatched before it ends
+            max_tracks: Tracks kept in total; the oldest ended ones are dropped first
+            centrality_weight: How much distance from the frame centre counts
+                against a face when choosing the primary candidate
+            switch_margin: The primary face only changes when another face
+                scores this fraction higher, so it does not flicker
+            history_size: Ring buffer size of each face's accumulator
+            confidence_weights: Weights for the per-face confidence score
+        """
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.max_tracks = max_tracks
+        self.centrality_weight = centrality_weight
+        self.switch_margin = switch_margin
+        self.history_size = history_size
+        self.confidence_weights = confidence_weights
+        self.reset()
+
+    def reset(self):
+        """Forget every track"""
+        # track id -> FaceTrack, oldest first
+        self.tracks = {}
+        self.active = []
+        self.next_id = 1
+        self.frame_index = 0
+        self.primary_id = None
+
+    def _match(self, boxes):
+        """Greedy IoU assignment, returns the track for each box or None"""
+        assigned = [None] * len(boxes)
+        if not self.active or len(boxes) == 0:
+            return assigned
+        overlaps = iou_matrix(boxes, face_boxes_of(self.active))
+        used = set()
+        for flat in np.argsort(overlaps, axis=None)[::-1]:
+            face_index, track_index = np.unravel_index(flat, overlaps.shape)
+            if overlaps[face_index, track_index] < self.iou_threshold:
+                break
+            if assigned[face_index] is not None or track_index in used:
+                continue
+            assigned[face_index] = self.active[track_index]
+            used.add(track_index)
+        return assigned
+
+    def update(self, faces, frame_shape=None):
+        """
+        Assign track ids to the faces of one analyzed frame and fold each
+        face into its own aggregates
+
+        Args:
+            faces: DeepFace-format result list (every face needs a 'region')
+            frame_shape: Frame shape, used to prefer central faces as primary
+
+        Returns:
+            The same list; every face gets 'track_id' and 'is_primary'
+        """
+        self.frame_index += 1
+        boxes = face_boxes(faces)
+        assigned = self._match(boxes)
+
+        for face, box, track in zip(faces, boxes, assigned):
+            if track is None:
+                track = FaceTrack(self.next_id, box, self.frame_index, self.history_size)
+                self.tracks[track.track_id] = track
+                self.active.append(track)
+                self.next_id += 1
+            track.box = box
+            track.hits += 1
+            track.missed = 0
+            track.last_seen = self.frame_index
+            face['track_id'] = track.track_id
+
+        # Unmatched tracks age and end after max_missed frames
+        seen = {face['track_id'] for face in faces}
+        for track in self.active:
+            if track.track_id not in seen:
+                track.missed += 1
+        self.active = [track for track in self.active if track.missed <= self.max_missed]
+        self._drop_ended()
+
+        if faces:
+            # Score all faces of the frame in one vectorized pass
+            dominant, confidence, clarity = score_emotions(
+                emotions_to_matrix([face['emotion'] for face in faces]), self.confidence_weights)
+            for i, face in enumerate(faces):
+                self.tracks[face['track_id']].stats.add(
+                    face['emotion'], confidence[i], clarity[i], EMOTION_LABELS[int(dominant[i])])
+            self._choose_primary(faces, boxes, frame_shape)
+        return faces
+
+    def _choose_primary(self, faces, boxes, frame_shape):
+        scores = primary_scores(boxes, frame_shape, self.centrality_weight)
+        best = int(np.argmax(scores))
+        current = next((i for i, face in enumerate(faces) if face['track_id'] == self.primary_id),
+                       None)
+        if current is not None and scores[current] * (1.0 + self.switch_margin) >= scores[best]:
+            best = current
+        self.primary_id = faces[best]['track_id']
+        for i, face in enumerate(faces):
+            face['is_primary'] = i == best
+
+    def _drop_ended(self):
+        active_ids = {track.track_id for track in self.active}
+        for track_id in list(self.tracks):
+            if len(self.tracks) <= self.max_tracks:
+                break
+            if track_id not in active_ids:
+                del self.tracks[track_id]
+
+    def get_state(self):
+        """
+        Get the tracks and their aggregates as plain data, e.g. to persist a
+        session
+
+        Returns:
+            JSON-serializable dictionary (history ring buffers are not included)
+        """
+        active_ids = {track.track_id for track in self.active}
+        return {
+            'next_id': self.next_id,
+            'frame_index': self.frame_index,
+            'primary_id': self.primary_id,
+            'tracks': [{
+                'track_id': track.track_id,
+                'box': [float(v) for v in track.box],
+                'stats': track.stats.get_state(),
+                'hits': track.hits,
+                'missed': track.missed,
+                'first_seen': track.first_seen,
+                'last_seen': track.last_seen,
+                'active': track.track_id in active_ids
+            } for track in self.tracks.values()]
+        }
+
+    def set_state(self, state):
+        """
+        Restore tracks saved by get_state
+
+        Args:
+            state: Dictionary from get_state
+        """
+        self.reset()
+        for saved in state['tracks']:
+            track = FaceTrack(saved['track_id'], np.array(saved['box'], dtype=np.float64),
+                              saved['first_seen'], self.history_size)
+            track.stats.set_state(saved['stats'])
+            track.hits = saved['hits']
+            track.missed = saved['missed']
+            track.last_seen = saved['last_seen']
+            self.tracks[track.track_id] = track
+            if saved['active']:
+                self.active.append(track)
+        self.next_id = state['next_id']
+        self.frame_index = state['frame_index']
+        self.primary_id = state['primary_id']
+
+    def get_face_summaries(self):
+        """
+        Returns:
+            Dictionary of track id -> per-face summary (averages,
+            dominantCounts, avgConfidence, avgClarity, totalDetections, first
+            and last analyzed frame, last region, and whether it is active)
+        """
+        active_ids = {track.track_id for track in self.active}
+        summaries = {}
+        for track_id, track in self.tracks.items():
+            summary = track.summary()
+            summary['active'] = track_id in active_ids
+            summary['primary'] = track_id == self.primary_id
+            summaries[track_id] = summary
+        return summaries
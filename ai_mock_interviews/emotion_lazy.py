@@ -0,0 +1,46 @@
+"""
+Deferred imports for the heavy inference dependencies
+OpenCV and DeepFace (which pulls in TensorFlow) are only imported when one of
+their attributes is first used, so code that just needs the statistics and
+scoring helpers starts without them
+"""
+
+import importlib
+import threading
+
+
+class LazyModule:
+    def __init__(self, name):
+        """
+        Args:
+            name: Dotted module name, e.g. 'cv2' or 'deepface.DeepFace'
+        """
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def load(self):
+        """Import the module if needed and return it"""
+        module = self.__dict__['_module']
+        if module is None:
+            with self.__dict__['_lock']:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['_name'])
+                    self.__dict__['_module'] = module
+        return module
+
+    @property
+    def loaded(self):
+        """True once the module has been imported"""
+        return self.__dict__['_module'] is not None
+
+    def __getattr__(self, attribute):
+        return getattr(self.load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self.load(), attribute, value)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
@@ -0,0 +1,280 @@
+"""
+Synthetic load generator for the emotion HTTP service
+Replays many concurrent interview sessions, each posting a JPEG frame every
+interval the way EmotionTracker.tsx does, and reports latency percentiles,
+status codes and achieved throughput
+
+Run with: python emotion_loadgen.py --sessions 50 --interval-ms 2000 --duration 60
+Without --url a local service is started on a free port for the run
+"""
+
+import argparse
+import base64
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+import cv2
+import numpy as np
+
+
+def encode_frames(frames, quality=60):
+    """
+    Encode frames as data URLs like canvas.toDataURL("image/jpeg", 0.6)
+
+    Args:
+        frames: List of BGR numpy frames
+        quality: JPEG quality
+
+    Returns:
+        List of data URL strings
+    """
+    urls = []
+    for frame in frames:
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            urls.append("data:image/jpeg;base64," + base64.b64encode(encoded.tobytes()).decode())
+    return urls
+
+
+def request(url, method='GET', body=None, timeout=30.0):
+    """
+    Send one HTTP request
+
+    Returns:
+        (status code, parsed JSON body or None); status 0 on connection errors
+    """
+    data = json.dumps(body).encode() if body is not None else None
+    headers = {'Content-Type': 'application/json'} if data is not None else {}
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status, json.loads(response.read() or b'null')
+    except urllib.error.HTTPError as e:
+        return e.code, None
+    except (urllib.error.URLError, OSError, ValueError):
+        return 0, None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_local_service(port, env=None, timeout=300.0):
+    """
+    Start emotion_service.py in a subprocess and wait until it is ready
+
+    Args:
+        port: Port to listen on
+        env: Extra environment variables (EMOTION_WORKERS, ...)
+        timeout: Seconds to wait for /ready
+
+    Returns:
+        subprocess.Popen of the service
+    """
+    service_env = dict(os.environ, EMOTION_HOST='127.0.0.1', EMOTION_PORT=str(port),
+                       EMOTION_SESSION_DB='')
+    service_env.update(env or {})
+    process = subprocess.Popen([sys.executable, 'emotion_service.py'],
+                               cwd=os.path.dirname(os.path.abspath(__file__)), env=service_env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Emotion service exited with code {process.returncode}")
+        status, _ = request(f"http://127.0.0.1:{port}/ready", timeout=2.0)
+        if status == 200:
+            return process
+        time.sleep(0.5)
+    process.terminate()
+    raise TimeoutError(f"Emotion service not ready after {timeout:.0f}s")
+
+
+def latency_summary(latencies):
+    """Latency statistics in milliseconds"""
+    if not latencies:
+        return {'count': 0}
+    samples = np.array(latencies) * 1000.0
+    return {
+        'count': len(samples),
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'max_ms': float(samples.max()),
+    }
+
+
+def run_load(url, sessions=20, interval_ms=2000.0, duration=30.0, frames=None, timeout=30.0,
+             end_sessions=True):
+    """
+    Replay concurrent sessions against a running service
+
+    Every session posts one frame per interval (open loop: a late response
+    does not delay the schedule, the next frame goes out as soon as possible)
+
+    Args:
+        url: Service base URL, e.g. http://localhost:8000
+        sessions: Concurrent sessions
+        interval_ms: Time between a session's frames (sampleIntervalMs)
+        duration: Seconds to run
+        frames: Data URLs to cycle through (default: synthetic frames)
+        timeout: Per-request timeout in seconds
+        end_sessions: DELETE every session afterwards
+
+    Returns:
+        Dictionary with offered/achieved request rates, status counts,
+        latency of successful requests and the service's /health afterwards
+    """
+    url = url.rstrip('/')
+    if not frames:
+        from emotion_benchmark import load_corpus
+        frames = encode_frames([frame for _, frame in load_corpus(count=8)])
+    interval = interval_ms / 1000.0
+    lock = threading.Lock()
+    statuses = Counter()
+    latencies = []
+    late = 0
+    stop_at = time.monotonic() + duration
+
+    def session_loop(index):
+        nonlocal late
+        session_id = f"loadgen-{index}"
+        # Spread session start times over one interval, like real clients
+        next_send = time.monotonic() + interval * index / max(sessions, 1)
+        sent = 0
+        while True:
+            now = time.monotonic()
+            # Stop at the deadline even when behind schedule
+            if next_send >= stop_at or now >= stop_at:
+                break
+            if next_send > now:
+                time.sleep(next_send - now)
+            elif now - next_send > interval:
+                with lock:
+                    late += 1
+            start = time.monotonic()
+            status, _ = request(f"{url}/analyze", 'POST',
+                                {'imageBase64': frames[(index + sent) % len(frames)],
+                                 'sessionId': session_id}, timeout)
+            elapsed = time.monotonic() - start
+            with lock:
+                statuses[status] += 1
+                if status == 200:
+                    latencies.append(elapsed)
+            sent += 1
+            next_send += interval
+
+    threads = [threading.Thread(target=session_loop, args=(i,), daemon=True)
+               for i in range(sessions)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    _, health = request(f"{url}/health")
+    if end_sessions:
+        for i in range(sessions):
+            request(f"{url}/sessions/loadgen-{i}", 'DELETE')
+
+    total = sum(statuses.values())
+    return {
+        'sessions': sessions,
+        'interval_ms': interval_ms,
+        'duration_s': elapsed,
+        'offered_rps': sessions / interval,
+        'achieved_rps': total / elapsed if elapsed else 0.0,
+        'ok_rps': statuses[200] / elapsed if elapsed else 0.0,
+        'requests': total,
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'late_ticks': late,
+        'latency': latency_summary(latencies),
+        'health': health,
+    }
+
+
+def print_load_results(results):
+    latency = results['latency']
+    print("\n" + "=" * 70)
+    print(f"Load: {results['sessions']} sessions, one frame every {results['interval_ms']:.0f}ms, "
+          f"{results['duration_s']:.0f}s")
+    print("-" * 70)
+    print(f"Offered:   {results['offered_rps']:8.2f} req/s")
+    print(f"Achieved:  {results['achieved_rps']:8.2f} req/s ({results['ok_rps']:.2f} ok/s)")
+    print(f"Statuses:  {results['statuses']} (0 = connection error)")
+    print(f"Late ticks:{results['late_ticks']:8d}")
+    if latency['count']:
+        print(f"Latency:   mean {latency['mean_ms']:.1f}ms, p50 {latency['p50_ms']:.1f}ms, "
+              f"p95 {latency['p95_ms']:.1f}ms, p99 {latency['p99_ms']:.1f}ms, "
+              f"max {latency['max_ms']:.1f}ms")
+    print("=" * 70)
+
+
+def add_load_arguments(parser):
+    """Register the load generator options on an argparse parser"""
+    parser.add_argument('--url', help="Service URL (default: start a local service)")
+    parser.add_argument('--sessions', type=int, default=20, help="Concurrent sessions")
+    parser.add_argument('--interval-ms', type=float, default=2000.0,
+                        help="Time between frames of one session (sampleIntervalMs)")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds to run")
+    parser.add_argument('--service-workers', type=int, default=None,
+                        help="EMOTION_WORKERS of the local service")
+    parser.add_argument('--service-batch-ms', type=float, default=None,
+                        help="EMOTION_BATCH_WINDOW_MS of the local service")
+
+
+def run_load_from_args(args, frames=None):
+    """
+    Run the load generator as configured by add_load_arguments, starting and
+    stopping a local service when no --url is given
+
+    Returns:
+        run_load results
+    """
+    service = None
+    url = args.url
+    if not url:
+        env = {}
+        if args.service_workers:
+            env['EMOTION_WORKERS'] = str(args.service_workers)
+        if args.service_batch_ms:
+            env['EMOTION_BATCH_WINDOW_MS'] = str(args.service_batch_ms)
+        port = free_port()
+        print(f"Starting local emotion service on port {port}...", file=sys.stderr)
+        service = start_local_service(port, env)
+        url = f"http://127.0.0.1:{port}"
+    try:
+        return run_load(url, args.sessions, args.interval_ms, args.duration, frames)
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait(timeout=30)
+
+
+def main():
+    """Main function with CLI interface"""
+    parser = argparse.ArgumentParser(description="Emotion service load generator")
+    add_load_arguments(parser)
+    parser.add_argument('--json', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_load_from_args(args)
+    print_load_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
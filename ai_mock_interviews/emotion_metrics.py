@@ -0,0 +1,199 @@
+"""
+Pipeline latency histograms and counters
+Fixed-bucket histograms keep memory constant and map directly onto the
+Prometheus text exposition format
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+# Bucket upper bounds in seconds, 0.5ms to 30s on a log scale
+LATENCY_BUCKETS = np.geomspace(0.0005, 30.0, 33)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Args:
+            buckets: Increasing bucket upper bounds in seconds
+        """
+        self.buckets = np.asarray(buckets, dtype=np.float64)
+        # One extra bucket for values above the last bound
+        self.counts = np.zeros(len(self.buckets) + 1, dtype=np.int64)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        """Add one measurement"""
+        self.counts[np.searchsorted(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """
+        Estimate a percentile by interpolating inside its bucket
+
+        Args:
+            q: Percentile between 0 and 100
+
+        Returns:
+            Latency in seconds, 0.0 if nothing was observed
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q / 100.0 * self.count
+        cumulative = np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, rank))
+        index = min(index, len(self.counts) - 1)
+        lower = self.buckets[index - 1] if index > 0 else 0.0
+        upper = self.buckets[index] if index < len(self.buckets) else self.max
+        below = cumulative[index - 1] if index > 0 else 0
+        in_bucket = self.counts[index]
+        fraction = (rank - below) / in_bucket if in_bucket else 1.0
+        return float(min(lower + (upper - lower) * fraction, self.max))
+
+    def summary(self):
+        """
+        Returns:
+            Dictionary with count, mean/max and p50/p95/p99 in milliseconds
+        """
+        return {
+            'count': self.count,
+            'mean_ms': self.sum / self.count * 1000.0 if self.count else 0.0,
+            'p50_ms': self.percentile(50) * 1000.0,
+            'p95_ms': self.percentile(95) * 1000.0,
+            'p99_ms': self.percentile(99) * 1000.0,
+            'max_ms': self.max * 1000.0
+        }
+
+
+class PipelineMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear all histograms and counters"""
+        with self.lock:
+            # (stage, backend) -> LatencyHistogram
+            self.histograms = {}
+            # (name, backend) -> int
+            self.counters = {}
+
+    def observe(self, stage, seconds, backend=None):
+        """
+        Record the duration of one pipeline stage
+
+        Args:
+            stage: Stage name (decode, detect, classify, record, total, ...)
+            seconds: Duration
+            backend: Detection backend, None for backend-independent stages
+        """
+        with self.lock:
+            histogram = self.histograms.get((stage, backend))
+            if histogram is None:
+                histogram = LatencyHistogram()
+                self.histograms[(stage, backend)] = histogram
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage, backend=None):
+        """Context manager timing its block as one stage observation"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, backend)
+
+    def increment(self, name, backend=None, amount=1):
+        """
+        Increase a counter
+
+        Args:
+            name: Counter name (frames, no_face, errors, fallbacks, ...)
+            backend: Detection backend, None for backend-independent counters
+            amount: Increment
+        """
+        with self.lock:
+            key = (name, backend)
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def snapshot(self):
+        """
+        Get all metrics as plain data
+
+        Returns:
+            Dictionary with 'stages' (stage -> backend -> latency summary) and
+            'counters' (name -> backend -> count); backend-independent entries
+            use the key 'all'
+        """
+        with self.lock:
+            stages = {}
+            for (stage, backend), histogram in sorted(self.histograms.items(),
+                                                      key=lambda x: (x[0][0], x[0][1] or '')):
+                stages.setdefault(stage, {})[backend or 'all'] = histogram.summary()
+            counters = {}
+            for (name, backend), value in sorted(self.counters.items(),
+                                                 key=lambda x: (x[0][0], x[0][1] or '')):
+                counters.setdefault(name, {})[backend or 'all'] = value
+        return {'stages': stages, 'counters': counters}
+
+    def to_prometheus(self, prefix='emotion', gauges=None, counters=None):
+        """
+        Render the metrics in the Prometheus text exposition format
+
+        Args:
+            prefix: Metric name prefix
+            gauges: Optional dictionary of extra gauge name -> value
+            counters: Optional dictionary of extra monotonic counter name ->
+                value, exposed with a _total suffix
+
+        Returns:
+            Metrics text
+        """
+        lines = []
+        with self.lock:
+            histograms = sorted(self.histograms.items(), key=lambda x: (x[0][0], x[0][1] or ''))
+            recorded = sorted(self.counters.items(), key=lambda x: (x[0][0], x[0][1] or ''))
+
+            name = f"{prefix}_stage_seconds"
+            lines.append(f"# HELP {name} Pipeline stage latency")
+            lines.append(f"# TYPE {name} histogram")
+            for (stage, backend), histogram in histograms:
+                labels = _labels(stage=stage, backend=backend)
+                cumulative = np.cumsum(histogram.counts)
+                for bound, count in zip(histogram.buckets, cumulative):
+                    lines.append(f'{name}_bucket{{{labels},le="{bound:.6g}"}} {count}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+            for counter in sorted({key[0] for key, _ in recorded}):
+                name = f"{prefix}_{counter}_total"
+                lines.append(f"# TYPE {name} counter")
+                for (counter_name, backend), value in recorded:
+                    if counter_name == counter:
+                        labels = _labels(backend=backend)
+                        lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+
+        for counter, value in (counters or {}).items():
+            name = f"{prefix}_{counter}_total"
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+
+        for gauge, value in (gauges or {}).items():
+            name = f"{prefix}_{gauge}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items() if value is not None)
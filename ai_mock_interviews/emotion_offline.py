@@ -0,0 +1,361 @@
+"""
+Offline batch emotion analysis for image directories, globs and video files
+Fans files out to a process pool and streams results to JSONL or CSV
+
+Run with: python emotion_offline.py <dir|glob|file> [...] --output results.jsonl
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from emotion_archive import SessionArchiveWriter
+from emotion_cache import ResultCache
+from emotion_engines import create_engine
+from emotion_lazy import LazyModule
+from emotion_recognition import EmotionRecognition
+from emotion_stats import EMOTION_LABELS
+from emotion_video import analyze_video_file
+
+
+cv2 = LazyModule('cv2')
+
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff'}
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v'}
+
+# One recognizer per worker process, created by _init_worker
+_worker_recognizer = None
+_worker_backend = 'opencv'
+
+
+def expand_inputs(inputs):
+    """
+    Expand directories and glob patterns into a sorted list of media files
+
+    Args:
+        inputs: Paths, directories or glob patterns
+
+    Returns:
+        List of image/video file paths without duplicates
+    """
+    media_extensions = IMAGE_EXTENSIONS | VIDEO_EXTENSIONS
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(os.path.join(root, name) for name in names
+                             if os.path.splitext(name)[1].lower() in media_extensions)
+        elif glob.has_magic(item):
+            files.extend(path for path in glob.glob(item, recursive=True)
+                         if os.path.splitext(path)[1].lower() in media_extensions)
+        elif os.path.isfile(item):
+            files.append(item)
+        else:
+            print(f"Warning: skipping missing input {item}", file=sys.stderr)
+    return sorted(set(files))
+
+
+def is_video(path):
+    return os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS
+
+
+# Engine options that change the scores; thread counts only change the speed
+RESULT_ENGINE_OPTIONS = ('model_path', 'quantize')
+
+
+def cache_namespace(backend, engine='deepface', engine_options=None, working_size=None):
+    """
+    Result cache namespace of an analysis setup, so results of a different
+    backend, engine, quantization or working size never hit
+
+    Returns:
+        Namespace string, e.g. 'opencv/onnx/quantize=True@480'
+    """
+    namespace = f"{backend}/{engine}"
+    for name in RESULT_ENGINE_OPTIONS:
+        value = (engine_options or {}).get(name)
+        if value:
+            namespace += f"/{name}={value}"
+    if working_size:
+        namespace += f"@{working_size}"
+    return namespace
+
+
+def _init_worker(backend, engine='deepface', engine_options=None, working_size=None):
+    """Load the models once per worker process"""
+    global _worker_recognizer, _worker_backend
+    _worker_backend = backend
+    _worker_recognizer = EmotionRecognition(engine=create_engine(engine, **(engine_options or {})),
+                                            working_size=working_size)
+    _worker_recognizer.current_backend = backend
+    _worker_recognizer.warm_up([backend])
+
+
+def analyze_image(path):
+    """
+    Analyze one image file in a worker
+
+    Args:
+        path: Image file path
+
+    Returns:
+        Result row dictionary
+    """
+    row = {'type': 'image', 'path': path}
+    frame = cv2.imread(path)
+    if frame is None:
+        row['error'] = "Could not read image"
+        return row
+
+    result = _worker_recognizer.detect_emotions_from_frame(frame, _worker_backend)
+    if result is not None and not _worker_recognizer.has_face(result, frame.shape):
+        # DeepFace scored the whole image: not a detection, and not cached
+        row['error'] = "No face detected"
+        return row
+    row = image_row(path, result)
+    # Handed back for the result cache, analyze_paths strips it before writing
+    row['_result'] = result
+    return row
+
+
+def image_row(path, result):
+    """
+    Build the result row of one image from its DeepFace-format result
+
+    Args:
+        path: Image file path
+        result: DeepFace-format result or None
+
+    Returns:
+        Result row dictionary
+    """
+    row = {'type': 'image', 'path': path}
+    sample = EmotionRecognition().record_emotions(result)
+    if sample is None:
+        row['error'] = "No emotions detected"
+        return row
+    row.update(sample)
+    return row
+
+
+def analyze_video(path, sample_fps=1.0, track=True, workers=1):
+    """
+    Analyze one video file in a worker, sampling frames at sample_fps
+
+    Args:
+        path: Video file path
+        sample_fps: Frames analyzed per second of video
+        track: Include every analyzed sample; without it the row only carries
+            the summary with its timeline segments
+        workers: Inference threads in this worker; decoding always runs on
+            its own thread next to them
+
+    Returns:
+        Result row dictionary with the per-video summary and emotion track
+    """
+    # Per-video session, so record_emotions aggregates this file only
+    return analyze_video_file(path, _worker_recognizer, _worker_backend, sample_fps, workers,
+                              track=track)
+
+
+def analyze_file(path, sample_fps=1.0, track=True, video_workers=1):
+    """Dispatch one file to the image or video analyzer, never raising"""
+    try:
+        if is_video(path):
+            return analyze_video(path, sample_fps, track, video_workers)
+        return analyze_image(path)
+    except Exception as e:
+        return {'type': 'video' if is_video(path) else 'image', 'path': path, 'error': str(e)}
+
+
+class ResultWriter:
+    """Streams result rows to a JSONL or CSV file as they arrive"""
+
+    CSV_FIELDS = ['type', 'path', 'error', 'dominant', 'confidence', 'clarity',
+                  'detections'] + EMOTION_LABELS
+
+    def __init__(self, path):
+        self.path = path
+        self.format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.csv_writer = None
+        if self.format == 'csv':
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=self.CSV_FIELDS)
+            self.csv_writer.writeheader()
+
+    def write(self, row):
+        if self.format == 'jsonl':
+            self.file.write(json.dumps(row) + "\n")
+        else:
+            self.csv_writer.writerow(self._flatten(row))
+        self.file.flush()
+
+    def _flatten(self, row):
+        flat = {'type': row['type'], 'path': row['path'], 'error': row.get('error', '')}
+        if row['type'] == 'video' and 'summary' in row:
+            # One CSV line per video, carrying its summary
+            summary = row['summary']
+            counts = summary['dominantCounts']
+            flat['dominant'] = max(counts.items(), key=lambda x: x[1])[0] if counts else ''
+            flat['confidence'] = summary['avgConfidence']
+            flat['clarity'] = summary['avgClarity']
+            flat['detections'] = summary['totalDetections']
+            flat.update(summary['averages'])
+        elif 'scores' in row:
+            flat['dominant'] = row['dominant']
+            flat['confidence'] = row['confidence']
+            flat['clarity'] = row['clarity']
+            flat['detections'] = 1
+            flat.update({name: row['scores'].get(name, 0.0) for name in EMOTION_LABELS})
+        return flat
+
+    def close(self):
+        self.file.close()
+
+
+def analyze_paths(inputs, output='emotion_results.jsonl', workers=None, backend='opencv',
+                  sample_fps=1.0, progress=True, cache_path=None, engine='deepface',
+                  engine_options=None, track=True, video_workers=1, working_size=None,
+                  archive_path=None):
+    """
+    Analyze every image and video under the inputs with a process pool
+
+    Args:
+        inputs: Paths, directories or glob patterns
+        output: JSONL or CSV file the per-file results are streamed to
+        workers: Worker processes (default: CPU count)
+        backend: Face detection backend
+        sample_fps: Frames analyzed per second of video
+        progress: Print progress and throughput to stderr
+        cache_path: JSON result cache; images whose content was analyzed
+            before with the same backend and engine setup are not analyzed again
+        engine: Emotion classifier engine, 'deepface' or 'onnx'
+        engine_options: Engine arguments, e.g. quantize or intra_op_threads
+        track: Write every analyzed video sample, not just the summary and
+            its timeline segments
+        video_workers: Inference threads per worker process for videos
+        working_size: Longest side images and frames are downscaled to for
+            face detection (None: full resolution)
+        archive_path: Also write every video's track to this SessionArchive
+            directory (needs track)
+
+    Returns:
+        EmotionRecognition holding the aggregate over all analyzed images
+    """
+    files = expand_inputs(inputs)
+    aggregate = EmotionRecognition()
+    if not files:
+        print("No image or video files found.", file=sys.stderr)
+        return aggregate
+
+    writer = ResultWriter(output)
+    archive = SessionArchiveWriter(archive_path) if archive_path and track else None
+    cache = ResultCache(max_entries=1 << 20, path=cache_path) if cache_path else None
+    start = time.perf_counter()
+    done = 0
+    failed = 0
+
+    def finish(row):
+        nonlocal done, failed
+        writer.write(row)
+        if archive is not None and row['type'] == 'video' and row.get('track'):
+            archive.add_track(row['path'], row['track'], {'path': row['path'], 'fps': row['fps']})
+        done += 1
+        if 'error' in row:
+            failed += 1
+        elif row['type'] == 'image':
+            # Images have no time axis, they don't form a timeline
+            aggregate.record_emotions({'emotion': row['scores']}, timestamp=0.0)
+        if progress:
+            elapsed = time.perf_counter() - start
+            print(f"\r[{done}/{len(files)}] {done / elapsed:6.2f} files/s, "
+                  f"{failed} failed", end='', file=sys.stderr, flush=True)
+
+    try:
+        keys = {}
+        pending = []
+        namespace = cache_namespace(backend, engine, engine_options, working_size)
+        for path in files:
+            if cache is not None and not is_video(path):
+                with open(path, 'rb') as f:
+                    keys[path] = cache.key_for_bytes(f.read(), namespace)
+                cached = cache.get(keys[path])
+                if cached is not None:
+                    finish(image_row(path, cached))
+                    continue
+            pending.append(path)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(backend, engine, engine_options, working_size)) as pool:
+            futures = [pool.submit(analyze_file, path, sample_fps, track, video_workers)
+                       for path in pending]
+            for future in as_completed(futures):
+                row = future.result()
+                result = row.pop('_result', None)
+                if cache is not None and result is not None and row['path'] in keys:
+                    cache.put(keys[row['path']], result)
+                finish(row)
+    finally:
+        writer.close()
+        if archive is not None:
+            archive.close()
+        if cache is not None:
+            cache.save()
+
+    if progress:
+        elapsed = time.perf_counter() - start
+        print(f"\nAnalyzed {done} files in {elapsed:.1f}s ({done / elapsed:.2f} files/s), "
+              f"results written to {output}", file=sys.stderr)
+    return aggregate
+
+
+def main():
+    """Main function with CLI interface"""
+    parser = argparse.ArgumentParser(description="Offline batch emotion analysis")
+    parser.add_argument('inputs', nargs='+', help="Image/video files, directories or glob patterns")
+    parser.add_argument('--output', '-o', default='emotion_results.jsonl',
+                        help="Results file, .jsonl or .csv")
+    parser.add_argument('--workers', '-j', type=int, default=None, help="Worker processes")
+    parser.add_argument('--backend', default='opencv',
+                        help="Face detection backend, or 'cascade' for fastest-first escalation")
+    parser.add_argument('--sample-fps', type=float, default=1.0,
+                        help="Frames analyzed per second of video")
+    parser.add_argument('--quiet', '-q', action='store_true', help="No progress output")
+    parser.add_argument('--cache', help="JSON result cache reused across reruns")
+    parser.add_argument('--engine', default='deepface', choices=['deepface', 'onnx'],
+                        help="Emotion classifier engine")
+    parser.add_argument('--int8', action='store_true', help="Quantized ONNX engine")
+    parser.add_argument('--threads', type=int, default=0,
+                        help="ONNX Runtime threads per worker (0: default)")
+    parser.add_argument('--no-track', action='store_true',
+                        help="Write only each video's summary and timeline segments, "
+                             "not every sample")
+    parser.add_argument('--video-workers', type=int, default=1,
+                        help="Inference threads per worker process for videos")
+    parser.add_argument('--working-size', type=int, default=None,
+                        help="Detect faces on images downscaled to this longest side")
+    parser.add_argument('--archive',
+                        help="Also write the video tracks to this columnar archive directory")
+    args = parser.parse_args()
+
+    engine_options = {}
+    if args.engine == 'onnx':
+        engine_options = {'quantize': args.int8, 'intra_op_threads': args.threads}
+    aggregate = analyze_paths(args.inputs, args.output, args.workers, args.backend,
+                              args.sample_fps, progress=not args.quiet, cache_path=args.cache,
+                              engine=args.engine, engine_options=engine_options,
+                              track=not args.no_track, video_workers=args.video_workers,
+                              working_size=args.working_size, archive_path=args.archive)
+    if aggregate.total_detections > 0:
+        # Summary over all images; each video's summary is in its result row
+        aggregate.display_session_statistics()
+
+
+if __name__ == "__main__":
+    main()
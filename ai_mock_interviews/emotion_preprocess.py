@@ -0,0 +1,180 @@
+"""
+Downscale and ROI preprocessing for face detection
+Detectors scan every pixel, yet the emotion model only needs a 48x48 face:
+frames are shrunk to a working resolution for detection, the face boxes are
+mapped back to the original frame and only the face region is cropped (and
+eye-aligned) from the full-resolution frame for classification
+"""
+
+import math
+import threading
+
+import numpy as np
+
+from emotion_lazy import LazyModule
+
+
+cv2 = LazyModule('cv2')
+DeepFace = LazyModule('deepface.DeepFace')
+
+
+def working_shape(shape, working_size):
+    """
+    Size of the detection image for a frame
+
+    Args:
+        shape: Frame shape (height, width, ...)
+        working_size: Longest side of the detection image
+
+    Returns:
+        (height, width, scale) with scale <= 1; scale 1 leaves the frame as is
+    """
+    height, width = shape[:2]
+    scale = working_size / max(height, width)
+    if scale >= 1.0:
+        return height, width, 1.0
+    return max(int(round(height * scale)), 1), max(int(round(width * scale)), 1), scale
+
+
+def align_face(frame, box, left_eye, right_eye):
+    """
+    Crop a face rotated so its eyes are level, like DeepFace's alignment:
+    the frame is rotated about the box centre and the box is cut out, in one
+    warpAffine that only computes the box's pixels
+
+    Args:
+        frame: Full-resolution frame (BGR)
+        box: (x, y, w, h) in frame coordinates
+        left_eye: (x, y) of the person's left eye
+        right_eye: (x, y) of the person's right eye
+
+    Returns:
+        BGR crop of shape (h, w, 3)
+    """
+    x, y, w, h = box
+    angle = math.degrees(math.atan2(left_eye[1] - right_eye[1], left_eye[0] - right_eye[0]))
+    centre = (x + w / 2.0, y + h / 2.0)
+    matrix = cv2.getRotationMatrix2D(centre, angle, 1.0)
+    # Shift so the rotated box lands at the output origin
+    matrix[0, 2] += w / 2.0 - centre[0]
+    matrix[1, 2] += h / 2.0 - centre[1]
+    return cv2.warpAffine(frame, matrix, (w, h), flags=cv2.INTER_CUBIC,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+
+
+class DetectionPreprocessor:
+    def __init__(self, working_size=640, interpolation=None):
+        """
+        Args:
+            working_size: Longest side, in pixels, of the image the detector
+                sees; smaller frames are detected as they are
+            interpolation: cv2 interpolation for downscaling (default INTER_AREA)
+        """
+        self.working_size = working_size
+        self.interpolation = interpolation
+        # Resize buffers are reused per thread: the recognizer is shared by
+        # the service and video worker pools
+        self.local = threading.local()
+
+    def downscale(self, frame):
+        """
+        Shrink a frame to the working resolution into a reused buffer
+
+        Args:
+            frame: Video frame as numpy array (BGR)
+
+        Returns:
+            (detection image, scale); the image is the frame itself when it is
+            already small enough, else a buffer overwritten by the next call
+            from the same thread
+        """
+        height, width, scale = working_shape(frame.shape, self.working_size)
+        if scale == 1.0:
+            return frame, 1.0
+        buffers = getattr(self.local, 'buffers', None)
+        if buffers is None:
+            buffers = self.local.buffers = {}
+        key = (height, width) + frame.shape[2:]
+        buffer = buffers.get(key)
+        if buffer is None or buffer.dtype != frame.dtype:
+            buffer = np.empty(key, dtype=frame.dtype)
+            buffers[key] = buffer
+        interpolation = cv2.INTER_AREA if self.interpolation is None else self.interpolation
+        cv2.resize(frame, (width, height), dst=buffer, interpolation=interpolation)
+        return buffer, scale
+
+    def map_area(self, area, scale, frame_shape):
+        """
+        Map a facial area from the detection image back to the frame
+
+        Args:
+            area: DeepFace facial_area dictionary (x, y, w, h, optional eyes)
+            scale: Detection image scale from downscale
+            frame_shape: Shape of the original frame
+
+        Returns:
+            New facial_area dictionary in frame coordinates, clipped to the frame
+        """
+        height, width = frame_shape[:2]
+        x = min(max(int(round(area['x'] / scale)), 0), width - 1)
+        y = min(max(int(round(area['y'] / scale)), 0), height - 1)
+        mapped = dict(area)
+        mapped.update({
+            'x': x,
+            'y': y,
+            'w': max(min(int(round(area['w'] / scale)), width - x), 1),
+            'h': max(min(int(round(area['h'] / scale)), height - y), 1),
+        })
+        for landmark in ('left_eye', 'right_eye', 'nose', 'mouth_left', 'mouth_right'):
+            point = area.get(landmark)
+            if point is not None:
+                mapped[landmark] = (int(round(point[0] / scale)), int(round(point[1] / scale)))
+        return mapped
+
+    def extract_faces(self, frame, backend='opencv', enforce_detection=False, align=True):
+        """
+        Drop-in for DeepFace.extract_faces on a frame: detect on the
+        downscaled frame, crop each face from the full-resolution frame
+
+        Args:
+            frame: Video frame as numpy array (BGR)
+            backend: Face detection backend
+            enforce_detection: Raise ValueError when no face is found,
+                otherwise return the whole frame like DeepFace does
+            align: Rotate each face crop so the eyes are level
+
+        Returns:
+            List of dictionaries with 'face' (RGB crop, a view where possible),
+            'facial_area' in frame coordinates and 'confidence'
+        """
+        image, scale = self.downscale(frame)
+        if scale == 1.0:
+            return DeepFace.extract_faces(img_path=frame, detector_backend=backend,
+                                          enforce_detection=enforce_detection, align=align)
+
+        # Alignment happens on the full-resolution crop, skip DeepFace's
+        face_objs = DeepFace.extract_faces(img_path=image, detector_backend=backend,
+                                           enforce_detection=enforce_detection, align=False)
+        height, width = frame.shape[:2]
+        if len(face_objs) == 1 and face_objs[0]['confidence'] == 0:
+            area = face_objs[0]['facial_area']
+            if area['w'] >= image.shape[1] - 1 and area['h'] >= image.shape[0] - 1:
+                # No face: the same whole-frame fallback DeepFace returns
+                return [{'face': frame[:, :, ::-1],
+                         'facial_area': {'x': 0, 'y': 0, 'w': width - 1, 'h': height - 1,
+                                         'left_eye': None, 'right_eye': None},
+                         'confidence': 0}]
+
+        faces = []
+        for face_obj in face_objs:
+            area = self.map_area(face_obj['facial_area'], scale, frame.shape)
+            box = (area['x'], area['y'], area['w'], area['h'])
+            if align and area.get('left_eye') is not None and area.get('right_eye') is not None:
+                crop = align_face(frame, box, area['left_eye'], area['right_eye'])
+            else:
+                x, y, w, h = box
+                crop = frame[y:y + h, x:x + w]
+            # RGB like DeepFace's faces, callers flip back to BGR
+            faces.append({'face': crop[:, :, ::-1], 'facial_area': area,
+                          'confidence': face_obj['confidence']})
+        return faces
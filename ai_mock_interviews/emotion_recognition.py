@@ -3,34 +3,158 @@ Emotion Recognition using DeepFace
 Supports real-time webcam and image file detection
 """
 
-import cv2
 import numpy as np
-from deepface import DeepFace
+
+from emotion_lazy import LazyModule
+from emotion_stats import (
+    CONFIDENCE_OFFSET,
+    CONFIDENCE_WEIGHTS,
+    EMOTION_LABELS,
+    EmotionAccumulator,
+    emotions_to_matrix,
+    score_emotions,
+    summarize_emotion_matrix,
+)
+from emotion_engines import create_engine
+from emotion_faces import MultiFaceTracker, primary_face
+from emotion_metrics import PipelineMetrics
+from emotion_preprocess import DetectionPreprocessor
+from emotion_sampling import AdaptiveFrameSampler, BackgroundAnalyzer
+from emotion_timeline import EmotionTimeline, format_segment
 import os
 import sys
-from pathlib import Path
-from collections import Counter
+import base64
+import binascii
+import tempfile
+import time
+
+# Imported on first use: the statistics and scoring methods work without
+# OpenCV, DeepFace or TensorFlow
+cv2 = LazyModule('cv2')
+DeepFace = LazyModule('deepface.DeepFace')
+
+
+def decode_image_bytes(data):
+    """
+    Decode encoded image bytes (JPEG, PNG, ...) into a BGR numpy array
+    without touching the filesystem
+    
+    Args:
+        data: Encoded image as bytes, bytearray or memoryview
+    
+    Returns:
+        BGR frame as numpy array, or None if the data could not be decoded
+    """
+    if not data:
+        return None
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def decode_base64_image(image_base64):
+    """
+    Decode a base64 image string into a BGR numpy array
+    
+    Args:
+        image_base64: Base64 string, optionally a data URL such as
+            "data:image/jpeg;base64,..." as produced by canvas.toDataURL
+    
+    Returns:
+        BGR frame as numpy array, or None if the data could not be decoded
+    """
+    if not image_base64:
+        return None
+    if image_base64.startswith("data:"):
+        image_base64 = image_base64.split(",", 1)[-1]
+    try:
+        data = base64.b64decode(image_base64, validate=False)
+    except (binascii.Error, ValueError):
+        return None
+    return decode_image_bytes(data)
+
+
+def is_frame_fallback(area, confidence, frame_shape):
+    """
+    Check for the whole-frame face DeepFace returns when the detector missed
+    
+    Args:
+        area: facial_area / region dictionary (x, y, w, h)
+        confidence: Detection confidence of the face
+        frame_shape: Shape of the analyzed frame
+    
+    Returns:
+        True if the face is the fallback, not a detection
+    """
+    # The fallback box is one pixel short of the frame, with confidence 0
+    return (confidence == 0 and area.get('w', 0) >= frame_shape[1] - 1
+            and area.get('h', 0) >= frame_shape[0] - 1)
 
 
 class EmotionRecognition:
-    def __init__(self):
+    def __init__(self, history_size=0, confidence_weights=None, metrics=None, result_cache=None,
+                 engine=None, working_size=None):
+        """
+        Args:
+            history_size: Number of recent detections kept in a ring buffer
+                for get_recent_history (0 disables it)
+            confidence_weights: Weight per emotion (EMOTION_LABELS order) for
+                the weighted confidence score (default: CONFIDENCE_WEIGHTS)
+            metrics: PipelineMetrics to record stage timings and counters to,
+                pass a shared one to combine several recognizers
+            result_cache: Optional ResultCache consulted before running
+                inference on an image
+            engine: Emotion classifier engine, 'deepface' (default), 'onnx'
+                or an engine instance from emotion_engines
+            working_size: Longest side frames are downscaled to for face
+                detection; faces are still cropped from the full-resolution
+                frame (None: detect at full resolution)
+        """
         self.backends = ['opencv', 'ssd', 'dlib', 'mtcnn', 'retinaface']
         self.current_backend = 'opencv'  # Fast default backend
-        # Session tracking for emotion statistics
-        self.session_data = {
-            'angry': [],
-            'disgust': [],
-            'fear': [],
-            'happy': [],
-            'sad': [],
-            'surprise': [],
-            'neutral': []
-        }
-        self.total_detections = 0
-        self.dominant_emotions = []  # Track which emotion was dominant in each detection
-        self.confidence_scores = []  # Track confidence of dominant emotion in each detection
-        self.detection_clarity = []  # Track how clear each detection was (difference between top 2 emotions)
+        # Backend cascade, fastest first: 'cascade' as backend escalates along
+        # it on a miss and starts from the last winning backend
+        self.cascade_backends = list(self.backends)
+        self.cascade_min_confidence = {}
+        self.cascade_backend = None
+        # Backend -> error for cascade backends that cannot be imported, they
+        # are skipped for good; other errors only back the backend off for
+        # cascade_retry_seconds, doubling with every consecutive failure
+        self.cascade_failures = {}
+        self.cascade_retry_seconds = 1.0
+        self.cascade_max_retry_seconds = 60.0
+        self.cascade_errors = {}
+        self.cascade_retry_after = {}
+        # Session tracking for emotion statistics: running aggregates of the
+        # emotion values, dominant emotion, confidence and clarity (difference
+        # between top 2 emotions) of every detection, updated in O(1)
+        self.session_stats = EmotionAccumulator(EMOTION_LABELS, history_size)
+        if confidence_weights is None:
+            confidence_weights = CONFIDENCE_WEIGHTS
+        self.confidence_weights = np.asarray(confidence_weights, dtype=np.float64)
+        # Track ids and per-face aggregates for results with several faces;
+        # session_stats follows the primary face
+        self.faces = MultiFaceTracker(confidence_weights=self.confidence_weights)
+        # Smoothed emotion series with hysteresis, condensed into segments
+        self.timeline = EmotionTimeline()
+        # Warm-up state, see warm_up()
+        self.ready = False
+        self.warmup_report = None
+        # Per-stage latency histograms and per-backend counters
+        self.metrics = metrics or PipelineMetrics()
+        self.last_error = None
+        self.result_cache = result_cache
+        if engine is None or isinstance(engine, str):
+            engine = create_engine(engine or 'deepface')
+        self.engine = engine
+        self.working_size = working_size
+        self.preprocessor = DetectionPreprocessor(working_size) if working_size else None
         
+    def _cache_namespace(self, backend):
+        """Cache key namespace, results differ per backend and working size"""
+        if self.preprocessor is None:
+            return backend
+        return f"{backend}@{self.working_size}"
+    
     def detect_emotions_from_image(self, image_path, backend='opencv'):
         """
         Detect emotions from an image file
@@ -45,56 +169,576 @@ class EmotionRecognition:
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"Image file not found: {image_path}")
         
+        if self.result_cache is not None:
+            # enforce_detection=True results differ from the frame path's
+            namespace = f"{self._cache_namespace(backend)}/strict"
+            if self.result_cache.perceptual:
+                key = self.result_cache.key_for_frame(cv2.imread(image_path), namespace)
+            else:
+                with open(image_path, 'rb') as f:
+                    key = self.result_cache.key_for_bytes(f.read(), namespace)
+            return self._cached(key, lambda: self._analyze_image_file(image_path, backend))
+        return self._analyze_image_file(image_path, backend)
+    
+    def _analyze_image_file(self, image_path, backend='opencv'):
+        """Analyze an image file, see detect_emotions_from_image"""
+        start = time.perf_counter()
+        self.metrics.increment('frames', backend)
         try:
-            # Analyze emotions
-            result = DeepFace.analyze(
-                img_path=image_path,
-                actions=['emotion'],
-                enforce_detection=True,
-                detector_backend=backend,
-                silent=True
-            )
+            # Same steps as DeepFace.analyze with enforce_detection=True
+            with self.metrics.timer('detect', backend):
+                if self.preprocessor is not None:
+                    image = cv2.imread(image_path)
+                    if image is None:
+                        raise ValueError(f"Could not read image: {image_path}")
+                    face_objs = self.preprocessor.extract_faces(image, backend,
+                                                                enforce_detection=True)
+                else:
+                    face_objs = DeepFace.extract_faces(
+                        img_path=image_path,
+                        detector_backend=backend,
+                        enforce_detection=True,
+                        align=True
+                    )
+            face_objs = [f for f in face_objs if f['face'].shape[0] > 0 and f['face'].shape[1] > 0]
+            with self.metrics.timer('classify', backend):
+                predictions = self.classify_faces([f['face'][:, :, ::-1] for f in face_objs])
             
+            result = self._build_results(face_objs, predictions)
+            self.metrics.observe('total', time.perf_counter() - start, backend)
             return result
+        except ValueError as e:
+            # enforce_detection raises ValueError when no face is found
+            self.metrics.increment('no_face', backend)
+            self.last_error = str(e)
+            print(f"Error analyzing image: {str(e)}")
+            return None
         except Exception as e:
+            self.metrics.increment('errors', backend)
+            self.last_error = str(e)
             print(f"Error analyzing image: {str(e)}")
             return None
     
-    def detect_emotions_from_frame(self, frame, backend='opencv'):
+    def detect_emotions_from_frame(self, frame, backend='opencv', zero_copy=True):
         """
         Detect emotions from a video frame (numpy array)
         
         Args:
-            frame: Video frame as numpy array
+            frame: Video frame as numpy array (BGR)
+            backend: Face detection backend
+            zero_copy: Pass the array straight to DeepFace instead of
+                round-tripping it through a temporary JPEG file
+        
+        Returns:
+            Dictionary with emotion analysis results or None
+        """
+        if frame is None:
+            return None
+        
+        if self.result_cache is not None:
+            key = self.result_cache.key_for_frame(frame, self._cache_namespace(backend))
+            return self._cached(key, lambda: self._analyze_frame(frame, backend, zero_copy))
+        return self._analyze_frame(frame, backend, zero_copy)
+    
+    def _cached(self, key, compute):
+        """
+        Serve a result from the result cache, computing and storing it on a miss
+        
+        Args:
+            key: Cache key, None if the input cannot be cached (e.g. an
+                undecodable image)
+            compute: Zero-argument callable producing the result
+        
+        Returns:
+            Cached or computed result (failed analyses are not cached)
+        """
+        if key is None:
+            return compute()
+        result = self.result_cache.get(key)
+        if result is not None:
+            self.metrics.increment('cache_hits')
+            return result
+        self.metrics.increment('cache_misses')
+        result = compute()
+        if result is not None:
+            self.result_cache.put(key, result)
+        return result
+    
+    def _analyze_frame(self, frame, backend='opencv', zero_copy=True):
+        """Run inference on a frame, see detect_emotions_from_frame"""
+        if frame is None:
+            return None
+        
+        if backend == 'cascade':
+            return self.detect_emotions_cascade(frame)
+        
+        if not zero_copy:
+            return self._detect_emotions_via_temp_file(frame, backend)
+        
+        start = time.perf_counter()
+        self.metrics.increment('frames', backend)
+        try:
+            # Same steps as DeepFace.analyze, split so each stage is timed.
+            # DeepFace accepts BGR numpy arrays directly, no encode/decode needed
+            face_objs = self._extract_faces(frame, backend)
+            with self.metrics.timer('classify', backend):
+                predictions = self.classify_faces([f['face'][:, :, ::-1] for f in face_objs])
+        except Exception as e:
+            self.metrics.increment('errors', backend)
+            self.last_error = str(e)
+            return None
+        
+        result = self._build_results(face_objs, predictions)
+        self.metrics.observe('total', time.perf_counter() - start, backend)
+        return result or None
+    
+    def _extract_faces(self, frame, backend='opencv'):
+        """
+        Detect and align faces, counting frames where the detector found none
+        
+        Args:
+            frame: Video frame as numpy array (BGR)
+            backend: Face detection backend
+        
+        Returns:
+            List of DeepFace extract_faces dictionaries with non-empty faces.
+            Without a face DeepFace falls back to the whole frame.
+        """
+        with self.metrics.timer('detect', backend):
+            if self.preprocessor is not None:
+                # Detect on a downscaled copy, crop faces from the full frame
+                face_objs = self.preprocessor.extract_faces(frame, backend)
+            else:
+                face_objs = DeepFace.extract_faces(
+                    img_path=frame,
+                    detector_backend=backend,
+                    enforce_detection=False,
+                    align=True
+                )
+        face_objs = [f for f in face_objs if f['face'].shape[0] > 0 and f['face'].shape[1] > 0]
+        
+        if not self._face_found(face_objs, frame):
+            self.metrics.increment('no_face', backend)
+            self.metrics.increment('fallbacks', backend)
+        return face_objs
+    
+    def _face_found(self, face_objs, frame):
+        """False if the detector missed and DeepFace returned the whole frame"""
+        if not face_objs:
+            return False
+        return not (len(face_objs) == 1 and is_frame_fallback(
+            face_objs[0]['facial_area'], face_objs[0]['confidence'], frame.shape))
+    
+    def has_face(self, result, frame_shape):
+        """
+        Check an analysis result for a detected face
+        
+        Args:
+            result: DeepFace-format result list or None
+            frame_shape: Shape of the analyzed frame
+        
+        Returns:
+            False for None, an empty list or DeepFace's whole-frame fallback,
+            whose scores describe the frame rather than a face
+        """
+        if not result:
+            return False
+        return not (len(result) == 1 and is_frame_fallback(
+            result[0].get('region') or {}, result[0].get('face_confidence'), frame_shape))
+    
+    def _extract_faces_cascade(self, frame, backends=None, min_confidence=None, preferred=None):
+        """
+        Run detectors fastest first until one finds a confident face
+        
+        Args:
+            frame: Video frame as numpy array (BGR)
+            backends: Backends in escalation order (default: cascade_backends)
+            min_confidence: Detection confidence below which the next backend
+                is tried, a number or a backend -> number dictionary
+                (default: cascade_min_confidence, i.e. escalate on a miss only)
+            preferred: Backend tried first, e.g. the last winner
+        
+        Returns:
+            Tuple of (face_objs, backend, found). Without a confident face the
+            most confident attempt is returned, or the whole-frame fallback.
+        """
+        order = list(backends or self.cascade_backends)
+        if preferred in order:
+            order.remove(preferred)
+            order.insert(0, preferred)
+        if min_confidence is None:
+            min_confidence = self.cascade_min_confidence
+        
+        best = None
+        best_confidence = -1.0
+        for backend in order:
+            if backend in self.cascade_failures:
+                continue
+            if self.cascade_retry_after.get(backend, 0.0) > time.monotonic():
+                continue
+            try:
+                face_objs = self._extract_faces(frame, backend)
+            except ImportError as e:
+                # Detector package not installed, it will not appear while running
+                self.metrics.increment('errors', backend)
+                self.last_error = str(e)
+                self.cascade_failures[backend] = str(e)
+                continue
+            except Exception as e:
+                # Possibly transient (model download, out of memory, ...): skip
+                # the backend for a while instead of paying for it on every miss
+                self.metrics.increment('errors', backend)
+                self.last_error = str(e)
+                failures = self.cascade_errors.get(backend, 0) + 1
+                self.cascade_errors[backend] = failures
+                backoff = min(self.cascade_retry_seconds * 2 ** (failures - 1),
+                              self.cascade_max_retry_seconds)
+                self.cascade_retry_after[backend] = time.monotonic() + backoff
+                continue
+            self.cascade_errors.pop(backend, None)
+            self.cascade_retry_after.pop(backend, None)
+            
+            if isinstance(min_confidence, dict):
+                threshold = min_confidence.get(backend, 0.0)
+            else:
+                threshold = min_confidence
+            found = self._face_found(face_objs, frame)
+            confidence = max(f['confidence'] for f in face_objs) if found else 0.0
+            if found and confidence >= threshold:
+                self.metrics.increment('cascade_hits', backend)
+                return face_objs, backend, True
+            
+            self.metrics.increment('escalations', backend)
+            if best is None or confidence > best_confidence:
+                best = (face_objs, backend)
+                best_confidence = confidence
+        
+        if best is None:
+            return [], None, False
+        return best[0], best[1], self._face_found(best[0], frame)
+    
+    def detect_emotions_cascade(self, frame, backends=None, min_confidence=None, preferred=None):
+        """
+        Detect emotions with the backend cascade: try the fastest detector
+        first and escalate to slower, more accurate ones only on a miss or a
+        low-confidence detection
+        
+        Args:
+            frame: Video frame as numpy array (BGR)
+            backends: Backends in escalation order (default: cascade_backends)
+            min_confidence: Escalation threshold, number or per-backend dictionary
+            preferred: Backend tried first (default: the last winner,
+                cascade_backend)
+        
+        Returns:
+            DeepFace-format result list or None. When a face was found every
+            face dictionary also carries the 'detector_backend' that found it.
+        """
+        if frame is None:
+            return None
+        if preferred is None:
+            preferred = self.cascade_backend
+        
+        start = time.perf_counter()
+        self.metrics.increment('frames', 'cascade')
+        try:
+            face_objs, backend, found = self._extract_faces_cascade(
+                frame, backends, min_confidence, preferred)
+            if not face_objs:
+                self.metrics.increment('errors', 'cascade')
+                return None
+            with self.metrics.timer('classify', backend):
+                predictions = self.classify_faces([f['face'][:, :, ::-1] for f in face_objs])
+        except Exception as e:
+            self.metrics.increment('errors', 'cascade')
+            self.last_error = str(e)
+            return None
+        
+        result = self._build_results(face_objs, predictions)
+        if found:
+            # Remember the winner, the next frame starts with it
+            self.cascade_backend = backend
+            for face in result:
+                face['detector_backend'] = backend
+        self.metrics.observe('total', time.perf_counter() - start, 'cascade')
+        return result
+    
+    def _build_results(self, face_objs, predictions):
+        """
+        Build DeepFace analyze-format results from faces and their scores
+        
+        Args:
+            face_objs: DeepFace extract_faces dictionaries
+            predictions: Emotion percentages, one row per face
+        
+        Returns:
+            List of face dictionaries (emotion, dominant_emotion, region,
+            face_confidence)
+        """
+        results = []
+        for face_obj, scores in zip(face_objs, predictions):
+            results.append({
+                'emotion': dict(zip(EMOTION_LABELS, scores)),
+                'dominant_emotion': EMOTION_LABELS[int(np.argmax(scores))],
+                'region': face_obj['facial_area'],
+                'face_confidence': face_obj['confidence']
+            })
+        return results
+    
+    def _detect_emotions_via_temp_file(self, frame, backend='opencv'):
+        """
+        Legacy frame path: encode the frame to a temporary JPEG and let
+        DeepFace decode it again. Kept for benchmarking against zero-copy.
+        
+        Args:
+            frame: Video frame as numpy array (BGR)
             backend: Face detection backend
         
         Returns:
             Dictionary with emotion analysis results or None
         """
+        # Unique file per call so concurrent callers don't overwrite each other
+        fd, temp_path = tempfile.mkstemp(suffix=".jpg", prefix="emotion_frame_")
+        os.close(fd)
+        self.metrics.increment('frames', backend)
         try:
-            # Save frame temporarily for DeepFace
-            temp_path = "temp_frame.jpg"
-            cv2.imwrite(temp_path, frame)
+            with self.metrics.timer('encode'):
+                cv2.imwrite(temp_path, frame)
             
             # Analyze emotions
-            result = DeepFace.analyze(
-                img_path=temp_path,
-                actions=['emotion'],
-                enforce_detection=False,
-                detector_backend=backend,
-                silent=True
-            )
-            
+            with self.metrics.timer('total', backend):
+                result = DeepFace.analyze(
+                    img_path=temp_path,
+                    actions=['emotion'],
+                    enforce_detection=False,
+                    detector_backend=backend,
+                    silent=True
+                )
+            return result
+        except Exception as e:
+            self.metrics.increment('errors', backend)
+            self.last_error = str(e)
+            return None
+        finally:
             # Clean up temp file
             if os.path.exists(temp_path):
                 os.remove(temp_path)
+    
+    def detect_emotions_from_bytes(self, data, backend='opencv'):
+        """
+        Detect emotions from encoded image data held in memory
+        
+        Args:
+            data: JPEG/PNG bytes, or a base64 string (data URL prefix allowed)
+            backend: Face detection backend
+        
+        Returns:
+            Dictionary with emotion analysis results or None
+        """
+        if self.result_cache is not None and not self.result_cache.perceptual:
+            # Identical payloads (client retries) hit before decoding
+            key = self.result_cache.key_for_bytes(data, self._cache_namespace(backend))
+            return self._cached(key, lambda: self._analyze_frame(self._decode(data), backend))
+        return self.detect_emotions_from_frame(self._decode(data), backend)
+    
+    def _decode(self, data):
+        """Decode image bytes or base64 into a frame, None on failure"""
+        with self.metrics.timer('decode'):
+            if isinstance(data, str):
+                frame = decode_base64_image(data)
+            else:
+                frame = decode_image_bytes(data)
+        if frame is None:
+            self.metrics.increment('decode_errors')
+        return frame
+    
+    def get_emotion_model(self):
+        """
+        Load the emotion classifier of the configured engine (models are
+        cached, so only the first call is slow)
+        
+        Returns:
+            DeepFace emotion model client, or the ONNX Runtime session
+        """
+        return self.engine.load()
+    
+    def classify_faces(self, faces):
+        """
+        Run the emotion classifier on several face crops in one forward pass
+        
+        Args:
+            faces: List of face crops as BGR numpy arrays, either uint8 or
+                float in [0, 1]
+        
+        Returns:
+            Numpy array of shape (len(faces), 7) with emotion percentages in
+            EMOTION_LABELS order
+        """
+        if len(faces) == 0:
+            return np.zeros((0, len(EMOTION_LABELS)), dtype=np.float32)
+        
+        # Engines apply the same preprocessing DeepFace.analyze does
+        predictions = self.engine.predict(faces)
+        return 100 * predictions / predictions.sum(axis=1, keepdims=True)
+    
+    def detect_emotions_batch(self, frames, backend='opencv', preferred=None):
+        """
+        Detect emotions for several frames, classifying every detected face
+        in a single batched forward pass
+        
+        Args:
+            frames: List of video frames as numpy arrays (BGR)
+            backend: Face detection backend
+            preferred: Cascade backend tried first per frame, e.g. the last
+                winner of each frame's session (default: cascade_backend)
+        
+        Returns:
+            List aligned with frames, each entry in the DeepFace analyze result
+            format (list of face dictionaries) or None if that frame failed.
+            Frames found in the result cache are not analyzed again.
+        """
+        results = [None] * len(frames)
+        keys = [None] * len(frames)
+        pending = list(range(len(frames)))
+        if self.result_cache is not None:
+            namespace = self._cache_namespace(backend)
+            pending = []
+            for i, frame in enumerate(frames):
+                keys[i] = self.result_cache.key_for_frame(frame, namespace)
+                if keys[i] is None:
+                    pending.append(i)
+                    continue
+                cached = self.result_cache.get(keys[i])
+                if cached is not None:
+                    self.metrics.increment('cache_hits')
+                    results[i] = cached
+                else:
+                    self.metrics.increment('cache_misses')
+                    pending.append(i)
+        
+        analyzed = self._analyze_batch([frames[i] for i in pending], backend,
+                                       [preferred[i] for i in pending] if preferred else None)
+        for i, result in zip(pending, analyzed):
+            results[i] = result
+            if result is not None and keys[i] is not None:
+                self.result_cache.put(keys[i], result)
+        return results
+    
+    def _analyze_batch(self, frames, backend='opencv', preferred=None):
+        """Run batched inference on frames, see detect_emotions_batch"""
+        if not frames:
+            return []
+        detections = []
+        winners = []
+        faces = []
+        for i, frame in enumerate(frames):
+            self.metrics.increment('frames', backend)
+            winner = None
+            try:
+                # Detectors work on one image at a time, only classification is batched
+                if backend == 'cascade':
+                    face_objs, winner, found = self._extract_faces_cascade(
+                        frame, preferred=(preferred[i] if preferred and preferred[i]
+                                          else self.cascade_backend))
+                    if found:
+                        self.cascade_backend = winner
+                    else:
+                        winner = None
+                else:
+                    face_objs = self._extract_faces(frame, backend)
+            except Exception as e:
+                self.metrics.increment('errors', backend)
+                self.last_error = str(e)
+                face_objs = None
             
-            return result
+            if face_objs:
+                # extract_faces returns RGB, the emotion model expects BGR like analyze feeds it
+                faces.extend(f['face'][:, :, ::-1] for f in face_objs)
+            detections.append(face_objs)
+            winners.append(winner)
+        
+        try:
+            with self.metrics.timer('classify_batch', backend):
+                predictions = self.classify_faces(faces)
         except Exception as e:
-            # Clean up temp file on error
-            if os.path.exists("temp_frame.jpg"):
-                os.remove("temp_frame.jpg")
-            return None
+            self.metrics.increment('errors', backend, len(frames))
+            self.last_error = str(e)
+            return [None] * len(frames)
+        
+        results = []
+        index = 0
+        for face_objs, winner in zip(detections, winners):
+            if not face_objs:
+                results.append(None)
+                continue
+            frame_result = self._build_results(face_objs, predictions[index:index + len(face_objs)])
+            index += len(face_objs)
+            if winner is not None:
+                for face in frame_result:
+                    face['detector_backend'] = winner
+            results.append(frame_result)
+        return results
+    
+    def warm_up(self, backends=None):
+        """
+        Preload the emotion model and face detectors and run a dummy inference
+        per backend, so the first real sample does not pay for model loading
+        
+        Args:
+            backends: Detection backends to preload (default: current_backend),
+                'cascade' stands for all of cascade_backends
+        
+        Returns:
+            Dictionary with load timings in seconds: emotion_model, detectors
+            and inference per backend, errors per backend, and total. self.ready
+            is set once current_backend has completed its dummy inference.
+        """
+        if backends is None:
+            backends = [self.current_backend]
+        # 'cascade' preloads every backend of the cascade
+        expanded = []
+        for backend in backends:
+            for name in (self.cascade_backends if backend == 'cascade' else [backend]):
+                if name not in expanded:
+                    expanded.append(name)
+        backends = expanded
+        
+        report = {'emotion_model': None, 'detectors': {}, 'inference': {}, 'errors': {}}
+        start = time.perf_counter()
+        
+        step = time.perf_counter()
+        self.get_emotion_model()
+        report['emotion_model'] = time.perf_counter() - step
+        
+        # A blank frame has no face, so enforce_detection=False exercises the full path
+        dummy_frame = np.zeros((224, 224, 3), dtype=np.uint8)
+        for backend in backends:
+            try:
+                step = time.perf_counter()
+                DeepFace.build_model(model_name=backend, task='face_detector')
+                report['detectors'][backend] = time.perf_counter() - step
+                
+                step = time.perf_counter()
+                face_objs = DeepFace.extract_faces(
+                    img_path=dummy_frame,
+                    detector_backend=backend,
+                    enforce_detection=False,
+                    align=True
+                )
+                self.classify_faces([f['face'][:, :, ::-1] for f in face_objs])
+                report['inference'][backend] = time.perf_counter() - step
+            except Exception as e:
+                report['errors'][backend] = str(e)
+        
+        report['total'] = time.perf_counter() - start
+        self.warmup_report = report
+        # Ready once the default backend can serve requests; the cascade
+        # only needs one of its backends
+        if self.current_backend == 'cascade':
+            self.ready = any(b in report['inference'] for b in self.cascade_backends)
+        else:
+            self.ready = self.current_backend in report['inference']
+        return report
     
     def get_dominant_emotion(self, result):
         """
@@ -104,10 +748,12 @@ class EmotionRecognition:
             result: DeepFace analysis result
         
         Returns:
-            Tuple of (emotion_name, confidence_percentage)
+            Tuple of (emotion_name, confidence_percentage) of the primary face
         """
         if isinstance(result, list):
-            result = result[0]
+            result = primary_face(result)
+            if result is None:
+                return None
         
         if 'emotion' in result:
             emotions = result['emotion']
@@ -115,79 +761,74 @@ class EmotionRecognition:
             return dominant_emotion
         return None
     
-    def record_emotions(self, result):
+    def record_emotions(self, result, frame_shape=None, timestamp=None):
         """
         Record emotion values to session data
         
         Args:
-            result: DeepFace analysis result
+            result: DeepFace analysis result. For a result list every face is
+                tracked with its own aggregates (see get_face_summaries) and
+                the primary face is recorded to the session.
+            frame_shape: Shape of the analyzed frame, lets the primary face
+                choice prefer faces near the centre
+            timestamp: Seconds since the session started, e.g. the video
+                position (default: wall clock time since the first sample)
+        
+        Returns:
+            Dictionary with the recorded sample of the primary face (dominant,
+            confidence, scores, clarity, stableDominant, trackId/faceCount for
+            result lists and the timeline segments this sample closed, if
+            any) or None if nothing was recorded
         """
         if result is None:
             return
         
+        track_id = None
+        face_count = None
         if isinstance(result, list):
-            result = result[0]
+            faces = [face for face in result if 'emotion' in face]
+            if not faces:
+                return None
+            if all('region' in face for face in faces):
+                self.faces.update(faces, frame_shape)
+            result = primary_face(faces, frame_shape)
+            track_id = result.get('track_id')
+            face_count = len(faces)
         
         if 'emotion' in result:
+            start = time.perf_counter()
             emotions = result['emotion']
-            for emotion_name, confidence in emotions.items():
-                if emotion_name in self.session_data:
-                    self.session_data[emotion_name].append(confidence)
-            
-            # Track dominant emotion
-            dominant = self.get_dominant_emotion(result)
-            if dominant:
-                emotion_name, _ = dominant
-                self.dominant_emotions.append(emotion_name)
-            
-            # Calculate confidence using weighted emotion method
-            # Positive emotions: Neutral (+0.50), Happy (+0.60)
-            # Negative emotions: Fear (-0.30), Sad (-0.20), Disgust (-0.15), Angry (-0.10), Surprise (-0.05)
-            
-            # Get emotion values (convert percentages to 0-1 scale for calculation)
-            neutral_val = emotions.get('neutral', 0) / 100.0
-            happy_val = emotions.get('happy', 0) / 100.0
-            fear_val = emotions.get('fear', 0) / 100.0
-            sad_val = emotions.get('sad', 0) / 100.0
-            disgust_val = emotions.get('disgust', 0) / 100.0
-            angry_val = emotions.get('angry', 0) / 100.0
-            surprise_val = emotions.get('surprise', 0) / 100.0
-            
-            # Calculate weighted sum
-            weighted_sum = (
-                (neutral_val * 0.50) +      # Positive
-                (happy_val * 0.60) +        # Positive
-                (fear_val * -0.30) +        # Negative (increased)
-                (sad_val * -0.20) +         # Negative (increased)
-                (disgust_val * -0.15) +     # Negative (increased)
-                (angry_val * -0.10) +       # Negative (increased)
-                (surprise_val * -0.05)      # Negative (increased)
-            )
             
-            # Multiply by 100 to get base confidence score
-            base_confidence = weighted_sum * 100
+            # Dominant emotion, weighted confidence and clarity (difference
+            # between top and second emotion) in one vectorized pass
+            dominant_index, confidence, clarity = score_emotions(
+                emotions_to_matrix([emotions]), self.confidence_weights)
+            dominant = EMOTION_LABELS[int(dominant_index[0])]
+            confidence = float(confidence[0])
+            clarity = float(clarity[0])
             
-            # Add base offset to shift range to 45-90
-            # Base offset ensures minimum confidence of ~45
-            confidence = base_confidence + 50.0
+            closed = self.timeline.add(emotions, timestamp)
+            # The timeline resolves a missing timestamp to wall clock time
+            self.session_stats.add(emotions, confidence, clarity, dominant,
+                                   self.timeline.last_time)
+            self.metrics.observe('record', time.perf_counter() - start)
             
-            # Normalize to 45-100 range (cap at 100, minimum 45)
-            confidence = min(confidence, 100.0)
-            confidence = max(confidence, 45.0)
-            
-            self.confidence_scores.append(confidence)
-            
-            # Calculate detection clarity (difference between top and second emotion)
-            sorted_emotions = sorted(emotions.items(), key=lambda x: x[1], reverse=True)
-            if len(sorted_emotions) >= 2:
-                top_confidence = sorted_emotions[0][1]
-                second_confidence = sorted_emotions[1][1]
-                clarity = top_confidence - second_confidence
-                self.detection_clarity.append(clarity)
-            else:
-                self.detection_clarity.append(0.0)
-            
-            self.total_detections += 1
+            # Plain floats, DeepFace scores are numpy float32
+            sample = {
+                'dominant': dominant,
+                'confidence': confidence,
+                'scores': {name: float(value) for name, value in emotions.items()},
+                'clarity': clarity,
+                # Dominant emotion after smoothing, does not flicker per frame
+                'stableDominant': self.timeline.stable_dominant
+            }
+            if closed:
+                sample['segments'] = closed
+            if face_count is not None:
+                sample['trackId'] = track_id
+                sample['faceCount'] = face_count
+            return sample
+        return None
     
     def get_average_emotions(self):
         """
@@ -196,13 +837,7 @@ class EmotionRecognition:
         Returns:
             Dictionary with average values for each emotion
         """
-        averages = {}
-        for emotion_name, values in self.session_data.items():
-            if len(values) > 0:
-                averages[emotion_name] = sum(values) / len(values)
-            else:
-                averages[emotion_name] = 0.0
-        return averages
+        return self.session_stats.average_emotions()
     
     def get_average_confidence(self):
         """
@@ -211,9 +846,7 @@ class EmotionRecognition:
         Returns:
             Average confidence percentage (calculated using weighted emotion formula)
         """
-        if len(self.confidence_scores) > 0:
-            return sum(self.confidence_scores) / len(self.confidence_scores)
-        return 0.0
+        return self.session_stats.average_confidence()
     
     def get_non_neutral_emotion_strength(self):
         """
@@ -222,14 +855,8 @@ class EmotionRecognition:
         Returns:
             Dictionary with average values for non-neutral emotions only
         """
-        non_neutral_emotions = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise']
-        averages = {}
-        for emotion_name in non_neutral_emotions:
-            if emotion_name in self.session_data and len(self.session_data[emotion_name]) > 0:
-                averages[emotion_name] = sum(self.session_data[emotion_name]) / len(self.session_data[emotion_name])
-            else:
-                averages[emotion_name] = 0.0
-        return averages
+        averages = self.session_stats.average_emotions()
+        return {name: value for name, value in averages.items() if name != 'neutral'}
     
     def get_average_clarity(self):
         """
@@ -238,9 +865,89 @@ class EmotionRecognition:
         Returns:
             Average clarity percentage (difference between top and second emotion)
         """
-        if len(self.detection_clarity) > 0:
-            return sum(self.detection_clarity) / len(self.detection_clarity)
-        return 0.0
+        return self.session_stats.average_clarity()
+    
+    @property
+    def total_detections(self):
+        """Number of detections recorded in this session"""
+        return self.session_stats.count
+    
+    def get_recent_history(self, n=None):
+        """
+        Get the most recent detections from the history ring buffer
+        
+        Args:
+            n: Number of detections (default: everything buffered)
+        
+        Returns:
+            Numpy array with one row per detection: the EMOTION_LABELS values,
+            then confidence and clarity. Empty unless history_size was set.
+        """
+        return self.session_stats.recent(n)
+    
+    def export_history(self, partial=False):
+        """
+        Get the buffered detections as columns, e.g. for a SessionArchiveWriter
+        
+        Args:
+            partial: Return only the buffered tail when the session recorded
+                more detections than history_size keeps (or was restored
+                from a snapshot, which has no history)
+        
+        Returns:
+            Tuple of (float32 array of shape (N, 7) with emotion percentages
+            in EMOTION_LABELS order, float64 array of N timestamps in seconds).
+            Empty unless history_size was set.
+        
+        Raises:
+            ValueError: If detections are missing from the buffer and partial
+                is False
+        """
+        history = self.session_stats.recent()
+        if not partial and self.session_stats.count > len(history):
+            raise ValueError(f"Only the last {len(history)} of {self.session_stats.count} "
+                             f"detections are buffered, raise history_size to export the "
+                             f"whole session")
+        return history[:, :len(EMOTION_LABELS)], self.session_stats.recent_timestamps()
+    
+    def import_history(self, probabilities, timestamps=None):
+        """
+        Replay stored detections into this session, e.g. from a SessionArchive,
+        scoring them with this recognizer's weights
+        
+        Args:
+            probabilities: Array of shape (N, 7) with emotion percentages in
+                EMOTION_LABELS order
+            timestamps: N timestamps in seconds (default: one per second)
+        
+        Returns:
+            Number of detections recorded
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64).reshape(-1, len(EMOTION_LABELS))
+        if timestamps is None:
+            timestamps = np.arange(len(probabilities))
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        dominant, confidence, clarity = score_emotions(probabilities, self.confidence_weights)
+        for row, timestamp, index, score, gap in zip(probabilities.tolist(), timestamps.tolist(),
+                                                      dominant.tolist(), confidence.tolist(),
+                                                      clarity.tolist()):
+            emotions = dict(zip(EMOTION_LABELS, row))
+            self.timeline.add(emotions, timestamp)
+            self.session_stats.add(emotions, score, gap, EMOTION_LABELS[index], timestamp)
+        return len(probabilities)
+    
+    def rescore_session(self, probabilities):
+        """
+        Re-score stored detections offline with this recognizer's weights
+        
+        Args:
+            probabilities: Array of shape (N, 7) with emotion percentages in
+                EMOTION_LABELS order, e.g. from get_recent_history()[:, :7]
+        
+        Returns:
+            Summary dictionary in the same shape as get_session_summary
+        """
+        return summarize_emotion_matrix(probabilities, self.confidence_weights)
     
     def get_confidence_rating(self, avg_confidence):
         """
@@ -263,6 +970,69 @@ class EmotionRecognition:
         else:
             return "Very Low"
     
+    def get_session_summary(self):
+        """
+        Get the session statistics as a dictionary, in the same shape as the
+        EmotionSummary the frontend keeps
+        
+        Returns:
+            Dictionary with averages, dominantCounts, avgConfidence, avgClarity,
+            totalDetections and the timeline segments
+        """
+        return {
+            'averages': self.get_average_emotions(),
+            'dominantCounts': dict(self.session_stats.dominant_counts),
+            'avgConfidence': self.get_average_confidence(),
+            'avgClarity': self.get_average_clarity(),
+            'totalDetections': self.total_detections,
+            'segments': self.get_timeline()
+        }
+    
+    def get_timeline(self, include_open=True):
+        """
+        Get the session as compact segments instead of raw samples
+        
+        Args:
+            include_open: Include the current dominant emotion and elevated
+                episodes still in progress
+        
+        Returns:
+            List of segment dictionaries (type 'dominant' or 'elevated',
+            emotion, start and end in seconds; peak and mean for elevated)
+        """
+        return self.timeline.get_segments(include_open)
+    
+    def get_face_summaries(self):
+        """
+        Get per-face statistics of the faces tracked in this session
+        
+        Returns:
+            Dictionary of track id -> summary in the get_session_summary shape,
+            plus firstSeen/lastSeen (analyzed frame numbers), region, active
+            and primary
+        """
+        return self.faces.get_face_summaries()
+    
+    def get_metrics(self):
+        """
+        Get pipeline latency and error metrics
+        
+        Returns:
+            Dictionary with 'stages' (stage -> backend -> count, mean, p50,
+            p95, p99 and max in milliseconds) and 'counters' (frames, no_face,
+            errors, fallbacks, ... per backend)
+        """
+        return self.metrics.snapshot()
+    
+    def get_metrics_text(self):
+        """
+        Get pipeline metrics in the Prometheus text exposition format
+        
+        Returns:
+            Metrics text
+        """
+        return self.metrics.to_prometheus()
+    
     def display_session_statistics(self):
         """
         Display session statistics including averages and confidence metrics
@@ -286,9 +1056,11 @@ class EmotionRecognition:
         # Confidence Metrics Section (using weighted emotion method)
         print("Confidence Metrics (weighted emotion method):")
         print("-"*50)
-        print("Weights: Neutral(+0.30), Happy(+0.50), Fear(-0.40), Sad(-0.70),")
-        print("         Disgust(-0.15), Angry(-0.20), Surprise(-0.05)")
-        print("Base Offset: +50 (ensures range 45-100)")
+        weights = sorted(zip(EMOTION_LABELS, self.confidence_weights), key=lambda x: x[1], reverse=True)
+        weight_text = [f"{name.capitalize()}({weight:+.2f})" for name, weight in weights]
+        print("Weights: " + ", ".join(weight_text[:4]) + ",")
+        print("         " + ", ".join(weight_text[4:]))
+        print(f"Base Offset: +{CONFIDENCE_OFFSET:.0f} (ensures range 45-100)")
         print("-"*50)
         print(f"Average Confidence: {avg_confidence:6.2f}%")
         print(f"Confidence Rating: {confidence_rating}")
@@ -310,23 +1082,27 @@ class EmotionRecognition:
             print(f"{emotion:12s}: {avg_value:6.2f}% {bar}")
         
         # Show most common dominant emotion
-        if len(self.dominant_emotions) > 0:
-            emotion_counts = Counter(self.dominant_emotions)
-            most_common = emotion_counts.most_common(1)[0]
+        most_common = self.session_stats.most_common_dominant()
+        if most_common is not None:
             print(f"\nMost Frequently Dominant Emotion: {most_common[0]} ({most_common[1]} times)")
         
+        # Smoothed timeline: elevated episodes and dominant emotion changes
+        segments = self.get_timeline()
+        if segments and self.timeline.last_time:
+            print("-"*50)
+            print("Emotion Timeline:")
+            for segment in segments[-10:]:
+                print(f"  {format_segment(segment)}")
+        
         print("="*50)
     
     def reset_session(self):
         """
         Reset session data
         """
-        for emotion_name in self.session_data.keys():
-            self.session_data[emotion_name] = []
-        self.total_detections = 0
-        self.dominant_emotions = []
-        self.confidence_scores = []
-        self.detection_clarity = []
+        self.session_stats.reset()
+        self.faces.reset()
+        self.timeline.reset()
         print("Session data reset.")
     
     def draw_emotion_on_frame(self, frame, result, face_region=None):
@@ -345,7 +1121,23 @@ class EmotionRecognition:
             return frame
         
         if isinstance(result, list):
-            result = result[0]
+            faces = result
+            result = primary_face(faces, frame.shape)
+            if result is None:
+                return frame
+            if face_region is None and len(faces) > 1:
+                # Several faces: box every face, the primary one in green
+                for face in faces:
+                    if 'region' not in face or 'emotion' not in face:
+                        continue
+                    region = face['region']
+                    x, y, w, h = region['x'], region['y'], region['w'], region['h']
+                    color = (0, 255, 0) if face is result else (0, 200, 255)
+                    emotion_name, confidence = self.get_dominant_emotion(face)
+                    label = f"#{face['track_id']} " if 'track_id' in face else ""
+                    cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+                    cv2.putText(frame, f"{label}{emotion_name}: {confidence:.1f}%", (x, y - 10),
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
         
         # Get dominant emotion
         dominant = self.get_dominant_emotion(result)
@@ -397,11 +1189,13 @@ class EmotionRecognition:
         result = self.detect_emotions_from_image(image_path)
         
         if result:
-            if isinstance(result, list):
-                result = result[0]
-            
-            # Record emotions to session
+            # Record emotions to session, every face gets its own aggregates
             self.record_emotions(result)
+            faces = result
+            if isinstance(result, list):
+                if len(result) > 1:
+                    print(f"{len(result)} faces detected, showing the primary face")
+                result = primary_face(faces)
             
             print("\n=== Emotion Analysis ===")
             if 'emotion' in result:
@@ -419,7 +1213,7 @@ class EmotionRecognition:
             if display:
                 # Load and display image
                 image = cv2.imread(image_path)
-                image = self.draw_emotion_on_frame(image, result)
+                image = self.draw_emotion_on_frame(image, faces)
                 
                 # Resize if too large
                 height, width = image.shape[:2]
@@ -436,18 +1230,46 @@ class EmotionRecognition:
         else:
             print("Failed to detect face or analyze emotions.")
     
-    def realtime_webcam(self, backend='opencv'):
+    def analyze_video_file(self, video_path, backend='opencv', sample_fps=1.0, workers=2):
+        """
+        Analyze a recorded video headlessly and record it into this session
+        
+        Args:
+            video_path: Path to video file
+            backend: Face detection backend
+            sample_fps: Frames analyzed per second of video
+            workers: Inference threads
+        
+        Returns:
+            Result row with the timestamped emotion track, see
+            emotion_video.analyze_video_file
+        """
+        from emotion_video import analyze_video_file
+        
+        print(f"\nAnalyzing video: {video_path}")
+        row = analyze_video_file(video_path, self, backend, sample_fps, workers, session=self)
+        if 'summary' not in row:
+            print(f"Error: {row['error']}")
+            return row
+        print(f"Analyzed {row['framesDecoded']} frames ({row['videoSeconds']:.1f}s of video) "
+              f"in {row['elapsedSeconds']:.1f}s, {row['speed']:.1f}x real time")
+        return row
+    
+    def realtime_webcam(self, backend='opencv', track_faces=True):
         """
         Real-time emotion recognition from webcam
         
         Args:
             backend: Face detection backend
+            track_faces: Detect the face once and track it, re-running the
+                detector only when tracking is lost or every few frames
         """
         print("\nStarting webcam emotion recognition...")
         print("Press 'q' to quit")
         print("Press 's' to save current frame")
         print("Press 'r' to view session statistics")
         print("Press 'c' to reset session data")
+        print("Press 'm' to print pipeline metrics")
         
         cap = cv2.VideoCapture(0)
         
@@ -456,7 +1278,17 @@ class EmotionRecognition:
             return
         
         frame_count = 0
-        analyze_interval = 5  # Analyze every Nth frame for performance
+        # Analyze only changed frames, paced to the measured inference latency,
+        # on a background thread so capture and display keep the camera FPS
+        sampler = AdaptiveFrameSampler()
+        if track_faces:
+            from emotion_tracking import FaceTracker
+            tracker = FaceTracker(self, backend)
+            analyzer = BackgroundAnalyzer(tracker.detect_emotions_from_frame)
+        else:
+            analyzer = BackgroundAnalyzer(lambda f: self.detect_emotions_from_frame(f, backend))
+        analyzer.start()
+        result = None
         
         while True:
             ret, frame = cap.read()
@@ -465,24 +1297,41 @@ class EmotionRecognition:
             
             frame_count += 1
             
-            # Analyze every Nth frame
-            result = None
-            if frame_count % analyze_interval == 0:
-                result = self.detect_emotions_from_frame(frame, backend)
+            if analyzer.idle and sampler.should_analyze(frame):
+                # The copy keeps the overlays drawn below out of the analyzed frame
+                analyzer.submit(frame.copy())
+            
+            finished = analyzer.poll()
+            if finished is not None:
+                new_result, latency = finished
+                sampler.record_latency(latency)
                 # Record emotions to session
-                if result is not None:
-                    self.record_emotions(result)
+                if new_result is not None:
+                    self.record_emotions(new_result, frame.shape)
+                    result = new_result
             
-            # Draw previous result on current frame
+            # Draw latest result on current frame
             if result is not None:
-                frame = self.draw_emotion_on_frame(frame, result)
+                face_region = None
+                if track_faces:
+                    region = primary_face(result)['region']
+                    face_region = (region['x'], region['y'], region['w'], region['h'])
+                frame = self.draw_emotion_on_frame(frame, result, face_region)
             
             # Display detection count on frame
-            detection_text = f"Detections: {self.total_detections}"
+            detection_text = (f"Detections: {self.total_detections} | "
+                              f"Skipped: {sampler.skipped} | "
+                              f"Every {sampler.interval * 1000:.0f}ms")
             cv2.putText(frame, detection_text, 
                        (10, frame.shape[0] - 60), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
             
+            # Analysis failures would otherwise look like frames without a face
+            if analyzer.failures:
+                cv2.putText(frame, f"Analysis errors: {analyzer.failures} ({analyzer.last_error})",
+                           (10, frame.shape[0] - 100),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+            
             # Add instructions
             cv2.putText(frame, "Press 'q' to quit, 's' to save, 'r' for stats, 'c' to reset", 
                        (10, frame.shape[0] - 20), 
@@ -502,10 +1351,16 @@ class EmotionRecognition:
                 self.display_session_statistics()
             elif key == ord('c'):
                 self.reset_session()
+            elif key == ord('m'):
+                # Dump pipeline metrics to console
+                print(self.get_metrics_text())
         
+        analyzer.stop()
         cap.release()
         cv2.destroyAllWindows()
         print("Webcam closed.")
+        if analyzer.failures:
+            print(f"Analysis failed on {analyzer.failures} frames, last error: {analyzer.last_error}")
         # Show final statistics
         self.display_session_statistics()
 
@@ -518,11 +1373,12 @@ def main():
         print("\n=== Emotion Recognition System ===")
         print("1. Analyze image file")
         print("2. Real-time webcam")
-        print("3. View session statistics")
-        print("4. Reset session data")
-        print("5. Exit")
+        print("3. Analyze video file")
+        print("4. View session statistics")
+        print("5. Reset session data")
+        print("6. Exit")
         
-        choice = input("\nEnter your choice (1-5): ").strip()
+        choice = input("\nEnter your choice (1-6): ").strip()
         
         if choice == '1':
             image_path = input("Enter image file path: ").strip().strip('"')
@@ -534,22 +1390,31 @@ def main():
                 print(f"Error: File not found: {image_path}")
         
         elif choice == '2':
-            backend = input("Enter backend (opencv/ssd/dlib/mtcnn/retinaface) [default: opencv]: ").strip()
+            backend = input("Enter backend (opencv/ssd/dlib/mtcnn/retinaface/cascade) [default: opencv]: ").strip()
             if not backend:
                 backend = 'opencv'
             recognizer.realtime_webcam(backend)
         
         elif choice == '3':
-            recognizer.display_session_statistics()
+            video_path = input("Enter video file path: ").strip().strip('"')
+            if os.path.exists(video_path):
+                sample_fps = input("Frames to analyze per second [default: 1]: ").strip()
+                recognizer.analyze_video_file(video_path, sample_fps=float(sample_fps or 1.0))
+                recognizer.display_session_statistics()
+            else:
+                print(f"Error: File not found: {video_path}")
         
         elif choice == '4':
+            recognizer.display_session_statistics()
+        
+        elif choice == '5':
             confirm = input("Are you sure you want to reset session data? (y/n): ").strip().lower()
             if confirm == 'y':
                 recognizer.reset_session()
             else:
                 print("Reset cancelled.")
         
-        elif choice == '5':
+        elif choice == '6':
             # Show final statistics before exiting
             recognizer.display_session_statistics()
             print("\nGoodbye!")
@@ -0,0 +1,189 @@
+"""
+Adaptive frame sampling for the realtime webcam loop
+Skips frames that barely changed, paces analysis to the measured inference
+latency and runs inference on a background thread so capture never blocks
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from emotion_lazy import LazyModule
+
+
+cv2 = LazyModule('cv2')
+
+
+class AdaptiveFrameSampler:
+    def __init__(self, change_threshold=3.0, min_interval=0.1, max_interval=2.0,
+                 latency_factor=1.5, thumbnail_size=(32, 24)):
+        """
+        Args:
+            change_threshold: Mean absolute gray-level difference (0-255) of the
+                downscaled frame below which a frame counts as unchanged
+            min_interval: Shortest time between analyses in seconds
+            max_interval: Analyze at least this often in seconds, even when
+                nothing changed
+            latency_factor: Analysis interval as a multiple of the average
+                inference latency, leaving headroom for capture and display
+            thumbnail_size: (width, height) the frame is shrunk to for comparing
+        """
+        self.change_threshold = change_threshold
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.latency_factor = latency_factor
+        self.thumbnail_size = thumbnail_size
+        self.interval = min_interval
+        self.latency = None
+        self.last_thumbnail = None
+        self.last_time = 0.0
+        self.last_change = 0.0
+        self.analyzed = 0
+        self.skipped = 0
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+
+    def should_analyze(self, frame, now=None):
+        """
+        Decide whether a frame is worth analyzing
+
+        Args:
+            frame: Video frame as numpy array (BGR)
+            now: Current time.perf_counter() value (default: read the clock)
+
+        Returns:
+            True if the frame should be analyzed
+        """
+        if now is None:
+            now = time.perf_counter()
+        elapsed = now - self.last_time
+        if elapsed < self.interval:
+            return False
+
+        thumbnail = self._thumbnail(frame)
+        if self.last_thumbnail is not None and elapsed < self.max_interval:
+            # Compare against the last analyzed frame, so slow drift still adds up
+            self.last_change = float(cv2.absdiff(thumbnail, self.last_thumbnail).mean())
+            if self.last_change < self.change_threshold:
+                self.skipped += 1
+                return False
+
+        self.last_thumbnail = thumbnail
+        self.last_time = now
+        self.analyzed += 1
+        return True
+
+    def record_latency(self, seconds):
+        """
+        Feed back one measured inference latency and adapt the interval
+
+        Args:
+            seconds: Time the inference took
+        """
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency = 0.8 * self.latency + 0.2 * seconds
+        self.interval = float(np.clip(self.latency * self.latency_factor,
+                                      self.min_interval, self.max_interval))
+
+
+class BackgroundAnalyzer:
+    def __init__(self, analyze):
+        """
+        Args:
+            analyze: Callable taking a frame and returning its result, run on
+                the background thread
+        """
+        self.analyze = analyze
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending_frame = None
+        self.busy = False
+        self.result = None
+        self.latency = 0.0
+        self.has_result = False
+        self.failures = 0
+        self.last_error = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Start the inference thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="emotion-analyzer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the inference thread after the current frame"""
+        if not self.running:
+            return
+        self.running = False
+        self.wake.set()
+        self.thread.join()
+        self.thread = None
+
+    @property
+    def idle(self):
+        """True when no frame is being analyzed or waiting"""
+        with self.lock:
+            return not self.busy and self.pending_frame is None
+
+    def submit(self, frame):
+        """
+        Hand a frame to the inference thread, replacing any frame still waiting
+
+        Args:
+            frame: Video frame; the caller must not modify it afterwards
+        """
+        if not self.running:
+            self.start()
+        with self.lock:
+            self.pending_frame = frame
+        self.wake.set()
+
+    def poll(self):
+        """
+        Get the newest result, once
+
+        Returns:
+            Tuple of (result, latency_seconds), or None if nothing new finished
+        """
+        with self.lock:
+            if not self.has_result:
+                return None
+            self.has_result = False
+            return self.result, self.latency
+
+    def _run(self):
+        while self.running:
+            self.wake.wait()
+            self.wake.clear()
+            with self.lock:
+                frame = self.pending_frame
+                self.pending_frame = None
+                self.busy = frame is not None
+            if frame is None:
+                continue
+
+            started = time.perf_counter()
+            try:
+                result = self.analyze(frame)
+            except Exception as e:
+                # Reported as no result so the caller keeps sampling, but counted
+                # so a worker that always fails is told apart from "no face"
+                print(f"Error in background emotion analysis: {str(e)}")
+                result = None
+                with self.lock:
+                    self.failures += 1
+                    self.last_error = str(e)
+            with self.lock:
+                self.result = result
+                self.latency = time.perf_counter() - started
+                self.has_result = True
+                self.busy = False
@@ -0,0 +1,522 @@
+"""
+Emotion Recognition HTTP service
+Implements the /analyze contract used by app/api/emotion/analyze/route.ts
+and a /stream/{sessionId} WebSocket that takes binary JPEG frames
+
+Run with: python emotion_service.py
+      or: uvicorn emotion_service:create_app --factory --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+
+from emotion_batching import MicroBatchScheduler
+from emotion_cache import ResultCache
+from emotion_engines import create_engine
+from emotion_recognition import EmotionRecognition, decode_base64_image, decode_image_bytes
+from emotion_sessions import SessionEnded, SessionStore
+
+
+class AnalyzeRequest(BaseModel):
+    imageBase64: str
+    sessionId: str = 'default'
+
+
+class ServiceOverloaded(Exception):
+    """Raised when the service already holds as many frames as it accepts"""
+
+
+class ServiceNotReady(Exception):
+    """Raised while models are still being preloaded"""
+
+
+class EmotionService:
+    def __init__(self, backend='opencv', max_workers=2, max_queue=8, batch_window_ms=0,
+                 max_batch_size=16, warm_up=True, warmup_backends=None, max_sessions=1000,
+                 session_ttl=1800.0, session_memory_bytes=None,
+                 session_db='emotion_sessions.sqlite', result_cache=None, engine=None,
+                 working_size=None):
+        """
+        Args:
+            backend: Face detection backend used for every request, or
+                'cascade' to escalate from fast to accurate detectors
+            max_workers: Number of inference threads
+            max_queue: Frames allowed to wait for a free worker before new
+                requests are rejected
+            batch_window_ms: If > 0, frames from all sessions are micro-batched
+                over this window instead of being classified one by one
+            max_batch_size: Largest micro-batch when batching is enabled
+            warm_up: Preload models on startup and report "not ready" until done
+            warmup_backends: Detection backends to preload (default: backend)
+            max_sessions: Sessions kept in memory, see SessionStore
+            session_ttl: Seconds without frames before a session is evicted
+            session_memory_bytes: Estimated memory cap for all sessions
+            session_db: SQLite file evicted and ended sessions are written to
+                (None disables persistence)
+            result_cache: Optional ResultCache, so retried or repeated frames
+                skip inference
+            engine: Emotion classifier engine name or instance, see emotion_engines
+            working_size: Longest side frames are downscaled to for face
+                detection (None: full resolution)
+        """
+        self.backend = backend
+        self.max_workers = max_workers
+        self.max_pending = max_workers + max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="emotion-worker")
+        # Shared recognizer used only for inference, it never records stats
+        self.recognizer = EmotionRecognition(result_cache=result_cache, engine=engine,
+                                             working_size=working_size)
+        self.recognizer.current_backend = backend
+        self.warm_up_enabled = warm_up
+        self.warmup_backends = warmup_backends or [backend]
+        self.scheduler = None
+        if batch_window_ms > 0:
+            self.scheduler = MicroBatchScheduler(self.recognizer, backend,
+                                                 max_batch_size=max_batch_size,
+                                                 max_wait_ms=batch_window_ms)
+        # One recognizer per interview session, holding that session's statistics.
+        # Sessions share the service metrics, so record timings add up
+        self.sessions = SessionStore(max_sessions=max_sessions, idle_ttl=session_ttl,
+                                     max_memory_bytes=session_memory_bytes,
+                                     snapshot_path=session_db,
+                                     metrics=self.recognizer.metrics)
+        self.pending = 0
+        self.rejected = 0
+        # WebSocket streams: open connections and frames dropped because a
+        # newer frame arrived before inference was free
+        self.streams = 0
+        self.dropped = 0
+
+    @property
+    def ready(self):
+        """True once models are loaded, always True when warm-up is disabled"""
+        return self.recognizer.ready or not self.warm_up_enabled
+
+    async def warm_up(self):
+        """
+        Preload models on a worker thread without blocking the event loop
+
+        Returns:
+            Warm-up report from EmotionRecognition.warm_up
+        """
+        loop = asyncio.get_running_loop()
+        report = await loop.run_in_executor(self.executor, self.recognizer.warm_up,
+                                            self.warmup_backends)
+        if self.recognizer.ready:
+            print(f"Emotion service ready, warm-up took {report['total']:.2f}s")
+        else:
+            print(f"Emotion service warm-up failed: {report['errors']}")
+        return report
+
+    def get_session(self, session_id):
+        """
+        Get (or create) the recognizer holding a session's statistics
+
+        Args:
+            session_id: Interview session id
+
+        Returns:
+            EmotionRecognition instance for the session
+
+        Raises:
+            SessionEnded: If the session was already ended
+        """
+        return self.sessions.get_or_create(session_id)
+
+    def end_session(self, session_id):
+        """
+        Drop a session and return its final summary
+
+        Args:
+            session_id: Interview session id
+
+        Returns:
+            Session summary dictionary or None if the session is unknown
+        """
+        return self.sessions.end(session_id)
+
+    def _decode(self, image):
+        """Decode one frame from raw bytes or base64, runs on a worker thread"""
+        with self.recognizer.metrics.timer('decode'):
+            if isinstance(image, (bytes, bytearray, memoryview)):
+                frame = decode_image_bytes(image)
+            else:
+                frame = decode_base64_image(image)
+        if frame is None:
+            self.recognizer.metrics.increment('decode_errors')
+            raise ValueError("Could not decode image")
+        return frame
+
+    def _infer(self, image, preferred_backend=None):
+        """Decode and analyze one frame, runs on a worker thread"""
+        frame = self._decode(image)
+        if self.backend == 'cascade':
+            # Start from the backend that last found this session's face
+            result = self.recognizer.detect_emotions_cascade(frame, preferred=preferred_backend)
+        else:
+            result = self.recognizer.detect_emotions_from_frame(frame, self.backend)
+        return self._face_or_none(result, frame)
+
+    def _face_or_none(self, result, frame):
+        """Drop DeepFace's whole-frame fallback, it is not a face to record"""
+        if not self.recognizer.has_face(result, frame.shape):
+            return None
+        return result
+
+    async def analyze(self, image, session_id):
+        """
+        Analyze one frame off the event loop and record it to its session
+
+        Args:
+            image: Base64 encoded image (data URL prefix allowed) or raw
+                encoded image bytes
+            session_id: Interview session id
+
+        Returns:
+            Recorded sample dictionary (dominant, confidence, scores, clarity)
+            or None if no face was found or inference failed
+
+        Raises:
+            ServiceNotReady: If models are still being preloaded
+            ServiceOverloaded: If the worker pool and its queue are full
+            ValueError: If the image could not be decoded
+            SessionEnded: If the session was ended, also when that happened
+                while the frame was being analyzed; nothing is recorded
+        """
+        if not self.ready:
+            raise ServiceNotReady()
+        if self.sessions.is_ended(session_id):
+            raise SessionEnded(session_id)
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ServiceOverloaded()
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            session = self.sessions.get(session_id)
+            preferred = session.cascade_backend if session is not None else None
+            if self.scheduler is not None:
+                frame = await loop.run_in_executor(self.executor, self._decode, image)
+                try:
+                    result = await asyncio.wrap_future(self.scheduler.submit(frame, preferred))
+                except Exception:
+                    # Logged and counted by the scheduler; like a failed
+                    # single-frame inference, nothing is recorded
+                    result = None
+                result = self._face_or_none(result, frame)
+            else:
+                result = await loop.run_in_executor(self.executor, self._infer, image, preferred)
+        finally:
+            self.pending -= 1
+
+        # Recording happens on the event loop, so sessions need no locking;
+        # a session ended in the meantime raises SessionEnded here
+        session = self.get_session(session_id)
+        if result and 'detector_backend' in result[0]:
+            # Cache the winning cascade backend per session
+            session.cascade_backend = result[0]['detector_backend']
+        return session.record_emotions(result)
+
+    async def stream(self, websocket, session_id):
+        """
+        Serve one session over an accepted WebSocket. Binary messages are
+        encoded frames (JPEG, PNG, ...), each result is pushed back as a JSON
+        message when it is ready. While a frame is being analyzed only the
+        newest frame received waits, older ones are dropped, so a client
+        sending faster than inference never builds up a backlog.
+
+        Text messages are JSON commands: {"type": "summary"} replies with the
+        session summary, {"type": "end"} waits for the frame being analyzed,
+        ends the session, replies with its final summary and closes the socket.
+
+        Args:
+            websocket: Accepted starlette WebSocket
+            session_id: Interview session id
+        """
+        # Newest frame not yet analyzed: (sequence number, bytes, receive time)
+        latest = None
+        frame_ready = asyncio.Event()
+        # Held while a frame is analyzed and its result sent
+        analyzing = asyncio.Lock()
+        received = 0
+        dropped = 0
+
+        async def analyze_frames():
+            nonlocal latest
+            while True:
+                await frame_ready.wait()
+                frame_ready.clear()
+                async with analyzing:
+                    if latest is None:
+                        # Dropped by an "end" command
+                        continue
+                    sequence, data, received_at = latest
+                    latest = None
+                    message = {'type': 'result', 'frame': sequence}
+                    try:
+                        sample = await self.analyze(data, session_id)
+                    except ServiceNotReady:
+                        message = {'type': 'error', 'frame': sequence,
+                                   'detail': "Emotion service is warming up"}
+                    except ServiceOverloaded:
+                        # Other sessions keep the workers busy, wait for the next frame
+                        self.dropped += 1
+                        continue
+                    except SessionEnded:
+                        message = {'type': 'error', 'frame': sequence,
+                                   'detail': "Session has ended"}
+                    except ValueError as e:
+                        message = {'type': 'error', 'frame': sequence, 'detail': str(e)}
+                    else:
+                        message['sample'] = sample
+                    message['latencyMs'] = (time.perf_counter() - received_at) * 1000.0
+                    message['dropped'] = dropped
+                    await websocket.send_json(message)
+
+        async def handle_command(text):
+            nonlocal latest
+            try:
+                command = json.loads(text).get('type')
+            except (ValueError, AttributeError):
+                command = None
+            if command == 'summary':
+                await websocket.send_json({'type': 'summary',
+                                           'summary': self.sessions.summary(session_id)})
+            elif command == 'end':
+                # Drop the waiting frame and let the one being analyzed finish,
+                # so it is recorded before the final summary, not after it
+                latest = None
+                async with analyzing:
+                    summary = self.end_session(session_id)
+                await websocket.send_json({'type': 'summary', 'final': True,
+                                           'summary': summary})
+                await websocket.close()
+                return False
+            else:
+                await websocket.send_json({'type': 'error', 'detail': "Unknown command"})
+            return True
+
+        self.streams += 1
+        analyzer = asyncio.create_task(analyze_frames())
+        try:
+            while not analyzer.done():
+                message = await websocket.receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                if message.get('bytes') is not None:
+                    received += 1
+                    if latest is not None:
+                        dropped += 1
+                        self.dropped += 1
+                    latest = (received, message['bytes'], time.perf_counter())
+                    frame_ready.set()
+                elif message.get('text') is not None:
+                    if not await handle_command(message['text']):
+                        break
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self.streams -= 1
+            analyzer.cancel()
+            try:
+                await analyzer
+            except (asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
+                # Cancelled, or the client left while a result was being sent
+                pass
+
+    def status(self):
+        """
+        Get service load information
+
+        Returns:
+            Dictionary with worker, queue and session counters
+        """
+        status = {
+            'ready': self.ready,
+            'backend': self.backend,
+            'workers': self.max_workers,
+            'pending': self.pending,
+            'maxPending': self.max_pending,
+            'rejected': self.rejected,
+            'streams': self.streams,
+            'droppedFrames': self.dropped,
+            'sessions': self.sessions.stats()
+        }
+        if self.scheduler is not None:
+            status['batching'] = self.scheduler.get_metrics()
+        if self.recognizer.result_cache is not None:
+            status['cache'] = self.recognizer.result_cache.stats()
+        return status
+
+    def metrics_text(self):
+        """
+        Get pipeline and service metrics in the Prometheus text format
+
+        Returns:
+            Metrics text
+        """
+        gauges = {
+            'ready': int(self.ready),
+            'pending_frames': self.pending,
+            'active_streams': self.streams,
+            'active_sessions': len(self.sessions),
+            'session_memory_bytes': self.sessions.memory_bytes
+        }
+        counters = {
+            'rejected_frames': self.rejected,
+            'dropped_frames': self.dropped,
+            'evicted_sessions': self.sessions.evicted
+        }
+        return self.recognizer.metrics.to_prometheus(gauges=gauges, counters=counters)
+
+    def shutdown(self):
+        """Stop the worker pool, dropping frames that have not started"""
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        # Sessions still in progress are snapshotted and restored after a restart
+        self.sessions.close()
+
+
+def create_app(service=None):
+    """
+    Build the FastAPI app around an EmotionService
+
+    Args:
+        service: EmotionService to serve, configured from the environment if omitted
+
+    Returns:
+        FastAPI application
+    """
+    if service is None:
+        cache_size = int(os.environ.get('EMOTION_RESULT_CACHE', '0'))
+        result_cache = None
+        if cache_size > 0:
+            result_cache = ResultCache(
+                max_entries=cache_size,
+                ttl=float(os.environ.get('EMOTION_CACHE_TTL', '0')) or None,
+                perceptual=os.environ.get('EMOTION_CACHE_PERCEPTUAL', '0') == '1'
+            )
+        engine_name = os.environ.get('EMOTION_ENGINE', 'deepface')
+        engine_options = {}
+        if engine_name == 'onnx':
+            engine_options = {
+                'quantize': os.environ.get('EMOTION_ENGINE_INT8', '0') == '1',
+                'intra_op_threads': int(os.environ.get('EMOTION_ENGINE_THREADS', '0'))
+            }
+        service = EmotionService(
+            backend=os.environ.get('EMOTION_BACKEND', 'opencv'),
+            max_workers=int(os.environ.get('EMOTION_WORKERS', '2')),
+            max_queue=int(os.environ.get('EMOTION_MAX_QUEUE', '8')),
+            batch_window_ms=float(os.environ.get('EMOTION_BATCH_WINDOW_MS', '0')),
+            max_batch_size=int(os.environ.get('EMOTION_MAX_BATCH', '16')),
+            warm_up=os.environ.get('EMOTION_WARMUP', '1') != '0',
+            warmup_backends=[b.strip() for b in os.environ.get('EMOTION_WARMUP_BACKENDS', '').split(',')
+                             if b.strip()] or None,
+            max_sessions=int(os.environ.get('EMOTION_MAX_SESSIONS', '1000')),
+            session_ttl=float(os.environ.get('EMOTION_SESSION_TTL', '1800')),
+            session_memory_bytes=int(float(os.environ.get('EMOTION_SESSION_MEMORY_MB', '0')) * 1024 * 1024)
+                                 or None,
+            session_db=os.environ.get('EMOTION_SESSION_DB', 'emotion_sessions.sqlite') or None,
+            result_cache=result_cache,
+            engine=create_engine(engine_name, **engine_options),
+            working_size=int(os.environ.get('EMOTION_WORKING_SIZE', '0')) or None
+        )
+
+    @asynccontextmanager
+    async def lifespan(app):
+        warmup_task = None
+        if service.warm_up_enabled:
+            # Serve /health and /ready while models load in the background
+            warmup_task = asyncio.create_task(service.warm_up())
+        yield
+        if warmup_task is not None and not warmup_task.done():
+            warmup_task.cancel()
+        service.shutdown()
+
+    app = FastAPI(title="MockMate Emotion Service", lifespan=lifespan)
+    app.state.service = service
+
+    @app.post("/analyze")
+    async def analyze(request: AnalyzeRequest):
+        try:
+            sample = await service.analyze(request.imageBase64, request.sessionId)
+        except ServiceNotReady:
+            raise HTTPException(status_code=503, detail="Emotion service is warming up",
+                                headers={'Retry-After': '5'})
+        except ServiceOverloaded:
+            raise HTTPException(status_code=503, detail="Emotion service is busy",
+                                headers={'Retry-After': '1'})
+        except SessionEnded:
+            raise HTTPException(status_code=409, detail="Session has ended")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        if sample is None:
+            raise HTTPException(status_code=422, detail="No emotions detected")
+        return sample
+
+    @app.websocket("/stream/{session_id}")
+    async def stream(websocket: WebSocket, session_id: str):
+        await websocket.accept()
+        await service.stream(websocket, session_id)
+
+    @app.get("/sessions/{session_id}")
+    async def session_summary(session_id: str):
+        summary = service.sessions.summary(session_id)
+        if summary is None:
+            raise HTTPException(status_code=404, detail="Unknown session")
+        return summary
+
+    @app.delete("/sessions/{session_id}")
+    async def end_session(session_id: str):
+        summary = service.end_session(session_id)
+        if summary is None:
+            raise HTTPException(status_code=404, detail="Unknown session")
+        return summary
+
+    @app.get("/health")
+    async def health():
+        return service.status()
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return service.metrics_text()
+
+    @app.get("/ready")
+    async def ready():
+        body = {'status': 'ready' if service.ready else 'not ready',
+                'warmup': service.recognizer.warmup_report}
+        if not service.ready:
+            return JSONResponse(status_code=503, content=body)
+        return body
+
+    return app
+
+
+def __getattr__(name):
+    # `uvicorn emotion_service:app` still works, but the app (with its worker
+    # pool and session database) is only built when asked for, not on import
+    global app
+    if name == 'app':
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(create_app(),
+                host=os.environ.get('EMOTION_HOST', '0.0.0.0'),
+                port=int(os.environ.get('EMOTION_PORT', '8000')))
@@ -0,0 +1,341 @@
+"""
+Bounded-memory registry of interview sessions
+Keeps one compact EmotionRecognition per session id, evicts idle sessions by
+TTL and LRU under a session/memory cap, and snapshots their aggregates to
+SQLite so an evicted session can be restored or summarized later
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from emotion_recognition import EmotionRecognition
+
+
+# Rough per-session footprint besides the history buffer, faces and closed
+# timeline segments: recognizer, accumulator lists, dominant counts and the
+# open timeline state
+SESSION_OVERHEAD_BYTES = 8 * 1024
+# Rough footprint of each tracked face: track, box and its own accumulator
+FACE_TRACK_BYTES = 2 * 1024
+# Rough footprint of each closed timeline segment dictionary (measured ~300B);
+# a session keeps up to its timeline's max_segments of them
+TIMELINE_SEGMENT_BYTES = 320
+
+
+class SessionEnded(Exception):
+    """Raised when a frame is recorded to a session that has already ended"""
+
+
+class SessionSnapshotStore:
+    def __init__(self, path):
+        """
+        Args:
+            path: SQLite database file (':memory:' for tests)
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, state TEXT NOT NULL, summary TEXT NOT NULL, "
+            "created REAL NOT NULL, updated REAL NOT NULL, ended INTEGER NOT NULL DEFAULT 0)"
+        )
+        self.connection.commit()
+
+    def save(self, session_id, state, summary, created, ended=False):
+        """
+        Insert or replace one session snapshot; a snapshot that is not ended
+        never replaces the final snapshot of an ended session
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, "
+                "summary = excluded.summary, created = excluded.created, "
+                "updated = excluded.updated, ended = excluded.ended "
+                "WHERE excluded.ended = 1 OR sessions.ended = 0",
+                (session_id, json.dumps(state), json.dumps(summary), created, time.time(),
+                 int(ended))
+            )
+            self.connection.commit()
+
+    def load(self, session_id):
+        """
+        Returns:
+            Dictionary with state, summary, created and ended, or None
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT state, summary, created, ended FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'state': json.loads(row[0]), 'summary': json.loads(row[1]),
+                'created': row[2], 'ended': bool(row[3])}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class SessionEntry:
+    __slots__ = ('recognizer', 'created', 'last_seen', 'size')
+
+    def __init__(self, recognizer, created=None):
+        self.recognizer = recognizer
+        self.created = created if created is not None else time.time()
+        self.last_seen = time.monotonic()
+        # Estimated bytes as last counted in SessionStore.memory_bytes
+        self.size = 0
+
+
+class SessionStore:
+    def __init__(self, max_sessions=1000, idle_ttl=1800.0, max_memory_bytes=None,
+                 active_window=120.0, snapshot_path='emotion_sessions.sqlite',
+                 history_size=0, metrics=None, max_ended=10000):
+        """
+        Args:
+            max_sessions: Sessions kept in memory before the least recently
+                used idle one is evicted
+            idle_ttl: Seconds without a frame after which a session is evicted
+            max_memory_bytes: Estimated memory cap for all sessions (None: no cap)
+            active_window: Sessions seen within this many seconds count as in
+                progress and are never evicted for the session or memory cap
+            snapshot_path: SQLite file evicted sessions are written to
+                (None disables persistence)
+            history_size: Ring buffer size of each session's recognizer
+            metrics: PipelineMetrics shared by all session recognizers
+            max_ended: Ended session ids remembered in memory, so late frames
+                for them are refused (older ones are still found in the
+                snapshots)
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_memory_bytes = max_memory_bytes
+        self.active_window = active_window
+        self.history_size = history_size
+        self.metrics = metrics
+        self.snapshots = SessionSnapshotStore(snapshot_path) if snapshot_path else None
+        # Least recently used first
+        self.sessions = OrderedDict()
+        self.memory_bytes = 0
+        self.evicted = 0
+        self.restored = 0
+        # Recently ended session ids, oldest first
+        self.ended = OrderedDict()
+        self.max_ended = max_ended
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, session_id):
+        return session_id in self.sessions
+
+    def _new_recognizer(self):
+        return EmotionRecognition(history_size=self.history_size, metrics=self.metrics)
+
+    def _entry_size(self, entry):
+        size = SESSION_OVERHEAD_BYTES
+        size += len(entry.recognizer.timeline.segments) * TIMELINE_SEGMENT_BYTES
+        stats = entry.recognizer.session_stats
+        if stats.history is not None:
+            size += stats.history.nbytes + stats.history_times.nbytes
+        for track in entry.recognizer.faces.tracks.values():
+            size += FACE_TRACK_BYTES
+            if track.stats.history is not None:
+                size += track.stats.history.nbytes + track.stats.history_times.nbytes
+        return size
+
+    def _update_size(self, entry):
+        """Re-estimate a session, which grows with its faces and timeline segments"""
+        size = self._entry_size(entry)
+        self.memory_bytes += size - entry.size
+        entry.size = size
+
+    def _state(self, entry):
+        return {'stats': entry.recognizer.session_stats.get_state(),
+                'timeline': entry.recognizer.timeline.get_state(),
+                'faces': entry.recognizer.faces.get_state(),
+                'cascade_backend': entry.recognizer.cascade_backend}
+
+    def get(self, session_id):
+        """
+        Get a session held in memory without touching it
+
+        Args:
+            session_id: Interview session id
+
+        Returns:
+            EmotionRecognition or None
+        """
+        entry = self.sessions.get(session_id)
+        return entry.recognizer if entry is not None else None
+
+    def get_or_create(self, session_id):
+        """
+        Get a session for recording, restoring it from its snapshot if it was
+        evicted before it ended
+
+        Args:
+            session_id: Interview session id
+
+        Returns:
+            EmotionRecognition holding the session's statistics
+
+        Raises:
+            SessionEnded: If the session was ended, e.g. a frame still being
+                analyzed when its interview finished
+        """
+        entry = self.sessions.get(session_id)
+        if entry is not None:
+            entry.last_seen = time.monotonic()
+            self.sessions.move_to_end(session_id)
+            # Faces and segments added by the previous frame are counted from now on
+            self._update_size(entry)
+            self.evict()
+            return entry.recognizer
+
+        if session_id in self.ended:
+            raise SessionEnded(session_id)
+        recognizer = self._new_recognizer()
+        created = None
+        snapshot = self.snapshots.load(session_id) if self.snapshots else None
+        if snapshot is not None and snapshot['ended']:
+            self._remember_ended(session_id)
+            raise SessionEnded(session_id)
+        if snapshot is not None:
+            recognizer.session_stats.set_state(snapshot['state']['stats'])
+            if 'timeline' in snapshot['state']:
+                recognizer.timeline.set_state(snapshot['state']['timeline'])
+            if 'faces' in snapshot['state']:
+                recognizer.faces.set_state(snapshot['state']['faces'])
+            recognizer.cascade_backend = snapshot['state'].get('cascade_backend')
+            created = snapshot['created']
+            self.restored += 1
+
+        entry = SessionEntry(recognizer, created)
+        self.sessions[session_id] = entry
+        self._update_size(entry)
+        self.evict()
+        return recognizer
+
+    def summary(self, session_id):
+        """
+        Get a session summary from memory or from its snapshot
+
+        Args:
+            session_id: Interview session id
+
+        Returns:
+            Summary dictionary or None if the session is unknown
+        """
+        entry = self.sessions.get(session_id)
+        if entry is not None:
+            return entry.recognizer.get_session_summary()
+        snapshot = self.snapshots.load(session_id) if self.snapshots else None
+        return snapshot['summary'] if snapshot is not None else None
+
+    def is_ended(self, session_id):
+        """True if the session was ended, frames for it are not recorded"""
+        if session_id in self.ended:
+            return True
+        if session_id in self.sessions or not self.snapshots:
+            return False
+        snapshot = self.snapshots.load(session_id)
+        return snapshot is not None and snapshot['ended']
+
+    def _remember_ended(self, session_id):
+        self.ended[session_id] = True
+        self.ended.move_to_end(session_id)
+        while len(self.ended) > self.max_ended:
+            self.ended.popitem(last=False)
+
+    def end(self, session_id):
+        """
+        End a session, writing its final summary; later frames for it are
+        refused with SessionEnded
+
+        Args:
+            session_id: Interview session id
+
+        Returns:
+            Final summary dictionary or None if the session is unknown
+        """
+        entry = self.sessions.pop(session_id, None)
+        if entry is None:
+            snapshot = self.snapshots.load(session_id) if self.snapshots else None
+            if snapshot is None:
+                return None
+            self._remember_ended(session_id)
+            if not snapshot['ended']:
+                self.snapshots.save(session_id, snapshot['state'], snapshot['summary'],
+                                    snapshot['created'], ended=True)
+            return snapshot['summary']
+
+        self.memory_bytes -= entry.size
+        self._remember_ended(session_id)
+        summary = entry.recognizer.get_session_summary()
+        if self.snapshots:
+            self.snapshots.save(session_id, self._state(entry), summary, entry.created, ended=True)
+        return summary
+
+    def _evict_entry(self, session_id):
+        entry = self.sessions.pop(session_id)
+        self.memory_bytes -= entry.size
+        if self.snapshots:
+            # Not ended: the session is restored if its interview sends more frames
+            self.snapshots.save(session_id, self._state(entry),
+                                entry.recognizer.get_session_summary(), entry.created)
+        self.evicted += 1
+
+    def _over_capacity(self):
+        if len(self.sessions) > self.max_sessions:
+            return True
+        return self.max_memory_bytes is not None and self.memory_bytes > self.max_memory_bytes
+
+    def evict(self):
+        """
+        Evict sessions idle longer than idle_ttl, then least recently used
+        sessions outside the active window while over the session or memory cap
+
+        Returns:
+            Number of sessions evicted
+        """
+        now = time.monotonic()
+        evicted = 0
+        # Sessions are ordered by last use, so expired ones are at the front
+        for session_id, entry in list(self.sessions.items()):
+            idle = now - entry.last_seen
+            if idle > self.idle_ttl:
+                self._evict_entry(session_id)
+            elif self._over_capacity() and idle > self.active_window:
+                self._evict_entry(session_id)
+            else:
+                break
+            evicted += 1
+        return evicted
+
+    def stats(self):
+        """
+        Returns:
+            Dictionary with session count, estimated memory and eviction counters
+        """
+        return {
+            'sessions': len(self.sessions),
+            'memoryBytes': self.memory_bytes,
+            'evicted': self.evicted,
+            'restored': self.restored
+        }
+
+    def close(self):
+        """Snapshot every session still in memory and close the store"""
+        if self.snapshots:
+            for session_id, entry in self.sessions.items():
+                self.snapshots.save(session_id, self._state(entry),
+                                    entry.recognizer.get_session_summary(), entry.created)
+            self.snapshots.close()
+            self.snapshots = None
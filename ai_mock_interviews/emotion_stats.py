@@ -0,0 +1,325 @@
+"""
+Streaming emotion session statistics
+Every sample is folded into running aggregates in O(1), so memory stays
+constant and statistics requests cost the same at any session length
+"""
+
+import numpy as np
+
+
+# Label order of the DeepFace emotion model output
+EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+# Weighted emotion confidence method, weights in EMOTION_LABELS order
+# Positive emotions: Neutral (+0.50), Happy (+0.60)
+# Negative emotions: Fear (-0.30), Sad (-0.20), Disgust (-0.15), Angry (-0.10), Surprise (-0.05)
+CONFIDENCE_WEIGHTS = np.array([-0.10, -0.15, -0.30, 0.60, -0.20, -0.05, 0.50])
+# Base offset shifts the score up, then it is clamped to the 45-100 range
+CONFIDENCE_OFFSET = 50.0
+CONFIDENCE_MIN = 45.0
+CONFIDENCE_MAX = 100.0
+
+
+def emotions_to_matrix(emotion_dicts, labels=EMOTION_LABELS):
+    """
+    Stack emotion dictionaries into a matrix
+
+    Args:
+        emotion_dicts: Iterable of emotion name -> percentage dictionaries
+        labels: Column order
+
+    Returns:
+        Numpy array of shape (N, len(labels)), missing emotions are 0
+    """
+    rows = [[emotions.get(name, 0.0) for name in labels] for emotions in emotion_dicts]
+    return np.array(rows, dtype=np.float64).reshape(len(rows), len(labels))
+
+
+def score_emotions(probabilities, weights=CONFIDENCE_WEIGHTS):
+    """
+    Score many detections in one vectorized pass
+
+    Args:
+        probabilities: Array of shape (N, 7) with emotion percentages (0-100)
+            in EMOTION_LABELS order, or a single row of shape (7,)
+        weights: Confidence weight per emotion
+
+    Returns:
+        Tuple of numpy arrays (dominant_index, confidence, clarity), each of
+        length N. Clarity is the gap between the top two emotions.
+    """
+    probabilities = np.atleast_2d(np.asarray(probabilities, dtype=np.float64))
+    n_rows, n_labels = probabilities.shape
+
+    # First maximum wins on ties, like max() over the emotion dict
+    dominant = np.argmax(probabilities, axis=1)
+
+    # Percentages times weights equals (value / 100 * weight) * 100
+    confidence = probabilities @ np.asarray(weights, dtype=np.float64) + CONFIDENCE_OFFSET
+    np.clip(confidence, CONFIDENCE_MIN, CONFIDENCE_MAX, out=confidence)
+
+    if n_labels >= 2:
+        # Top two per row without a full sort
+        top_two = np.argpartition(probabilities, n_labels - 2, axis=1)[:, -2:]
+        top_values = np.take_along_axis(probabilities, top_two, axis=1)
+        clarity = np.abs(top_values[:, 1] - top_values[:, 0])
+    else:
+        clarity = np.zeros(n_rows)
+
+    return dominant, confidence, clarity
+
+
+def summarize_emotion_matrix(probabilities, weights=CONFIDENCE_WEIGHTS, labels=EMOTION_LABELS):
+    """
+    Re-score a stored session offline and build its summary
+
+    Args:
+        probabilities: Array of shape (N, 7) with emotion percentages
+        weights: Confidence weight per emotion
+        labels: Column order
+
+    Returns:
+        Dictionary in the same shape as EmotionRecognition.get_session_summary
+    """
+    probabilities = np.atleast_2d(np.asarray(probabilities, dtype=np.float64))
+    if probabilities.shape[0] == 0:
+        return {
+            'averages': {name: 0.0 for name in labels},
+            'dominantCounts': {},
+            'avgConfidence': 0.0,
+            'avgClarity': 0.0,
+            'totalDetections': 0
+        }
+
+    dominant, confidence, clarity = score_emotions(probabilities, weights)
+    counts = np.bincount(dominant, minlength=len(labels))
+    # Order dominant counts by first occurrence, like counting them live
+    seen, first_index = np.unique(dominant, return_index=True)
+    first_seen = seen[np.argsort(first_index)]
+    return {
+        'averages': {name: float(value) for name, value in zip(labels, probabilities.mean(axis=0))},
+        'dominantCounts': {labels[i]: int(counts[i]) for i in first_seen},
+        'avgConfidence': float(confidence.mean()),
+        'avgClarity': float(clarity.mean()),
+        'totalDetections': int(probabilities.shape[0])
+    }
+
+
+class EmotionAccumulator:
+    def __init__(self, labels=EMOTION_LABELS, history_size=0):
+        """
+        Args:
+            labels: Emotion names tracked, in vector order
+            history_size: If > 0, keep the most recent samples in a fixed-size
+                numpy ring buffer (emotions, confidence, clarity per row) with
+                their timestamps
+        """
+        self.labels = list(labels)
+        self.label_index = {name: i for i, name in enumerate(self.labels)}
+        self.history_size = history_size
+        self.reset()
+
+    def reset(self):
+        """Clear all aggregates and history"""
+        size = len(self.labels)
+        self.count = 0
+        # Per-emotion running count/sum plus Welford mean and M2 for variance.
+        # Plain lists: for seven values they update far faster than numpy scalars.
+        self.emotion_counts = [0] * size
+        self.emotion_sums = [0.0] * size
+        self.emotion_means = [0.0] * size
+        self.emotion_m2 = [0.0] * size
+        self.confidence_sum = 0.0
+        self.confidence_mean = 0.0
+        self.confidence_m2 = 0.0
+        self.clarity_sum = 0.0
+        self.dominant_counts = {}
+        if self.history_size > 0:
+            self.history = np.zeros((self.history_size, size + 2), dtype=np.float32)
+            self.history_times = np.zeros(self.history_size, dtype=np.float64)
+        else:
+            self.history = None
+            self.history_times = None
+        self.history_index = 0
+
+    def add(self, emotions, confidence, clarity, dominant=None, timestamp=None):
+        """
+        Fold one detection into the aggregates
+
+        Args:
+            emotions: Dictionary of emotion name -> percentage
+            confidence: Weighted confidence score of the detection
+            clarity: Gap between the top two emotions
+            dominant: Dominant emotion name, if any
+            timestamp: Seconds since the session started, kept in the history
+                (default: the sample number)
+        """
+        self.count += 1
+        for name, value in emotions.items():
+            i = self.label_index.get(name)
+            if i is None:
+                continue
+            value = float(value)
+            self.emotion_counts[i] += 1
+            self.emotion_sums[i] += value
+            delta = value - self.emotion_means[i]
+            self.emotion_means[i] += delta / self.emotion_counts[i]
+            self.emotion_m2[i] += delta * (value - self.emotion_means[i])
+
+        confidence = float(confidence)
+        self.confidence_sum += confidence
+        delta = confidence - self.confidence_mean
+        self.confidence_mean += delta / self.count
+        self.confidence_m2 += delta * (confidence - self.confidence_mean)
+
+        self.clarity_sum += float(clarity)
+
+        if dominant is not None:
+            self.dominant_counts[dominant] = self.dominant_counts.get(dominant, 0) + 1
+
+        if self.history is not None:
+            row = self.history[self.history_index % self.history_size]
+            row[:len(self.labels)] = [emotions.get(name, 0.0) for name in self.labels]
+            row[-2] = confidence
+            row[-1] = clarity
+            self.history_times[self.history_index % self.history_size] = (
+                self.count - 1 if timestamp is None else timestamp)
+            self.history_index += 1
+
+    def get_state(self):
+        """
+        Get the aggregates as plain data, e.g. to persist a session
+
+        Returns:
+            JSON-serializable dictionary (the history ring buffer is not included)
+        """
+        return {
+            'labels': list(self.labels),
+            'count': self.count,
+            'emotion_counts': list(self.emotion_counts),
+            'emotion_sums': list(self.emotion_sums),
+            'emotion_means': list(self.emotion_means),
+            'emotion_m2': list(self.emotion_m2),
+            'confidence_sum': self.confidence_sum,
+            'confidence_mean': self.confidence_mean,
+            'confidence_m2': self.confidence_m2,
+            'clarity_sum': self.clarity_sum,
+            'dominant_counts': dict(self.dominant_counts)
+        }
+
+    def set_state(self, state):
+        """
+        Restore aggregates saved by get_state
+
+        Args:
+            state: Dictionary from get_state with the same labels
+        """
+        if list(state['labels']) != self.labels:
+            raise ValueError("Saved state has different emotion labels")
+        self.reset()
+        self.count = state['count']
+        self.emotion_counts = list(state['emotion_counts'])
+        self.emotion_sums = list(state['emotion_sums'])
+        self.emotion_means = list(state['emotion_means'])
+        self.emotion_m2 = list(state['emotion_m2'])
+        self.confidence_sum = state['confidence_sum']
+        self.confidence_mean = state['confidence_mean']
+        self.confidence_m2 = state['confidence_m2']
+        self.clarity_sum = state['clarity_sum']
+        self.dominant_counts = dict(state['dominant_counts'])
+
+    def average_emotions(self):
+        """
+        Returns:
+            Dictionary with the average value of each emotion (0.0 if unseen)
+        """
+        averages = {}
+        for i, name in enumerate(self.labels):
+            if self.emotion_counts[i] > 0:
+                averages[name] = self.emotion_sums[i] / self.emotion_counts[i]
+            else:
+                averages[name] = 0.0
+        return averages
+
+    def emotion_variances(self):
+        """
+        Returns:
+            Dictionary with the sample variance of each emotion (0.0 below two samples)
+        """
+        variances = {}
+        for i, name in enumerate(self.labels):
+            if self.emotion_counts[i] > 1:
+                variances[name] = self.emotion_m2[i] / (self.emotion_counts[i] - 1)
+            else:
+                variances[name] = 0.0
+        return variances
+
+    def average_confidence(self):
+        """
+        Returns:
+            Average weighted confidence, 0.0 if nothing was recorded
+        """
+        if self.count > 0:
+            return self.confidence_sum / self.count
+        return 0.0
+
+    def confidence_variance(self):
+        """
+        Returns:
+            Sample variance of the confidence score (0.0 below two samples)
+        """
+        if self.count > 1:
+            return self.confidence_m2 / (self.count - 1)
+        return 0.0
+
+    def average_clarity(self):
+        """
+        Returns:
+            Average detection clarity, 0.0 if nothing was recorded
+        """
+        if self.count > 0:
+            return self.clarity_sum / self.count
+        return 0.0
+
+    def most_common_dominant(self):
+        """
+        Returns:
+            Tuple of (emotion_name, count) for the most frequent dominant
+            emotion, or None if nothing was recorded
+        """
+        if not self.dominant_counts:
+            return None
+        # max keeps the first emotion seen on ties, like Counter.most_common
+        return max(self.dominant_counts.items(), key=lambda x: x[1])
+
+    def recent(self, n=None):
+        """
+        Get the most recent samples from the ring buffer, oldest first
+
+        Args:
+            n: Number of samples (default: all that are buffered)
+
+        Returns:
+            Numpy array of shape (n, len(labels) + 2) with emotions, confidence
+            and clarity per row; empty if history is disabled
+        """
+        if self.history is None:
+            return np.zeros((0, len(self.labels) + 2), dtype=np.float32)
+        return self.history[self._recent_indices(n)]
+
+    def recent_timestamps(self, n=None):
+        """
+        Get the timestamps of the samples returned by recent(n)
+
+        Returns:
+            float64 numpy array of length n; empty if history is disabled
+        """
+        if self.history is None:
+            return np.zeros(0, dtype=np.float64)
+        return self.history_times[self._recent_indices(n)]
+
+    def _recent_indices(self, n):
+        available = min(self.history_index, self.history_size)
+        if n is None or n > available:
+            n = available
+        return np.arange(self.history_index - n, self.history_index) % self.history_size
@@ -0,0 +1,261 @@
+"""
+Temporal smoothing and event extraction for the emotion time series
+Smooths each emotion with a time-aware exponential moving average, switches
+the dominant emotion only with hysteresis and turns the stream into compact
+segments such as "fear elevated 00:42-01:10", all in O(1) per sample
+"""
+
+import math
+import time
+from collections import deque
+
+from emotion_stats import EMOTION_LABELS
+
+
+# Smoothed percentage at which an emotion counts as elevated, and the lower
+# one it has to fall below to end the episode
+ELEVATED_ENTER = 40.0
+ELEVATED_EXIT = 30.0
+
+
+def format_timestamp(seconds):
+    """Seconds as MM:SS, or H:MM:SS from one hour on"""
+    seconds = int(round(seconds))
+    minutes, secs = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def format_segment(segment):
+    """
+    Describe a segment in one line
+
+    Args:
+        segment: Segment dictionary from EmotionTimeline
+
+    Returns:
+        Text such as "fear elevated 00:42–01:10 (peak 63%)"
+    """
+    span = f"{format_timestamp(segment['start'])}–{format_timestamp(segment['end'])}"
+    if segment['type'] == 'elevated':
+        return f"{segment['emotion']} elevated {span} (peak {segment['peak']:.0f}%)"
+    return f"{segment['emotion']} dominant {span}"
+
+
+class EmotionTimeline:
+    def __init__(self, labels=EMOTION_LABELS, time_constant=3.0, switch_margin=10.0,
+                 min_dwell=2.0, elevated_enter=ELEVATED_ENTER, elevated_exit=ELEVATED_EXIT,
+                 min_duration=3.0, ignore_elevated=('neutral',), max_segments=1000):
+        """
+        Args:
+            labels: Emotion names, in vector order
+            time_constant: EMA time constant in seconds; a sample's weight
+                depends on the time since the previous one, so irregular
+                sampling (adaptive sampler, dropped frames) is handled
+            switch_margin: Points by which another smoothed emotion has to
+                lead the current dominant one before it may take over
+            min_dwell: Seconds that lead has to last before the switch
+            elevated_enter: Smoothed percentage that starts an elevated episode
+            elevated_exit: Smoothed percentage below which the episode ends
+            min_duration: Shorter elevated episodes are not reported
+            ignore_elevated: Emotions that never produce elevated segments
+            max_segments: Closed segments kept, the oldest are dropped first
+        """
+        self.labels = list(labels)
+        self.time_constant = time_constant
+        self.switch_margin = switch_margin
+        self.min_dwell = min_dwell
+        self.elevated_enter = elevated_enter
+        self.elevated_exit = elevated_exit
+        self.min_duration = min_duration
+        self.watched = [i for i, name in enumerate(self.labels) if name not in ignore_elevated]
+        self.max_segments = max_segments
+        self.reset()
+
+    def reset(self):
+        """Clear the smoothed state and all segments"""
+        self.origin = None
+        self.last_time = None
+        self.count = 0
+        # Plain lists: for seven values they update far faster than numpy
+        self.smoothed = [0.0] * len(self.labels)
+        self.dominant = None
+        self.dominant_since = None
+        self.candidate = None
+        self.candidate_since = None
+        # Emotion index -> [start, peak, sum, count] of an open elevated episode
+        self.elevated = {}
+        self.segments = deque(maxlen=self.max_segments)
+        self.dropped_segments = 0
+
+    def add(self, emotions, timestamp=None):
+        """
+        Fold one sample into the smoothed series
+
+        Args:
+            emotions: Dictionary of emotion name -> percentage
+            timestamp: Seconds since the start of the session (default: wall
+                clock time since the first sample)
+
+        Returns:
+            List of segments closed by this sample (usually empty)
+        """
+        if timestamp is None:
+            now = time.monotonic()
+            if self.origin is None:
+                self.origin = now
+            timestamp = now - self.origin
+        values = [float(emotions.get(name, 0.0)) for name in self.labels]
+
+        if self.last_time is None:
+            self.smoothed = values
+        else:
+            elapsed = max(timestamp - self.last_time, 0.0)
+            alpha = 1.0
+            if self.time_constant > 0:
+                alpha = 1.0 - math.exp(-elapsed / self.time_constant)
+            self.smoothed = [s + alpha * (v - s) for s, v in zip(self.smoothed, values)]
+        self.last_time = timestamp
+        self.count += 1
+
+        closed = []
+        self._update_dominant(timestamp, closed)
+        self._update_elevated(timestamp, closed)
+        for segment in closed:
+            if len(self.segments) == self.segments.maxlen:
+                self.dropped_segments += 1
+            self.segments.append(segment)
+        return closed
+
+    def _update_dominant(self, timestamp, closed):
+        smoothed = self.smoothed
+        top = max(range(len(smoothed)), key=smoothed.__getitem__)
+        if self.dominant is None:
+            self.dominant = top
+            self.dominant_since = timestamp
+            return
+        if top == self.dominant or smoothed[top] - smoothed[self.dominant] < self.switch_margin:
+            self.candidate = None
+            return
+        if self.candidate != top:
+            self.candidate = top
+            self.candidate_since = timestamp
+        if timestamp - self.candidate_since >= self.min_dwell:
+            closed.append({'type': 'dominant', 'emotion': self.labels[self.dominant],
+                           'start': self.dominant_since, 'end': self.candidate_since})
+            self.dominant = top
+            self.dominant_since = self.candidate_since
+            self.candidate = None
+
+    def _update_elevated(self, timestamp, closed):
+        for i in self.watched:
+            value = self.smoothed[i]
+            episode = self.elevated.get(i)
+            if episode is None:
+                if value >= self.elevated_enter:
+                    self.elevated[i] = [timestamp, value, value, 1]
+                continue
+            if value < self.elevated_exit:
+                del self.elevated[i]
+                segment = self._elevated_segment(i, episode, timestamp)
+                if segment is not None:
+                    closed.append(segment)
+                continue
+            episode[1] = max(episode[1], value)
+            episode[2] += value
+            episode[3] += 1
+
+    def _elevated_segment(self, index, episode, end):
+        start, peak, total, count = episode
+        if end - start < self.min_duration:
+            return None
+        return {'type': 'elevated', 'emotion': self.labels[index], 'start': start, 'end': end,
+                'peak': peak, 'mean': total / count}
+
+    @property
+    def stable_dominant(self):
+        """Dominant emotion after smoothing and hysteresis, None before any sample"""
+        return self.labels[self.dominant] if self.dominant is not None else None
+
+    def smoothed_emotions(self):
+        """Current smoothed value of every emotion"""
+        return dict(zip(self.labels, self.smoothed))
+
+    def get_segments(self, include_open=True):
+        """
+        Get the segments of the session so far
+
+        Args:
+            include_open: Also report the current dominant emotion and open
+                elevated episodes, ending at the last sample (marked 'open')
+
+        Returns:
+            List of segment dictionaries ordered by start time
+        """
+        segments = list(self.segments)
+        if include_open and self.last_time is not None:
+            segments.append({'type': 'dominant', 'emotion': self.labels[self.dominant],
+                             'start': self.dominant_since, 'end': self.last_time, 'open': True})
+            for index, episode in self.elevated.items():
+                segment = self._elevated_segment(index, episode, self.last_time)
+                if segment is not None:
+                    segment['open'] = True
+                    segments.append(segment)
+        return sorted(segments, key=lambda segment: segment['start'])
+
+    def finish(self):
+        """
+        Close the open dominant segment and elevated episodes, e.g. at the end
+        of a recording
+
+        Returns:
+            List of segments closed
+        """
+        closed = [segment for segment in self.get_segments() if segment.pop('open', False)]
+        self.segments.extend(closed)
+        self.elevated = {}
+        self.dominant_since = self.last_time
+        return closed
+
+    def get_state(self):
+        """
+        Get the timeline as plain data, e.g. to persist a session
+
+        Returns:
+            JSON-serializable dictionary
+        """
+        return {
+            'labels': list(self.labels),
+            'last_time': self.last_time,
+            'count': self.count,
+            'smoothed': list(self.smoothed),
+            'dominant': self.dominant,
+            'dominant_since': self.dominant_since,
+            'elevated': {str(i): list(episode) for i, episode in self.elevated.items()},
+            'segments': list(self.segments),
+            'dropped_segments': self.dropped_segments
+        }
+
+    def set_state(self, state):
+        """
+        Restore a timeline saved by get_state. Wall clock timestamps continue
+        from the last restored sample.
+
+        Args:
+            state: Dictionary from get_state with the same labels
+        """
+        if list(state['labels']) != self.labels:
+            raise ValueError("Saved state has different emotion labels")
+        self.reset()
+        self.last_time = state['last_time']
+        self.count = state['count']
+        self.smoothed = list(state['smoothed'])
+        self.dominant = state['dominant']
+        self.dominant_since = state['dominant_since']
+        self.elevated = {int(i): list(episode) for i, episode in state['elevated'].items()}
+        self.segments.extend(state['segments'])
+        self.dropped_segments = state['dropped_segments']
+        if self.last_time is not None:
+            self.origin = time.monotonic() - self.last_time
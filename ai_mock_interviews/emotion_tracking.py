@@ -0,0 +1,197 @@
+"""
+Face tracking cache for emotion inference
+Runs the face detector once, follows the face with a template search around
+its last position and only classifies the cropped face on following frames
+"""
+
+import time
+
+import numpy as np
+
+from emotion_lazy import LazyModule
+from emotion_recognition import DeepFace, EmotionRecognition
+from emotion_stats import EMOTION_LABELS
+
+
+cv2 = LazyModule('cv2')
+
+
+class FaceTracker:
+    def __init__(self, recognizer=None, backend='opencv', redetect_interval=15, min_match=0.6,
+                 search_margin=0.5):
+        """
+        Args:
+            recognizer: EmotionRecognition used for classification
+            backend: Face detection backend used when (re-)detecting, or
+                'cascade' to escalate along the recognizer's backend cascade
+            redetect_interval: Run the detector again after this many tracked frames
+            min_match: Template match score (0-1) below which tracking counts
+                as lost and the detector runs again
+            search_margin: Search window around the last box, as a fraction of
+                the box size on every side
+        """
+        self.recognizer = recognizer or EmotionRecognition()
+        self.backend = backend
+        self.redetect_interval = redetect_interval
+        self.min_match = min_match
+        self.search_margin = search_margin
+        self.detections = 0
+        self.tracked_frames = 0
+        self.reset()
+
+    def reset(self):
+        """Forget the tracked face, the next frame runs the detector"""
+        self.box = None
+        self.template = None
+        self.face_confidence = 0.0
+        self.match_score = 0.0
+        self.frames_since_detect = 0
+
+    def _extract_faces(self, frame):
+        """Run the detector, returns the detected faces or an empty list"""
+        recognizer = self.recognizer
+        if self.backend == 'cascade':
+            # Start from the last winning detector, like detect_emotions_cascade;
+            # misses and per-backend timings are counted by the cascade
+            face_objs, winner, found = recognizer._extract_faces_cascade(
+                frame, preferred=recognizer.cascade_backend)
+            if not found:
+                return []
+            recognizer.cascade_backend = winner
+            return face_objs
+
+        try:
+            with recognizer.metrics.timer('detect', self.backend):
+                if recognizer.preprocessor is not None:
+                    return recognizer.preprocessor.extract_faces(
+                        frame, self.backend, enforce_detection=True, align=False)
+                return DeepFace.extract_faces(
+                    img_path=frame,
+                    detector_backend=self.backend,
+                    enforce_detection=True,
+                    align=False
+                )
+        except ValueError:
+            # No face in the frame
+            recognizer.metrics.increment('no_face', self.backend)
+            return []
+
+    def _detect(self, frame):
+        """Run the detector and keep the largest face, returns its box or None"""
+        self.detections += 1
+        face_objs = self._extract_faces(frame)
+        if not face_objs:
+            self.reset()
+            return None
+
+        area = max((f['facial_area'] for f in face_objs), key=lambda a: a['w'] * a['h'])
+        best = next(f for f in face_objs if f['facial_area'] is area)
+        x, y, w, h = (int(area[k]) for k in ('x', 'y', 'w', 'h'))
+        if w <= 0 or h <= 0:
+            self.reset()
+            return None
+
+        self.box = (x, y, w, h)
+        self.template = self._gray(frame)[y:y + h, x:x + w].copy()
+        self.face_confidence = float(best.get('confidence', 0.0))
+        self.match_score = 1.0
+        self.frames_since_detect = 0
+        return self.box
+
+    def _track(self, frame):
+        """Search for the face template around its last box, returns the new box or None"""
+        x, y, w, h = self.box
+        frame_h, frame_w = frame.shape[:2]
+        margin_x = int(w * self.search_margin)
+        margin_y = int(h * self.search_margin)
+        left = max(x - margin_x, 0)
+        top = max(y - margin_y, 0)
+        right = min(x + w + margin_x, frame_w)
+        bottom = min(y + h + margin_y, frame_h)
+        if right - left < w or bottom - top < h:
+            return None
+
+        roi = self._gray(frame)[top:bottom, left:right]
+        scores = cv2.matchTemplate(roi, self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, location = cv2.minMaxLoc(scores)
+        self.match_score = float(score)
+        if score < self.min_match:
+            return None
+
+        self.tracked_frames += 1
+        self.frames_since_detect += 1
+        self.box = (left + location[0], top + location[1], w, h)
+        return self.box
+
+    def _gray(self, frame):
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+    def update(self, frame):
+        """
+        Locate the face in a new frame, tracking when possible
+
+        Args:
+            frame: Video frame as numpy array (BGR)
+
+        Returns:
+            Face box (x, y, w, h) or None if no face was found
+        """
+        box = None
+        if self.box is not None and self.frames_since_detect < self.redetect_interval:
+            with self.recognizer.metrics.timer('track', self.backend):
+                box = self._track(frame)
+        if box is None:
+            box = self._detect(frame)
+        return box
+
+    def detect_emotions_from_frame(self, frame):
+        """
+        Same result format as EmotionRecognition.detect_emotions_from_frame,
+        but the detector only runs when tracking is lost or stale
+
+        Args:
+            frame: Video frame as numpy array (BGR)
+
+        Returns:
+            List with one DeepFace-format face dictionary, or None if no face
+            was found
+        """
+        metrics = self.recognizer.metrics
+        metrics.increment('frames', self.backend)
+        start = time.perf_counter()
+        box = self.update(frame)
+        if box is None:
+            return None
+
+        x, y, w, h = box
+        try:
+            with metrics.timer('classify', self.backend):
+                scores = self.recognizer.classify_faces([frame[y:y + h, x:x + w]])[0]
+        except Exception as e:
+            metrics.increment('errors', self.backend)
+            print(f"Error classifying tracked face: {str(e)}")
+            return None
+        metrics.observe('total', time.perf_counter() - start, self.backend)
+
+        return [{
+            'emotion': dict(zip(EMOTION_LABELS, scores)),
+            'dominant_emotion': EMOTION_LABELS[int(np.argmax(scores))],
+            'region': {'x': x, 'y': y, 'w': w, 'h': h},
+            'face_confidence': self.face_confidence
+        }]
+
+    def get_metrics(self):
+        """
+        Get detector vs tracker usage
+
+        Returns:
+            Dictionary with detector runs, tracked frames, the share of frames
+            served by tracking and the last template match score
+        """
+        total = self.detections + self.tracked_frames
+        return {
+            'detections': self.detections,
+            'tracked_frames': self.tracked_frames,
+            'tracked_ratio': self.tracked_frames / total if total else 0.0,
+            'match_score': self.match_score
+        }
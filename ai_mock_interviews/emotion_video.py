@@ -0,0 +1,311 @@
+"""
+Headless analysis of recorded interview videos
+A reader thread decodes only the sampled frames (grabbing or seeking past the
+rest) into a bounded queue, an inference pool analyzes them in parallel and
+the results are recorded in timestamp order, so the emotion track and session
+statistics match a sequential pass while decoding overlaps inference
+
+Run with: python emotion_video.py interview.mp4 --sample-fps 2 --output track.jsonl
+"""
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from emotion_lazy import LazyModule
+from emotion_recognition import EmotionRecognition
+
+
+cv2 = LazyModule('cv2')
+
+
+def open_video(path, hw_accel=True):
+    """
+    Open a video file, asking OpenCV for hardware-accelerated decoding where
+    the build and the machine support it
+
+    Args:
+        path: Video file path
+        hw_accel: Try VIDEO_ACCELERATION_ANY first
+
+    Returns:
+        cv2.VideoCapture, check isOpened()
+    """
+    if hw_accel and hasattr(cv2, 'CAP_PROP_HW_ACCELERATION'):
+        cap = cv2.VideoCapture(path, cv2.CAP_ANY,
+                               [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        if cap.isOpened():
+            return cap
+        cap.release()
+    return cv2.VideoCapture(path)
+
+
+class VideoFrameReader:
+    """Decodes the sampled frames of a video on a background thread"""
+
+    def __init__(self, path, sample_fps=1.0, max_queue=8, seek_threshold=None, hw_accel=True):
+        """
+        Args:
+            path: Video file path
+            sample_fps: Frames delivered per second of video
+            max_queue: Decoded frames buffered ahead of the consumer
+            seek_threshold: Gaps of at least this many frames are skipped by
+                seeking instead of grabbing (None: two seconds of video, about
+                a keyframe interval; 0 disables seeking). Grabbing still
+                decodes the skipped frames, it only saves their conversion
+                to BGR, while a seek jumps to the nearest keyframe
+            hw_accel: Ask OpenCV for hardware-accelerated decoding
+        """
+        self.path = path
+        self.cap = open_video(path, hw_accel)
+        self.opened = self.cap.isOpened()
+        self.fps = (self.cap.get(cv2.CAP_PROP_FPS) or 30.0) if self.opened else 30.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) if self.opened else 0
+        self.step = max(int(round(self.fps / sample_fps)), 1)
+        if seek_threshold is None:
+            seek_threshold = int(self.fps * 2)
+        self.seek_threshold = seek_threshold
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stopped = threading.Event()
+        self.thread = None
+
+        self.frames_read = 0
+        self.frames_decoded = 0
+        self.seeks = 0
+        self.error = None
+
+    def start(self):
+        """Start decoding"""
+        self.thread = threading.Thread(target=self._run, name="emotion-video-reader", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop decoding early and release the video"""
+        self.stopped.set()
+        # Unblock the reader if it waits on a full queue
+        while self.thread is not None and self.thread.is_alive():
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.thread.join(timeout=0.05)
+
+    def get(self):
+        """
+        Returns:
+            Next (frame index, timestamp in seconds, frame), or None at the end
+        """
+        return self.queue.get()
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _seek(self, target):
+        """Seek to target, returning the frame index the video is now at"""
+        if not self.cap.set(cv2.CAP_PROP_POS_FRAMES, target):
+            return None
+        position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+        if position > target:
+            # Overshot, e.g. a container without an index; keep grabbing
+            # from here on
+            self.seek_threshold = 0
+        self.seeks += 1
+        return position
+
+    def _run(self):
+        cap = self.cap
+        index = 0
+        target = 0
+        try:
+            while not self.stopped.is_set():
+                if self.seek_threshold and target - index >= self.seek_threshold:
+                    position = self._seek(target)
+                    if position is None:
+                        self.seek_threshold = 0
+                    else:
+                        index = position
+                while index < target:
+                    if not cap.grab():
+                        return
+                    index += 1
+                ret, frame = cap.read()
+                if not ret:
+                    return
+                self.frames_decoded += 1
+                self._put((index, index / self.fps, frame))
+                index += 1
+                target = index - 1 + self.step
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.frames_read = index
+            cap.release()
+            self._put(None)
+
+
+def analyze_video_file(path, recognizer=None, backend='opencv', sample_fps=1.0, workers=2,
+                       max_queue=8, seek_threshold=None, hw_accel=True, session=None, track=True):
+    """
+    Analyze a recorded video without a window
+
+    Args:
+        path: Video file path
+        recognizer: EmotionRecognition used for inference (shared by the pool)
+        backend: Face detection backend
+        sample_fps: Frames analyzed per second of video
+        workers: Inference threads
+        max_queue: Decoded frames buffered ahead of inference
+        seek_threshold: See VideoFrameReader
+        hw_accel: Ask OpenCV for hardware-accelerated decoding
+        session: EmotionRecognition the samples are recorded into (default: a
+            new one for this video)
+        track: Include every analyzed sample, not just the summary
+
+    Returns:
+        Result row dictionary with the summary, the timestamped emotion track
+        and decode/throughput counters ('speed' is video seconds analyzed per
+        wall clock second, 'framesWithoutFace' counts analyzed frames that
+        were not recorded because no face was detected)
+    """
+    row = {'type': 'video', 'path': path}
+    reader = VideoFrameReader(path, sample_fps, max_queue, seek_threshold, hw_accel)
+    if not reader.opened:
+        row['error'] = "Could not open video"
+        return row
+
+    recognizer = recognizer or EmotionRecognition()
+    session = session or EmotionRecognition()
+    samples = []
+    # Frames in flight are bounded too, so memory does not grow with the video
+    pending = deque()
+    max_in_flight = max(workers, 1) * 2
+    without_face = 0
+
+    def record_next():
+        nonlocal without_face
+        timestamp, shape, future = pending.popleft()
+        result = future.result()
+        if not recognizer.has_face(result, shape):
+            # DeepFace's whole-frame fallback scores the frame, not a face
+            without_face += 1
+            return
+        # Recorded in frame order, the timeline needs increasing timestamps
+        sample = session.record_emotions(result, shape, timestamp)
+        if sample is not None and track:
+            # Closed segments are reported once, in the summary
+            sample.pop('segments', None)
+            sample['t'] = timestamp
+            samples.append(sample)
+
+    start = time.perf_counter()
+    reader.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max(workers, 1),
+                                thread_name_prefix='emotion-video') as pool:
+            while True:
+                item = reader.get()
+                if item is None:
+                    break
+                _, timestamp, frame = item
+                pending.append((timestamp, frame.shape,
+                                pool.submit(recognizer.detect_emotions_from_frame, frame, backend)))
+                if len(pending) >= max_in_flight:
+                    record_next()
+            while pending:
+                record_next()
+    finally:
+        reader.stop()
+    elapsed = time.perf_counter() - start
+
+    if reader.error:
+        row['error'] = reader.error
+    frames_read = reader.frames_read
+    if reader.frame_count > 0:
+        # A seek past the last frame overshoots the end
+        frames_read = min(frames_read, reader.frame_count)
+    video_seconds = frames_read / reader.fps
+    row.update({
+        'fps': reader.fps,
+        'framesRead': frames_read,
+        'framesDecoded': reader.frames_decoded,
+        'framesWithoutFace': without_face,
+        'seeks': reader.seeks,
+        'videoSeconds': video_seconds,
+        'elapsedSeconds': elapsed,
+        'speed': video_seconds / elapsed if elapsed else 0.0,
+    })
+    session.timeline.finish()
+    row['summary'] = session.get_session_summary()
+    faces = session.get_face_summaries()
+    if len(faces) > 1:
+        # Group recordings: the summary follows the primary face, add every face
+        row['faces'] = faces
+    if track:
+        row['track'] = samples
+    return row
+
+
+def main():
+    """Main function with CLI interface"""
+    parser = argparse.ArgumentParser(description="Headless emotion analysis of a video file")
+    parser.add_argument('video', help="Video file")
+    parser.add_argument('--output', '-o',
+                        help="Write the track as JSONL (one sample per line) or the whole "
+                             "result as .json")
+    parser.add_argument('--backend', default='opencv', help="Face detection backend")
+    parser.add_argument('--sample-fps', type=float, default=1.0,
+                        help="Frames analyzed per second of video")
+    parser.add_argument('--workers', '-j', type=int, default=2, help="Inference threads")
+    parser.add_argument('--queue', type=int, default=8, help="Decoded frames buffered")
+    parser.add_argument('--seek-threshold', type=int, default=None,
+                        help="Seek over gaps of at least this many frames (0: always grab)")
+    parser.add_argument('--no-hw', action='store_true', help="Don't ask for hardware decoding")
+    parser.add_argument('--engine', default='deepface', choices=['deepface', 'onnx'],
+                        help="Emotion classifier engine")
+    parser.add_argument('--int8', action='store_true', help="Quantized ONNX engine")
+    parser.add_argument('--threads', type=int, default=0, help="ONNX Runtime threads (0: default)")
+    parser.add_argument('--working-size', type=int, default=None,
+                        help="Detect faces on frames downscaled to this longest side")
+    args = parser.parse_args()
+
+    from emotion_engines import create_engine
+
+    engine_options = {}
+    if args.engine == 'onnx':
+        engine_options = {'quantize': args.int8, 'intra_op_threads': args.threads}
+    recognizer = EmotionRecognition(engine=create_engine(args.engine, **engine_options),
+                                    working_size=args.working_size)
+    recognizer.warm_up([args.backend])
+    session = EmotionRecognition()
+    row = analyze_video_file(args.video, recognizer, args.backend, args.sample_fps, args.workers,
+                             args.queue, args.seek_threshold, not args.no_hw, session)
+    if 'error' in row and 'summary' not in row:
+        print(f"Error: {row['error']}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"Analyzed {row['framesDecoded']} of {row['framesRead']} frames "
+          f"({row['videoSeconds']:.1f}s of video) in {row['elapsedSeconds']:.1f}s, "
+          f"{row['speed']:.1f}x real time, {row['framesWithoutFace']} without a face",
+          file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            if args.output.lower().endswith('.json'):
+                json.dump(row, f)
+            else:
+                for sample in row['track']:
+                    f.write(json.dumps(sample) + "\n")
+    session.display_session_statistics()
+
+
+if __name__ == "__main__":
+    main()
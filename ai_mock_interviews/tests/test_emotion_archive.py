@@ -0,0 +1,108 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from emotion_archive import SessionArchive, SessionArchiveWriter, archive_results
+from emotion_stats import EMOTION_LABELS, emotions_to_matrix, summarize_emotion_matrix
+
+
+def make_track(count, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.dirichlet(np.ones(len(EMOTION_LABELS)), count) * 100.0
+    return [{'t': i * 0.5, 'scores': dict(zip(EMOTION_LABELS, row.tolist())),
+             'dominant': EMOTION_LABELS[int(np.argmax(row))]}
+            for i, row in enumerate(rows)]
+
+
+def write_jsonl(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+
+def test_round_trip(tmp_path):
+    tracks = {'a.mp4': make_track(40, 1), 'b.mp4': make_track(7, 2)}
+    with SessionArchiveWriter(str(tmp_path / 'archive')) as writer:
+        for session_id, track in tracks.items():
+            writer.add_track(session_id, track, {'path': session_id})
+
+    archive = SessionArchive(str(tmp_path / 'archive'))
+    assert archive.session_ids == ['a.mp4', 'b.mp4']
+    assert archive.counts.tolist() == [40, 7]
+    scores, timestamps = archive['b.mp4']
+    expected = emotions_to_matrix([sample['scores'] for sample in tracks['b.mp4']])
+    np.testing.assert_allclose(scores, expected, rtol=1e-6)
+    assert timestamps.tolist() == [i * 0.5 for i in range(7)]
+
+    summary = archive.summary('a.mp4')
+    reference = summarize_emotion_matrix(
+        emotions_to_matrix([sample['scores'] for sample in tracks['a.mp4']]))
+    assert summary['dominantCounts'] == reference['dominantCounts']
+    assert summary['avgConfidence'] == pytest.approx(reference['avgConfidence'], rel=1e-5)
+
+
+def test_archive_offline_results(tmp_path):
+    results = tmp_path / 'results.jsonl'
+    write_jsonl(results, [
+        {'type': 'image', 'path': 'face.jpg', 'scores': make_track(1)[0]['scores']},
+        {'type': 'video', 'path': 'a.mp4', 'fps': 30.0, 'track': make_track(5)},
+        {'type': 'video', 'path': 'broken.mp4', 'error': "Could not open video"},
+    ])
+    assert archive_results(str(results), str(tmp_path / 'archive')) == 1
+    assert SessionArchive(str(tmp_path / 'archive')).session_ids == ['a.mp4']
+
+
+def test_archive_video_results(tmp_path):
+    track = make_track(12)
+    result = tmp_path / 'interview.json'
+    result.write_text(json.dumps({'type': 'video', 'path': 'interview.mp4', 'track': track}))
+    assert archive_results(str(result), str(tmp_path / 'from_json')) == 1
+
+    # emotion_video --output track.jsonl writes one sample per line
+    samples = tmp_path / 'track.jsonl'
+    write_jsonl(samples, track)
+    assert archive_results(str(samples), str(tmp_path / 'from_jsonl')) == 1
+
+    from_json = SessionArchive(str(tmp_path / 'from_json'))
+    from_jsonl = SessionArchive(str(tmp_path / 'from_jsonl'))
+    assert from_jsonl.session_ids == [str(samples)]
+    np.testing.assert_array_equal(from_jsonl[0][0], from_json[0][0])
+    np.testing.assert_array_equal(from_jsonl[0][1], from_json[0][1])
+
+
+def test_results_without_tracks_fail(tmp_path):
+    results = tmp_path / 'images.jsonl'
+    write_jsonl(results, [{'type': 'image', 'path': 'face.jpg', 'scores': {}}])
+    with pytest.raises(ValueError):
+        archive_results(str(results), str(tmp_path / 'archive'))
+    assert not os.path.exists(tmp_path / 'archive')
+
+    module_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, os.path.join(module_dir, 'emotion_archive.py'), 'build', str(results),
+         '-o', str(tmp_path / 'archive')], capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 1
+    assert "No video tracks" in completed.stderr
+
+
+def test_truncated_recognizer_history_is_refused(tmp_path):
+    from emotion_recognition import EmotionRecognition
+
+    recognizer = EmotionRecognition(history_size=5)
+    for sample in make_track(8):
+        recognizer.record_emotions({'emotion': sample['scores']}, timestamp=sample['t'])
+
+    with pytest.raises(ValueError):
+        recognizer.export_history()
+    with SessionArchiveWriter(str(tmp_path / 'archive')) as writer:
+        with pytest.raises(ValueError):
+            writer.add_recognizer('a', recognizer)
+        writer.add_recognizer('a', recognizer, partial=True)
+
+    archive = SessionArchive(str(tmp_path / 'archive'))
+    assert archive.counts.tolist() == [5]
+    assert archive.metadata == [{'truncated': True}]
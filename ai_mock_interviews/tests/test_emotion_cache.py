@@ -0,0 +1,48 @@
+import numpy as np
+
+from emotion_cache import ResultCache
+from emotion_offline import cache_namespace
+
+
+RESULT = [{'emotion': {'happy': np.float32(90.0)}, 'dominant_emotion': 'happy'}]
+
+
+def gradient_frame():
+    row = np.linspace(0, 255, 64, dtype=np.float64)
+    return np.repeat(np.outer(np.ones(48), row)[:, :, None], 3, axis=2).astype(np.uint8)
+
+
+def test_exact_keys():
+    cache = ResultCache()
+    key = cache.key_for_bytes(b'jpeg data', 'opencv')
+    assert cache.get(key) is None
+    cache.put(key, RESULT)
+    assert cache.get(key) == [{'emotion': {'happy': 90.0}, 'dominant_emotion': 'happy'}]
+    assert cache.get(cache.key_for_bytes(b'jpeg data', 'ssd')) is None
+    assert cache.stats()['hits'] == 1
+
+
+def test_perceptual_near_duplicates_hit():
+    cache = ResultCache(perceptual=True)
+    frame = gradient_frame()
+    cache.put(cache.key_for_frame(frame, 'opencv'), RESULT)
+    noisy = np.clip(frame.astype(np.int16) + 2, 0, 255).astype(np.uint8)
+    assert cache.get(cache.key_for_frame(noisy, 'opencv')) is not None
+
+
+def test_uncacheable_inputs_are_skipped():
+    cache = ResultCache(perceptual=True)
+    # Perceptual keys need a decoded frame
+    assert cache.key_for_bytes(b'not an image', 'opencv') is None
+    assert cache.key_for_frame(None, 'opencv') is None
+    cache.put(None, RESULT)
+    assert cache.get(None) is None
+    assert len(cache) == 0
+    assert cache.stats()['misses'] == 0
+
+
+def test_offline_namespace_separates_engine_setups():
+    assert cache_namespace('opencv') == 'opencv/deepface'
+    assert cache_namespace('opencv', 'onnx', {'intra_op_threads': 4}) == 'opencv/onnx'
+    assert (cache_namespace('opencv', 'onnx', {'quantize': True}, 480)
+            == 'opencv/onnx/quantize=True@480')
@@ -0,0 +1,75 @@
+import numpy as np
+
+from emotion_recognition import EmotionRecognition
+
+
+FRAME = np.zeros((120, 160, 3), dtype=np.uint8)
+
+
+def face(x=10, y=20, w=40, h=50, confidence=0.9):
+    return {'face': np.ones((h, w, 3)), 'confidence': confidence,
+            'facial_area': {'x': x, 'y': y, 'w': w, 'h': h}}
+
+
+def cascade_recognizer(monkeypatch, errors):
+    """Recognizer whose detectors raise the given backend -> exception"""
+    recognizer = EmotionRecognition()
+    recognizer.cascade_backends = ['opencv', 'ssd']
+    calls = []
+
+    def extract_faces(frame, backend='opencv'):
+        calls.append(backend)
+        if errors.get(backend) is not None:
+            raise errors[backend]
+        return [face()]
+
+    monkeypatch.setattr(recognizer, '_extract_faces', extract_faces)
+    return recognizer, calls
+
+
+def test_missing_detector_package_is_skipped_for_good(monkeypatch):
+    recognizer, calls = cascade_recognizer(monkeypatch, {'opencv': ImportError("no opencv")})
+    for _ in range(3):
+        _, backend, found = recognizer._extract_faces_cascade(FRAME)
+        assert (backend, found) == ('ssd', True)
+    assert calls == ['opencv', 'ssd', 'ssd', 'ssd']
+    assert recognizer.cascade_failures == {'opencv': "no opencv"}
+
+
+def test_runtime_errors_back_off_and_recover(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr('emotion_recognition.time.monotonic', lambda: clock[0])
+    errors = {'opencv': RuntimeError("model download failed")}
+    recognizer, calls = cascade_recognizer(monkeypatch, errors)
+
+    recognizer._extract_faces_cascade(FRAME)
+    recognizer._extract_faces_cascade(FRAME)
+    assert calls == ['opencv', 'ssd', 'ssd']
+    assert recognizer.cascade_failures == {}
+
+    # Retried once the backoff passed, and backed off twice as long
+    clock[0] += 1.5
+    recognizer._extract_faces_cascade(FRAME)
+    assert calls[-2:] == ['opencv', 'ssd']
+    assert recognizer.cascade_retry_after['opencv'] == clock[0] + 2.0
+
+    clock[0] += 2.5
+    errors['opencv'] = None
+    _, backend, _ = recognizer._extract_faces_cascade(FRAME)
+    assert backend == 'opencv'
+    assert recognizer.cascade_errors == {}
+    assert recognizer.cascade_retry_after == {}
+
+
+def test_face_tracker_detects_with_the_cascade(monkeypatch):
+    from emotion_tracking import FaceTracker
+
+    recognizer, calls = cascade_recognizer(monkeypatch, {'opencv': ImportError("no opencv")})
+    tracker = FaceTracker(recognizer, 'cascade')
+    assert tracker.update(FRAME) == (10, 20, 40, 50)
+    assert recognizer.cascade_backend == 'ssd'
+
+    monkeypatch.setattr(recognizer, '_extract_faces_cascade',
+                        lambda frame, preferred=None: ([], None, False))
+    tracker.reset()
+    assert tracker.update(FRAME) is None
@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('onnxruntime')
+pytest.importorskip('deepface')
+
+from deepface import DeepFace
+
+from emotion_engines import ONNX_MODEL_NAME, create_engine, default_weights_dir
+from emotion_stats import EMOTION_LABELS
+
+
+KERAS_MODEL_NAME = 'facial_expression_model_weights.h5'
+# Scores are percentages, as DeepFace reports them
+TOLERANCE = 0.01
+
+
+def faces(count=8, seed=0):
+    """Random BGR face crops of different sizes, as the detectors return them"""
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+            for size in rng.integers(60, 200, count)]
+
+
+@pytest.fixture(scope='module')
+def onnx_engine():
+    for name in (ONNX_MODEL_NAME, KERAS_MODEL_NAME):
+        if not os.path.exists(os.path.join(default_weights_dir(), name)):
+            pytest.skip(f"{name} is not in {default_weights_dir()}")
+    return create_engine('onnx')
+
+
+def test_onnx_scores_match_deepface_analyze(onnx_engine):
+    crops = faces()
+    scores = onnx_engine.predict(crops) * 100
+    expected = np.array([
+        [DeepFace.analyze(face, actions=['emotion'], detector_backend='skip',
+                          enforce_detection=False, silent=True)[0]['emotion'][label]
+         for label in EMOTION_LABELS]
+        for face in crops
+    ])
+
+    assert scores.shape == expected.shape
+    np.testing.assert_allclose(scores, expected, atol=TOLERANCE)
+    # The dominant emotion agrees wherever it is not a tie within the tolerance
+    ranked = np.sort(expected, axis=1)
+    clear = ranked[:, -1] - ranked[:, -2] > 2 * TOLERANCE
+    assert (scores.argmax(axis=1) == expected.argmax(axis=1))[clear].all()
@@ -0,0 +1,29 @@
+from emotion_metrics import PipelineMetrics
+
+
+def metric_types(text):
+    return {line.split()[2]: line.split()[3]
+            for line in text.splitlines() if line.startswith('# TYPE')}
+
+
+def test_prometheus_counters_and_gauges():
+    metrics = PipelineMetrics()
+    metrics.observe('detect', 0.02, 'opencv')
+    metrics.increment('errors', 'opencv', 2)
+    metrics.increment('frames')
+
+    text = metrics.to_prometheus(gauges={'pending_frames': 3},
+                                 counters={'dropped_frames': 5})
+    assert metric_types(text) == {
+        'emotion_stage_seconds': 'histogram',
+        'emotion_errors_total': 'counter',
+        'emotion_frames_total': 'counter',
+        'emotion_dropped_frames_total': 'counter',
+        'emotion_pending_frames': 'gauge',
+    }
+    lines = text.splitlines()
+    assert 'emotion_errors_total{backend="opencv"} 2' in lines
+    assert 'emotion_frames_total 1' in lines
+    assert 'emotion_dropped_frames_total 5' in lines
+    assert 'emotion_pending_frames 3' in lines
+    assert 'emotion_stage_seconds_count{stage="detect",backend="opencv"} 1' in lines
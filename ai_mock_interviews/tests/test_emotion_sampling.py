@@ -0,0 +1,35 @@
+import time
+
+from emotion_sampling import BackgroundAnalyzer
+
+
+def wait_for_result(analyzer, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        finished = analyzer.poll()
+        if finished is not None:
+            return finished
+        time.sleep(0.001)
+    raise AssertionError("no result from the background analyzer")
+
+
+def test_background_analyzer_counts_failures():
+    def analyze(frame):
+        if frame == 'bad':
+            raise RuntimeError("model failed")
+        return {'frame': frame}
+
+    analyzer = BackgroundAnalyzer(analyze)
+    try:
+        analyzer.submit('bad')
+        result, _ = wait_for_result(analyzer)
+        assert result is None
+        assert analyzer.failures == 1
+        assert analyzer.last_error == "model failed"
+
+        analyzer.submit('good')
+        result, _ = wait_for_result(analyzer)
+        assert result == {'frame': 'good'}
+        assert analyzer.failures == 1
+    finally:
+        analyzer.stop()
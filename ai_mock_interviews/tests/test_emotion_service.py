@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('httpx')
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from emotion_service import EmotionService, create_app  # noqa: E402
+from emotion_sessions import SessionEnded  # noqa: E402
+
+
+FACE = [{'emotion': {'happy': 90.0, 'neutral': 10.0},
+         'region': {'x': 10, 'y': 10, 'w': 50, 'h': 50}}]
+
+
+def slow_service(tmp_path, seconds=0.2):
+    """Service whose inference takes a while and always finds a face"""
+    service = EmotionService(warm_up=False, session_db=str(tmp_path / 'sessions.sqlite'))
+
+    def infer(image, preferred_backend=None):
+        time.sleep(seconds)
+        return FACE
+
+    service._infer = infer
+    return service
+
+
+def test_frame_in_flight_when_the_session_ends(tmp_path):
+    service = slow_service(tmp_path)
+
+    async def run():
+        await service.analyze(b'frame', 'a')
+        late = asyncio.create_task(service.analyze(b'frame', 'a'))
+        await asyncio.sleep(0.05)
+        assert service.end_session('a')['totalDetections'] == 1
+        with pytest.raises(SessionEnded):
+            await late
+        with pytest.raises(SessionEnded):
+            await service.analyze(b'frame', 'a')
+
+    try:
+        asyncio.run(run())
+        assert 'a' not in service.sessions
+        assert service.sessions.summary('a')['totalDetections'] == 1
+    finally:
+        service.shutdown()
+
+
+def test_http_analyze_after_end_is_refused(tmp_path):
+    with TestClient(create_app(slow_service(tmp_path, 0.0))) as client:
+        request = {'imageBase64': 'x', 'sessionId': 'a'}
+        assert client.post('/analyze', json=request).status_code == 200
+        assert client.delete('/sessions/a').json()['totalDetections'] == 1
+        assert client.post('/analyze', json=request).status_code == 409
+
+
+def test_stream_end_waits_for_the_frame_being_analyzed(tmp_path):
+    with TestClient(create_app(slow_service(tmp_path))) as client:
+        with client.websocket_connect('/stream/a') as websocket:
+            websocket.send_bytes(b'frame')
+            time.sleep(0.05)
+            websocket.send_text('{"type": "end"}')
+            result = websocket.receive_json()
+            final = websocket.receive_json()
+        assert result['type'] == 'result' and result['sample'] is not None
+        assert final['final'] and final['summary']['totalDetections'] == 1
+        assert client.get('/sessions/a').json()['totalDetections'] == 1
@@ -0,0 +1,130 @@
+import json
+
+import pytest
+
+from emotion_faces import MultiFaceTracker
+from emotion_sessions import (
+    FACE_TRACK_BYTES,
+    SESSION_OVERHEAD_BYTES,
+    TIMELINE_SEGMENT_BYTES,
+    SessionEnded,
+    SessionSnapshotStore,
+    SessionStore,
+)
+from emotion_stats import EMOTION_LABELS
+
+
+def two_faces(step):
+    faces = []
+    for i, x in enumerate((20, 300)):
+        emotions = dict.fromkeys(EMOTION_LABELS, 5.0)
+        emotions[EMOTION_LABELS[(step + i) % len(EMOTION_LABELS)]] = 70.0
+        faces.append({'emotion': emotions, 'region': {'x': x + step, 'y': 40, 'w': 120, 'h': 120}})
+    return faces
+
+
+def test_multi_face_state_round_trip():
+    tracker = MultiFaceTracker()
+    for step in range(5):
+        tracker.update(two_faces(step), (480, 640, 3))
+
+    restored = MultiFaceTracker()
+    restored.set_state(json.loads(json.dumps(tracker.get_state())))
+    assert restored.get_face_summaries() == tracker.get_face_summaries()
+
+    # Restored tracks keep their ids on the next frame
+    faces = restored.update(two_faces(5), (480, 640, 3))
+    assert {face['track_id'] for face in faces} == {1, 2}
+    assert restored.next_id == 3
+
+
+def test_evicted_session_restores_its_faces():
+    store = SessionStore(max_sessions=1, active_window=0.0, snapshot_path=':memory:')
+    session = store.get_or_create('a')
+    for step in range(4):
+        session.record_emotions(two_faces(step), (480, 640, 3))
+    faces = session.get_face_summaries()
+
+    store.get_or_create('b')
+    assert 'a' not in store
+    restored = store.get_or_create('a')
+    assert store.restored == 1
+    assert restored.get_face_summaries() == faces
+    assert restored.get_session_summary() == session.get_session_summary()
+    store.close()
+
+
+def test_memory_estimate_counts_tracked_faces():
+    store = SessionStore(snapshot_path=None)
+    session = store.get_or_create('a')
+    assert store.memory_bytes == SESSION_OVERHEAD_BYTES
+
+    session.record_emotions(two_faces(0), (480, 640, 3))
+    store.get_or_create('a')
+    assert store.memory_bytes == SESSION_OVERHEAD_BYTES + 2 * FACE_TRACK_BYTES
+
+    store.end('a')
+    assert store.memory_bytes == 0
+
+
+def record(session, count):
+    for step in range(count):
+        session.record_emotions(two_faces(step), (480, 640, 3))
+
+
+def test_late_frames_never_replace_an_ended_session(tmp_path):
+    path = str(tmp_path / 'sessions.sqlite')
+    store = SessionStore(snapshot_path=path)
+    record(store.get_or_create('a'), 50)
+    assert store.end('a')['totalDetections'] == 50
+
+    # A frame that was still being analyzed when the session ended
+    with pytest.raises(SessionEnded):
+        store.get_or_create('a')
+    assert store.is_ended('a')
+    store.close()
+
+    restarted = SessionStore(snapshot_path=path)
+    assert restarted.is_ended('a')
+    with pytest.raises(SessionEnded):
+        restarted.get_or_create('a')
+    assert restarted.summary('a')['totalDetections'] == 50
+    restarted.close()
+
+
+def test_snapshot_store_keeps_final_snapshots():
+    snapshots = SessionSnapshotStore(':memory:')
+    snapshots.save('a', {}, {'totalDetections': 50}, 1.0, ended=True)
+    snapshots.save('a', {}, {'totalDetections': 1}, 2.0)
+    snapshot = snapshots.load('a')
+    assert snapshot['ended']
+    assert snapshot['summary'] == {'totalDetections': 50}
+
+    snapshots.save('b', {}, {'totalDetections': 1}, 1.0)
+    snapshots.save('b', {}, {'totalDetections': 2}, 1.0)
+    assert snapshots.load('b')['summary'] == {'totalDetections': 2}
+    snapshots.close()
+
+
+def test_ended_ids_are_bounded():
+    store = SessionStore(snapshot_path=None, max_ended=2)
+    for session_id in ('a', 'b', 'c'):
+        store.get_or_create(session_id)
+        store.end(session_id)
+    assert list(store.ended) == ['b', 'c']
+
+
+def test_memory_estimate_counts_timeline_segments():
+    store = SessionStore(snapshot_path=None)
+    session = store.get_or_create('a')
+    timestamp = 0.0
+    for step in range(400):
+        emotions = dict.fromkeys(EMOTION_LABELS, 2.0)
+        emotions[EMOTION_LABELS[(step // 40) % len(EMOTION_LABELS)]] = 88.0
+        session.record_emotions({'emotion': emotions}, timestamp=timestamp)
+        timestamp += 0.25
+    store.get_or_create('a')
+
+    segments = len(session.timeline.segments)
+    assert segments > 0
+    assert store.memory_bytes == SESSION_OVERHEAD_BYTES + segments * TIMELINE_SEGMENT_BYTES
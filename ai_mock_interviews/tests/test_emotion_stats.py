@@ -0,0 +1,223 @@
+import numpy as np
+import pytest
+
+from emotion_stats import (
+    EMOTION_LABELS,
+    EmotionAccumulator,
+    emotions_to_matrix,
+    score_emotions,
+    summarize_emotion_matrix,
+)
+
+
+def random_emotions(count, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.dirichlet(np.ones(len(EMOTION_LABELS)), count) * 100.0
+    return [dict(zip(EMOTION_LABELS, row.tolist())) for row in rows]
+
+
+def scalar_score(emotions):
+    """The original per-detection formulas of record_emotions"""
+    weighted_sum = (emotions['neutral'] / 100.0 * 0.50 + emotions['happy'] / 100.0 * 0.60
+                    + emotions['fear'] / 100.0 * -0.30 + emotions['sad'] / 100.0 * -0.20
+                    + emotions['disgust'] / 100.0 * -0.15 + emotions['angry'] / 100.0 * -0.10
+                    + emotions['surprise'] / 100.0 * -0.05)
+    confidence = max(min(weighted_sum * 100 + 50.0, 100.0), 45.0)
+    ranked = sorted(emotions.items(), key=lambda x: x[1], reverse=True)
+    return ranked[0][0], confidence, ranked[0][1] - ranked[1][1]
+
+
+def fill(accumulator, samples, timestamps=None):
+    for i, emotions in enumerate(samples):
+        dominant, confidence, clarity = scalar_score(emotions)
+        accumulator.add(emotions, confidence, clarity, dominant,
+                        None if timestamps is None else timestamps[i])
+
+
+def test_score_emotions_matches_scalar_formulas():
+    samples = random_emotions(200)
+    dominant, confidence, clarity = score_emotions(emotions_to_matrix(samples))
+    for i, emotions in enumerate(samples):
+        name, expected_confidence, expected_clarity = scalar_score(emotions)
+        assert EMOTION_LABELS[dominant[i]] == name
+        assert confidence[i] == pytest.approx(expected_confidence, rel=1e-12)
+        assert clarity[i] == pytest.approx(expected_clarity, rel=1e-12)
+
+
+def test_confidence_is_clamped():
+    all_happy = dict.fromkeys(EMOTION_LABELS, 0.0)
+    all_happy['happy'] = 100.0
+    all_fear = dict.fromkeys(EMOTION_LABELS, 0.0)
+    all_fear['fear'] = 100.0
+    _, confidence, _ = score_emotions(emotions_to_matrix([all_happy, all_fear]))
+    assert confidence.tolist() == [100.0, 45.0]
+
+
+def test_welford_matches_numpy():
+    samples = random_emotions(500, seed=1)
+    accumulator = EmotionAccumulator()
+    fill(accumulator, samples)
+    matrix = emotions_to_matrix(samples)
+    confidences = [scalar_score(emotions)[1] for emotions in samples]
+
+    assert accumulator.count == 500
+    averages = accumulator.average_emotions()
+    variances = accumulator.emotion_variances()
+    for i, name in enumerate(EMOTION_LABELS):
+        assert averages[name] == pytest.approx(matrix[:, i].mean(), rel=1e-12)
+        assert variances[name] == pytest.approx(matrix[:, i].var(ddof=1), rel=1e-9)
+    assert accumulator.average_confidence() == pytest.approx(np.mean(confidences), rel=1e-12)
+    assert accumulator.confidence_variance() == pytest.approx(np.var(confidences, ddof=1),
+                                                              rel=1e-9)
+
+
+def test_empty_and_single_sample():
+    accumulator = EmotionAccumulator()
+    assert accumulator.average_confidence() == 0.0
+    assert accumulator.average_clarity() == 0.0
+    assert accumulator.most_common_dominant() is None
+    assert all(value == 0.0 for value in accumulator.average_emotions().values())
+
+    fill(accumulator, random_emotions(1))
+    assert accumulator.confidence_variance() == 0.0
+    assert all(value == 0.0 for value in accumulator.emotion_variances().values())
+
+
+def test_unknown_and_missing_emotions():
+    accumulator = EmotionAccumulator()
+    accumulator.add({'happy': 80.0, 'bored': 50.0}, 70.0, 60.0, 'happy')
+    accumulator.add({'happy': 40.0, 'sad': 20.0}, 60.0, 20.0, 'happy')
+    averages = accumulator.average_emotions()
+    # Every emotion is averaged over the samples that reported it
+    assert averages['happy'] == 60.0
+    assert averages['sad'] == 20.0
+    assert averages['angry'] == 0.0
+    assert 'bored' not in averages
+
+
+def test_most_common_keeps_first_seen_on_ties():
+    accumulator = EmotionAccumulator()
+    for dominant in ('sad', 'happy', 'happy', 'sad'):
+        accumulator.add({}, 50.0, 0.0, dominant)
+    assert accumulator.most_common_dominant() == ('sad', 2)
+
+
+def test_history_disabled():
+    accumulator = EmotionAccumulator()
+    fill(accumulator, random_emotions(3))
+    assert accumulator.history is None
+    assert accumulator.recent().shape == (0, len(EMOTION_LABELS) + 2)
+    assert accumulator.recent_timestamps().shape == (0,)
+
+
+def test_ring_buffer_keeps_latest_in_order():
+    samples = random_emotions(13, seed=2)
+    accumulator = EmotionAccumulator(history_size=5)
+    fill(accumulator, samples, timestamps=[i * 2.0 for i in range(13)])
+
+    recent = accumulator.recent()
+    assert recent.shape == (5, len(EMOTION_LABELS) + 2)
+    assert recent.dtype == np.float32
+    expected = emotions_to_matrix(samples[-5:])
+    np.testing.assert_allclose(recent[:, :len(EMOTION_LABELS)], expected, rtol=1e-6)
+    np.testing.assert_allclose(recent[:, -2], [scalar_score(e)[1] for e in samples[-5:]],
+                               rtol=1e-6)
+    np.testing.assert_allclose(recent[:, -1], [scalar_score(e)[2] for e in samples[-5:]],
+                               rtol=1e-5, atol=1e-5)
+    assert accumulator.recent_timestamps().tolist() == [16.0, 18.0, 20.0, 22.0, 24.0]
+
+    assert accumulator.recent(2).shape[0] == 2
+    np.testing.assert_allclose(accumulator.recent(2), recent[-2:])
+    assert accumulator.recent(50).shape[0] == 5
+
+
+def test_ring_buffer_before_wrapping():
+    accumulator = EmotionAccumulator(history_size=10)
+    fill(accumulator, random_emotions(3))
+    assert accumulator.recent().shape[0] == 3
+    # Without timestamps the sample number is kept
+    assert accumulator.recent_timestamps().tolist() == [0.0, 1.0, 2.0]
+
+
+def test_state_round_trip():
+    samples = random_emotions(100, seed=3)
+    original = EmotionAccumulator()
+    fill(original, samples[:60])
+
+    restored = EmotionAccumulator()
+    restored.set_state(original.get_state())
+    assert restored.get_state() == original.get_state()
+
+    # Both keep accumulating identically after the restore
+    fill(original, samples[60:])
+    fill(restored, samples[60:])
+    assert restored.get_state() == original.get_state()
+    assert restored.emotion_variances() == original.emotion_variances()
+
+
+def test_state_is_json_serializable():
+    import json
+
+    accumulator = EmotionAccumulator()
+    fill(accumulator, random_emotions(10))
+    state = json.loads(json.dumps(accumulator.get_state()))
+    restored = EmotionAccumulator()
+    restored.set_state(state)
+    assert restored.average_emotions() == accumulator.average_emotions()
+
+
+def test_set_state_rejects_other_labels():
+    state = EmotionAccumulator(labels=['happy', 'sad']).get_state()
+    with pytest.raises(ValueError):
+        EmotionAccumulator().set_state(state)
+
+
+def test_reset_clears_everything():
+    accumulator = EmotionAccumulator(history_size=4)
+    fill(accumulator, random_emotions(6))
+    accumulator.reset()
+    assert accumulator.count == 0
+    assert accumulator.dominant_counts == {}
+    assert accumulator.recent().shape[0] == 0
+
+
+def test_summarize_matches_accumulator():
+    samples = random_emotions(300, seed=4)
+    accumulator = EmotionAccumulator()
+    fill(accumulator, samples)
+    summary = summarize_emotion_matrix(emotions_to_matrix(samples))
+    assert summary['totalDetections'] == 300
+    assert summary['dominantCounts'] == accumulator.dominant_counts
+    # Dominant counts are ordered by first occurrence, like counting them live
+    assert list(summary['dominantCounts']) == list(accumulator.dominant_counts)
+    assert summary['avgConfidence'] == pytest.approx(accumulator.average_confidence())
+    assert summary['avgClarity'] == pytest.approx(accumulator.average_clarity())
+    for name, value in accumulator.average_emotions().items():
+        assert summary['averages'][name] == pytest.approx(value)
+
+
+def test_summarize_empty_matrix():
+    summary = summarize_emotion_matrix(np.zeros((0, len(EMOTION_LABELS))))
+    assert summary['totalDetections'] == 0
+    assert summary['dominantCounts'] == {}
+
+
+def test_record_emotions_matches_list_based_stats():
+    from collections import Counter
+
+    from emotion_recognition import EmotionRecognition
+
+    samples = random_emotions(400, seed=5)
+    recognizer = EmotionRecognition()
+    for emotions in samples:
+        recognizer.record_emotions({'emotion': emotions}, timestamp=0.0)
+
+    # The original session lists, scored with the original formulas
+    scored = [scalar_score(emotions) for emotions in samples]
+    summary = recognizer.get_session_summary()
+    assert summary['totalDetections'] == 400
+    assert summary['dominantCounts'] == dict(Counter(name for name, _, _ in scored))
+    assert summary['avgConfidence'] == pytest.approx(np.mean([c for _, c, _ in scored]))
+    assert summary['avgClarity'] == pytest.approx(np.mean([c for _, _, c in scored]))
+    for name in EMOTION_LABELS:
+        assert summary['averages'][name] == pytest.approx(np.mean([e[name] for e in samples]))
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from emotion_recognition import EmotionRecognition
+from emotion_video import analyze_video_file
+
+
+cv2 = pytest.importorskip('cv2')
+
+
+def write_video(path, frames, fps=10.0, size=(160, 120)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+    if not writer.isOpened():
+        pytest.skip("OpenCV cannot write MJPG videos here")
+    for _ in range(frames):
+        writer.write(np.zeros((size[1], size[0], 3), dtype=np.uint8))
+    writer.release()
+
+
+class StubRecognizer(EmotionRecognition):
+    """Finds a face on every second frame, else returns DeepFace's fallback"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def detect_emotions_from_frame(self, frame, backend='opencv', zero_copy=True):
+        self.calls += 1
+        height, width = frame.shape[:2]
+        emotions = {'happy': 80.0, 'neutral': 20.0}
+        if self.calls % 2:
+            # The whole frame, one pixel short, with confidence 0
+            return [{'emotion': emotions, 'face_confidence': 0,
+                     'region': {'x': 0, 'y': 0, 'w': width - 1, 'h': height - 1}}]
+        return [{'emotion': emotions, 'face_confidence': 0.9,
+                 'region': {'x': 40, 'y': 30, 'w': 50, 'h': 50}}]
+
+
+def test_frames_without_a_face_are_not_recorded(tmp_path):
+    path = tmp_path / 'blank.avi'
+    write_video(path, 30)
+    row = analyze_video_file(str(path), StubRecognizer(), sample_fps=2.0, workers=1)
+
+    analyzed = row['framesWithoutFace'] + row['summary']['totalDetections']
+    assert analyzed == 6
+    assert row['framesWithoutFace'] == 3
+    assert len(row['track']) == 3
+    assert all(sample['t'] in (0.5, 1.5, 2.5) for sample in row['track'])
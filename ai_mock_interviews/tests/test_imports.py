@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+MODULE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Everything a service, CLI or library user imports; the benchmark and load
+# generator synthesize frames with OpenCV and are left out
+ENTRY_MODULES = [
+    'emotion_archive',
+    'emotion_batching',
+    'emotion_cache',
+    'emotion_engines',
+    'emotion_faces',
+    'emotion_metrics',
+    'emotion_offline',
+    'emotion_preprocess',
+    'emotion_recognition',
+    'emotion_sampling',
+    'emotion_service',
+    'emotion_sessions',
+    'emotion_stats',
+    'emotion_timeline',
+    'emotion_tracking',
+    'emotion_video',
+]
+
+HEAVY_MODULES = ['cv2', 'deepface', 'tensorflow']
+
+CHECK = """
+import sys
+import {module}
+print(",".join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+@pytest.mark.parametrize('module', ENTRY_MODULES)
+def test_import_leaves_heavy_dependencies_unloaded(module, tmp_path):
+    env = dict(os.environ, PYTHONPATH=MODULE_DIR)
+    completed = subprocess.run(
+        [sys.executable, '-c', CHECK.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout.strip() == ''
+    # Importing must not create databases, caches or models either
+    assert os.listdir(tmp_path) == []